@@ -0,0 +1,238 @@
+# TARGET_FILE: archive_importer.py
+"""
+Bulk import of Binance public kline archives (data.binance.vision) into the
+DatasetStore. Whole past months come from the monthly zips, the rest from
+the daily ones. Downloads run in a thread pool, each verified against its
+.CHECKSUM (sha256) file; unzip + parse + partition writes run in a process
+pool. Imported archives are recorded per symbol, so an interrupted run picks
+up where it stopped.
+
+    python archive_importer.py --symbols BTCUSDT ETHUSDT --start 2023-01-01
+    python archive_importer.py --symbols BTCUSDT --start 2024-01-01 --source http://127.0.0.1:8000
+    python archive_importer.py --symbols BTCUSDT --start 2024-01-01 --source /mnt/binance-mirror
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+from data.dataset_store import DatasetStore, dedupe_sorted, split_days
+
+DEFAULT_SOURCE = "https://data.binance.vision"
+DOWNLOAD_DIR = os.path.join("datasets", "archives")
+
+def plan_archives(symbol: str, interval: str, start: date, end: date) -> list:
+    """
+    Relative paths of the archives covering start..end (inclusive): the
+    monthly zip for every whole month before the current one, daily zips
+    for partial months and the current month.
+    """
+    first_of_this_month = datetime.now(timezone.utc).date().replace(day=1)
+    paths = []
+    month = start.replace(day=1)
+    while month <= end:
+        next_month = (month + timedelta(days=32)).replace(day=1)
+        if month >= start and next_month - timedelta(days=1) <= end and next_month <= first_of_this_month:
+            paths.append(f"data/spot/monthly/klines/{symbol}/{interval}/{symbol}-{interval}-{month:%Y-%m}.zip")
+        else:
+            day = max(month, start)
+            while day < next_month and day <= end:
+                paths.append(f"data/spot/daily/klines/{symbol}/{interval}/{symbol}-{interval}-{day:%Y-%m-%d}.zip")
+                day += timedelta(days=1)
+        month = next_month
+    return paths
+
+def _read_source(source: str, rel_path: str) -> bytes:
+    if source.startswith(("http://", "https://")):
+        with urllib.request.urlopen(f"{source.rstrip('/')}/{rel_path}", timeout=60) as resp:
+            return resp.read()
+    with open(os.path.join(source, rel_path), 'rb') as f:
+        return f.read()
+
+def _sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def fetch_archive(source: str, rel_path: str, download_dir: str, verify: bool = True):
+    """
+    Local path and sha256 of one verified archive, or (None, reason) if it is
+    not published (404 / missing file) or fails its checksum twice. Archives
+    from a local `source` are read in place; remote ones are streamed to
+    `download_dir`, and a verified copy already there is reused.
+    """
+    try:
+        expected = _read_source(source, f"{rel_path}.CHECKSUM").split()[0].decode() if verify else None
+    except (urllib.error.HTTPError, FileNotFoundError) as e:
+        if isinstance(e, FileNotFoundError) or e.code == 404:
+            return None, "missing"
+        raise
+    is_remote = source.startswith(("http://", "https://"))
+    path = os.path.join(download_dir, rel_path) if is_remote else os.path.join(source, rel_path)
+    for attempt in range(2):
+        if is_remote and not (os.path.exists(path) and (not verify or _sha256_file(path) == expected)):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            digest = hashlib.sha256()
+            try:
+                with urllib.request.urlopen(f"{source.rstrip('/')}/{rel_path}", timeout=60) as resp, \
+                        open(f"{path}.part", 'wb') as f:
+                    for chunk in iter(lambda: resp.read(1 << 20), b''):
+                        digest.update(chunk)
+                        f.write(chunk)
+            except urllib.error.HTTPError as e:
+                if e.code == 404:
+                    return None, "missing"
+                raise
+            os.replace(f"{path}.part", path)
+            actual = digest.hexdigest()
+        elif os.path.exists(path):
+            actual = _sha256_file(path)
+        else:
+            return None, "missing"
+        if not verify or actual == expected:
+            return path, actual
+        if is_remote:
+            os.remove(path)
+    return None, f"checksum mismatch (expected {expected}, got {actual})"
+
+def parse_archive(zip_path: str) -> dict:
+    """
+    Kline columns from one archive CSV. Open times are ms in older archives
+    and µs in newer ones (spot, from 2025); both come out as ms.
+    """
+    with zipfile.ZipFile(zip_path) as zf:
+        raw = zf.read(zf.namelist()[0])
+    has_header = not raw[:1].isdigit()
+    df = pd.read_csv(io.BytesIO(raw), header=None, skiprows=1 if has_header else 0, usecols=range(6),
+                     dtype={0: np.int64, 1: np.float64, 2: np.float64, 3: np.float64, 4: np.float64, 5: np.float64})
+    t = df[0].to_numpy()
+    if len(t) and t.max() >= 10 ** 14:
+        t = t // 1000
+    return {'t': t, 'o': df[1].to_numpy(), 'h': df[2].to_numpy(), 'l': df[3].to_numpy(),
+            'c': df[4].to_numpy(), 'v': df[5].to_numpy()}
+
+def import_archive(zip_path: str, store_root: str, symbol: str, interval: str) -> dict:
+    """Process-pool task: parse one archive and write its day partitions; returns their index entries."""
+    store = DatasetStore(store_root)
+    cols = dedupe_sorted(parse_archive(zip_path))
+    return {day: store.write_partition(symbol, interval, day, part) for day, part in split_days(cols)}
+
+class ImportManifest:
+    """{archive name: sha256} of everything already in the store, per symbol/interval."""
+    def __init__(self, store: DatasetStore, symbol: str, interval: str):
+        self.path = os.path.join(store.root, symbol, interval, "imported.json")
+        try:
+            with open(self.path) as f:
+                self.done = json.load(f)
+        except FileNotFoundError:
+            self.done = {}
+
+    def __contains__(self, rel_path: str) -> bool:
+        return os.path.basename(rel_path) in self.done
+
+    def add(self, rel_path: str, sha256: str):
+        self.done[os.path.basename(rel_path)] = sha256
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(f"{self.path}.tmp", 'w') as f:
+            json.dump(self.done, f, indent=1, sort_keys=True)
+        os.replace(f"{self.path}.tmp", self.path)
+
+def import_archives(symbols: list, interval: str, start: date, end: date, source: str = DEFAULT_SOURCE,
+                    store_root: str = os.path.join("datasets", "store"), download_workers: int = 8,
+                    parse_workers: int = None, download_dir: str = DOWNLOAD_DIR, verify: bool = True,
+                    keep_archives: bool = False) -> dict:
+    store = DatasetStore(store_root)
+    manifests = {s: ImportManifest(store, s, interval) for s in symbols}
+    jobs = [(s, p) for s in symbols for p in plan_archives(s, interval, start, end) if p not in manifests[s]]
+    stats = {"planned": len(jobs), "imported": 0, "missing": 0, "failed": 0, "rows": 0}
+    print(f"{len(jobs)} archives to import "
+          f"({sum(len(m.done) for m in manifests.values())} already imported) from {source}")
+    parse_workers = parse_workers or os.cpu_count()
+    # Downloaded-but-unparsed archives on disk at once
+    in_flight = threading.BoundedSemaphore(2 * parse_workers + download_workers)
+
+    def download(job):
+        in_flight.acquire()
+        try:
+            return fetch_archive(source, job[1], download_dir, verify)
+        except BaseException:
+            in_flight.release()
+            raise
+
+    with ThreadPoolExecutor(download_workers) as downloads, ProcessPoolExecutor(parse_workers) as parsers:
+        pending = {downloads.submit(download, job): ("download", job, None) for job in jobs}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                kind, (symbol, rel_path), digest = pending.pop(future)
+                name = os.path.basename(rel_path)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    stats["failed"] += 1
+                    print(f"  FAILED {name}: {kind}: {e}")
+                    if kind == "parse":
+                        in_flight.release()  # A failed download has released its own slot
+                    continue
+                if kind == "download":
+                    path, digest_or_reason = result
+                    if path is None:
+                        in_flight.release()
+                        stats["missing" if digest_or_reason == "missing" else "failed"] += 1
+                        print(f"  {'skipped' if digest_or_reason == 'missing' else 'FAILED'} {name}: {digest_or_reason}")
+                        continue
+                    parse = parsers.submit(import_archive, path, store_root, symbol, interval)
+                    pending[parse] = ("parse", (symbol, rel_path), (digest_or_reason, path))
+                else:
+                    in_flight.release()
+                    sha256, path = digest
+                    store.update_index(symbol, interval, result)
+                    manifests[symbol].add(rel_path, sha256)
+                    if not keep_archives and source.startswith(("http://", "https://")):
+                        os.remove(path)
+                    rows = sum(e["rows"] for e in result.values())
+                    stats["imported"] += 1
+                    stats["rows"] += rows
+                    print(f"  {name}: {rows:,} rows")
+    return stats
+
+def _parse_date(value: str) -> date:
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import Binance public kline archives into the dataset store.")
+    parser.add_argument("--symbols", nargs="+", required=True)
+    parser.add_argument("--interval", default="1s")
+    parser.add_argument("--start", type=_parse_date, required=True, help="YYYY-MM-DD")
+    parser.add_argument("--end", type=_parse_date, default=None, help="YYYY-MM-DD, inclusive (default: yesterday, UTC)")
+    parser.add_argument("--source", default=DEFAULT_SOURCE, help="Archive base URL, or a local mirror directory")
+    parser.add_argument("--store", default=os.path.join("datasets", "store"))
+    parser.add_argument("--download-dir", default=DOWNLOAD_DIR)
+    parser.add_argument("--download-workers", type=int, default=8)
+    parser.add_argument("--parse-workers", type=int, default=None)
+    parser.add_argument("--no-verify", action="store_true", help="Skip the .CHECKSUM verification")
+    parser.add_argument("--keep-archives", action="store_true", help="Keep downloaded zips after import")
+    args = parser.parse_args()
+
+    end = args.end or datetime.now(timezone.utc).date() - timedelta(days=1)
+    started = time.time()
+    stats = import_archives([s.upper() for s in args.symbols], args.interval, args.start, end, args.source,
+                            args.store, args.download_workers, args.parse_workers, args.download_dir,
+                            not args.no_verify, args.keep_archives)
+    elapsed = time.time() - started
+    print(f"\nImported {stats['imported']}/{stats['planned']} archives, {stats['rows']:,} rows in {elapsed:.1f}s "
+          f"({stats['rows'] / max(elapsed, 1e-9):,.0f} rows/s); {stats['missing']} not published, "
+          f"{stats['failed']} failed")
@@ -0,0 +1,303 @@
+# TARGET_FILE: benchmarks/bench_hot_path.py
+"""
+Hot-path benchmarks: per-call latency of every trading stage on recorded or
+synthetic 1s klines, written as JSON for comparison across commits.
+
+    python benchmarks/bench_hot_path.py --output benchmarks/results/$(git rev-parse --short HEAD).json
+    python benchmarks/compare.py benchmarks/results/base.json benchmarks/results/new.json
+"""
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import yaml
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from data.binance_ws import BinanceKlineStream
+from exchange_filters import ExchangeFilterCache
+from generate_mock_data import generate_mock_klines
+from risk_management import MicroScalpingRiskManager
+from strategies.scalping_features import FeaturePipeline, compute_scalping_features
+from strategies.scalping_model import load_scalping_model, predict_signal
+from trading_engine import ScalpingEngine
+
+SYMBOL = "BTCUSDT"
+# Spot exchangeInfo filters for SYMBOL, so the engine keeps its klines as int64 ticks
+EXCHANGE_INFO = {"symbols": [{"symbol": SYMBOL, "filters": [
+    {"filterType": "PRICE_FILTER", "minPrice": "0.01", "maxPrice": "1000000.00", "tickSize": "0.01"},
+    {"filterType": "LOT_SIZE", "minQty": "0.00001", "maxQty": "9000.00000", "stepSize": "0.00001"},
+    {"filterType": "NOTIONAL", "minNotional": "5.00000000"},
+]}]}
+
+class StubExecutor:
+    """Fills every market order instantly at a fixed price; no network."""
+    def __init__(self):
+        self.client = None
+        self.next_order_id = 1
+
+    def attach_account(self, account):
+        pass
+
+    def place_market_order(self, symbol: str, side: str, quantity: float) -> dict:
+        self.next_order_id += 1
+        return {"orderId": self.next_order_id, "executedQty": str(quantity), "avgPrice": 60000.0}
+
+    def get_account_balance(self, asset: str = "USDT") -> float:
+        return 1000.0
+
+    def place_bracket_order(self, *args, **kwargs):
+        return None
+
+    def track_bracket(self, *args, **kwargs):
+        pass
+
+    def reconcile_bracket(self, symbol: str):
+        return None
+
+    def cancel_bracket(self, symbol: str) -> bool:
+        return True
+
+    def match_bracket_fill(self, order: dict):
+        return None
+
+def load_klines(path: str) -> list:
+    """Klines from latest_klines.json or a collected dataset CSV (close-only sets get flat bars)."""
+    if path.endswith('.json'):
+        with open(path) as f:
+            return json.load(f)["klines"]
+    import pandas as pd
+    df = pd.read_csv(path)
+    klines = []
+    for row in df.itertuples(index=False):
+        row = row._asdict()
+        c = float(row['close'])
+        klines.append({
+            't': int(row.get('timestamp', 0)),
+            'o': float(row.get('open', c)), 'h': float(row.get('high', c)),
+            'l': float(row.get('low', c)), 'c': c, 'v': float(row.get('volume', 1.0)),
+        })
+    return klines
+
+def kline_frames(klines: list, symbol: str = SYMBOL) -> list:
+    """Raw websocket frames in Binance's kline event format."""
+    return [json.dumps({
+        "e": "kline", "E": k['t'] + 999, "s": symbol,
+        "k": {"t": k['t'], "T": k['t'] + 999, "s": symbol, "i": "1s",
+              "o": f"{k['o']:.2f}", "h": f"{k['h']:.2f}", "l": f"{k['l']:.2f}",
+              "c": f"{k['c']:.2f}", "v": f"{k['v']:.5f}", "x": True}
+    }) for k in klines]
+
+def timeline(klines: list, n: int) -> list:
+    """
+    `n` klines cycling through `klines` with strictly increasing open times.
+    `bench` restarts `i` on every repeat; feeding frames from one timeline
+    instead keeps every frame newer than the last stored one, so none is
+    dropped as stale.
+    """
+    span = klines[-1]['t'] - klines[0]['t'] + 1000
+    return [dict(klines[j % len(klines)], t=klines[j % len(klines)]['t'] + (j // len(klines)) * span)
+            for j in range(n)]
+
+def summarize(samples_ns: np.ndarray) -> dict:
+    return {
+        "n": int(len(samples_ns)),
+        "p50_us": float(np.percentile(samples_ns, 50) / 1e3),
+        "p90_us": float(np.percentile(samples_ns, 90) / 1e3),
+        "p99_us": float(np.percentile(samples_ns, 99) / 1e3),
+        "mean_us": float(samples_ns.mean() / 1e3),
+        "max_us": float(samples_ns.max() / 1e3),
+    }
+
+def bench(fn, iterations: int, warmup: int, repeats: int) -> dict:
+    """
+    Time `fn(i)` per call. Each repeat is summarized separately and the median
+    of each statistic is reported, which keeps p50/p99 stable run to run.
+    """
+    per_repeat = []
+    clock = time.perf_counter_ns
+    for _ in range(repeats):
+        for i in range(warmup):
+            fn(i)
+        samples = np.empty(iterations, dtype=np.int64)
+        gc.collect()
+        gc.disable()
+        try:
+            for i in range(iterations):
+                start = clock()
+                fn(i)
+                samples[i] = clock() - start
+        finally:
+            gc.enable()
+        per_repeat.append(summarize(samples))
+    result = {key: float(np.median([r[key] for r in per_repeat])) for key in per_repeat[0]}
+    result["n"] = iterations * repeats
+    result["ops_per_s"] = 1e6 / result["mean_us"] if result["mean_us"] else 0.0
+    return result
+
+def bench_async(coro_fn, iterations: int, warmup: int, repeats: int) -> dict:
+    """`bench` for coroutines, all awaited on one event loop."""
+    loop = asyncio.new_event_loop()
+    try:
+        return bench(lambda i: loop.run_until_complete(coro_fn(i)), iterations, warmup, repeats)
+    finally:
+        loop.close()
+
+def bench_settings(workdir: str) -> str:
+    """Repo settings with every network-facing feature off; returns the temp config path."""
+    with open(ROOT / "settings.yaml") as f:
+        settings = yaml.safe_load(f)
+    settings['binance']['user_stream'] = False
+    settings['trading']['use_exchange_brackets'] = False
+    settings['trading']['exit_price_stream'] = 'kline'
+    settings['trading']['bar'] = '1s'
+    settings['model']['path'] = str(ROOT / settings['model']['path'])
+    settings.setdefault('metrics', {})['enabled'] = False
+    settings['journal'] = {'path': os.path.join(workdir, 'trade_journal.db')}
+    config_path = os.path.join(workdir, "settings.yaml")
+    with open(config_path, 'w') as f:
+        yaml.safe_dump(settings, f)
+    return config_path
+
+def run_benchmarks(klines: list, iterations: int, warmup: int, repeats: int) -> dict:
+    workdir = tempfile.mkdtemp(prefix="coco_bench_")
+    os.chdir(workdir)  # State, journal and dashboard files land in the temp dir
+    config_path = bench_settings(workdir)
+    with open(config_path) as f:
+        settings = yaml.safe_load(f)
+    pipeline = FeaturePipeline(settings['model']['required_features'])
+    window = pipeline.window
+    results = {}
+
+    # Websocket frame -> kline store
+    filters = ExchangeFilterCache(path=os.path.join(workdir, "exchange_info_cache.json"),
+                                  fetch=lambda: EXCHANGE_INFO).load()
+    tick_sizes = {SYMBOL: float(filters.filters[SYMBOL].tick_size)}
+    stream = BinanceKlineStream([SYMBOL], maxlen=max(window, 60), tick_sizes=tick_sizes)
+    calls = (warmup + iterations) * repeats
+    frames = iter(kline_frames(timeline(klines, calls)))
+    results["_handle_message"] = bench_async(
+        lambda i: stream._handle_message(next(frames), SYMBOL.lower()), iterations, warmup, repeats
+    )
+    stored = stream.klines[SYMBOL.lower()].count
+    if stored != calls:
+        raise RuntimeError(f"_handle_message stored {stored} of {calls} frames; the timings include dropped ones")
+    results["get_columns"] = bench(
+        lambda i: stream.get_columns(SYMBOL, window), iterations, warmup, repeats
+    )
+    results["get_klines_array"] = bench(
+        lambda i: stream.get_klines_array(SYMBOL, n=window), iterations, warmup, repeats
+    )
+
+    # Features and prediction over sliding windows of the series
+    windows = [klines[i:i + window] for i in range(len(klines) - window)]
+    results["compute_scalping_features"] = bench(
+        lambda i: compute_scalping_features(windows[i % len(windows)], pipeline), iterations, warmup, repeats
+    )
+    model = load_scalping_model(settings['model']['path'])
+    features = [pipeline.compute(w) for w in windows[:1000]]
+    results["predict_signal"] = bench(
+        lambda i: predict_signal(model, features[i % len(features)]), iterations, warmup, repeats
+    )
+
+    # Risk checks and state persistence with an open position
+    risk_mgr = MicroScalpingRiskManager(settings, state_file=os.path.join(workdir, "risk_state.json"))
+    price = klines[-1]['c']
+    risk_mgr.state["active_position"] = {
+        "symbol": SYMBOL, "side": "buy", "quantity": 0.001, "entry_price": price,
+        "open_time": time.time() + 3600, "order_id": 1
+    }
+    prices = [k['c'] for k in klines]
+    results["check_exit_conditions"] = bench(
+        lambda i: risk_mgr.check_exit_conditions(prices[i % len(prices)]), iterations, warmup, repeats
+    )
+    results["save_state"] = bench(lambda i: risk_mgr.save_state(), iterations, warmup, repeats)
+
+    # Full trade_loop iteration: one new kline, then one evaluation (int-tick columns) against the stub executor
+    engine = ScalpingEngine(config_path, order_executor=StubExecutor(), filters=filters)
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(engine.initialize())
+    frames = iter(kline_frames(timeline(klines, window + calls)))
+    for _ in range(window):
+        loop.run_until_complete(engine.ws_client._handle_message(next(frames), SYMBOL.lower()))
+
+    async def iteration(i):
+        await engine.ws_client._handle_message(next(frames), SYMBOL.lower())
+        await engine.evaluate(SYMBOL)
+
+    try:
+        results["trade_loop_iteration"] = bench(
+            lambda i: loop.run_until_complete(iteration(i)), iterations, warmup, repeats
+        )
+    finally:
+        loop.close()
+        engine.journal.close()
+    stored = engine.ws_client.klines[SYMBOL.lower()].count
+    if stored != window + calls:
+        raise RuntimeError(f"trade_loop_iteration stored {stored} of {window + calls} frames")
+    return results
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return "unknown"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the trading hot path.")
+    parser.add_argument("--klines", default=None, help="latest_klines.json or dataset CSV (default: synthetic)")
+    parser.add_argument("--n-klines", type=int, default=3600, help="Synthetic klines to generate")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--warmup", type=int, default=200)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output", default=str(ROOT / "benchmarks" / "results" / "latest.json"))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    if args.klines:
+        klines = load_klines(os.path.abspath(args.klines))
+        source = args.klines
+    else:
+        klines = generate_mock_klines(args.n_klines, seed=args.seed)
+        source = f"synthetic(n={args.n_klines}, seed={args.seed})"
+
+    output = os.path.abspath(args.output)
+    cwd = os.getcwd()
+    try:
+        results = run_benchmarks(klines, args.iterations, args.warmup, args.repeats)
+    finally:
+        os.chdir(cwd)
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.time(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "klines": source,
+            "iterations": args.iterations,
+            "repeats": args.repeats,
+        },
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(f"{'benchmark':<28}{'p50 (us)':>12}{'p99 (us)':>12}{'ops/s':>14}")
+    for name, stats in results.items():
+        print(f"{name:<28}{stats['p50_us']:>12.2f}{stats['p99_us']:>12.2f}{stats['ops_per_s']:>14,.0f}")
+    print(f"\nResults saved to {output}")
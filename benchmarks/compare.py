@@ -0,0 +1,42 @@
+# TARGET_FILE: benchmarks/compare.py
+"""
+Compare two bench_hot_path.py result files; exits non-zero when any stage's
+p50 or p99 got slower than --threshold percent.
+
+    python benchmarks/compare.py benchmarks/results/base.json benchmarks/results/latest.json
+"""
+import argparse
+import json
+import sys
+
+def compare(base: dict, new: dict, threshold_pct: float) -> list:
+    """[(benchmark, stat, base_us, new_us, change_pct, regressed)] for benchmarks in both files."""
+    rows = []
+    for name, new_stats in new["results"].items():
+        base_stats = base["results"].get(name)
+        if base_stats is None:
+            continue
+        for stat in ("p50_us", "p99_us"):
+            before, after = base_stats[stat], new_stats[stat]
+            change = (after / before - 1) * 100 if before else 0.0
+            rows.append((name, stat, before, after, change, change > threshold_pct))
+    return rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare hot-path benchmark results.")
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Allowed slowdown in percent")
+    args = parser.parse_args()
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+
+    print(f"base {base['meta']['commit']} -> new {new['meta']['commit']}")
+    rows = compare(base, new, args.threshold)
+    for name, stat, before, after, change, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{name:<28}{stat:<8}{before:>10.2f} -> {after:>10.2f} us  {change:+7.1f}%{flag}")
+    sys.exit(1 if any(r[-1] for r in rows) else 0)
@@ -0,0 +1,111 @@
+# TARGET_FILE: benchmarks/depth_replay.py
+"""
+Order book sync check on recorded depth frames (`python -m data.order_book
+BTCUSDT --record frames.jsonl`): replays them through BinanceDepthStream and
+compares every book against one rebuilt independently from the recording
+(last snapshot + the events after it). Then exercises the live-path
+safeguards offline: the pending-event cap and snapshot retry backoff.
+
+    python benchmarks/depth_replay.py
+    python benchmarks/depth_replay.py --frames frames.jsonl
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from data.order_book import BinanceDepthStream
+
+FIXTURE = ROOT / "benchmarks" / "fixtures" / "depth_btcusdt.jsonl"
+
+def load_entries(path: str) -> list:
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+def reference_books(entries: list) -> dict:
+    """{symbol: (bids, asks)} as {price: qty} from each symbol's last snapshot and the events after it."""
+    books = {}
+    for entry in entries:
+        symbol = entry['symbol']
+        if 'snapshot' in entry:
+            snap = entry['snapshot']
+            books[symbol] = [snap['lastUpdateId'], {float(p): float(q) for p, q in snap['bids']},
+                             {float(p): float(q) for p, q in snap['asks']}]
+        elif symbol in books and entry['event']['u'] > books[symbol][0]:
+            event = entry['event']
+            for side, levels in ((1, event['b']), (2, event['a'])):
+                for p, q in levels:
+                    if float(q) == 0.0:
+                        books[symbol][side].pop(float(p), None)
+                    else:
+                        books[symbol][side][float(p)] = float(q)
+            books[symbol][0] = event['u']
+    return {s: (b[1], b[2]) for s, b in books.items()}
+
+def check_replay(path: str) -> bool:
+    entries = load_entries(path)
+    symbols = sorted({e['symbol'] for e in entries})
+    stream = BinanceDepthStream(symbols)
+    applied = stream.replay(path)
+    ok = True
+    for symbol, (bids, asks) in reference_books(entries).items():
+        book = stream.books[symbol]
+        got_bids = dict(book.bids.levels(len(book.bids)))
+        got_asks = dict(book.asks.levels(len(book.asks)))
+        match = book.synced and got_bids == bids and got_asks == asks
+        ok &= match
+        print(f"{symbol}: {applied} events applied, {len(bids)}/{len(asks)} levels, "
+              f"top={book.top_of_book()} -> {'OK' if match else 'MISMATCH'}")
+    return ok
+
+def check_pending_cap(path: str, max_pending: int = 3) -> bool:
+    """Unsynced events are buffered up to max_pending, and ones a snapshot covers are dropped."""
+    events = [e for e in load_entries(path) if 'event' in e]
+    symbol = events[0]['symbol']
+    stream = BinanceDepthStream([symbol], max_pending=max_pending)
+    for entry in events:
+        stream._buffer(symbol, entry['event'])
+    pending = stream._pending[symbol]
+    ok = len(pending) == max_pending and pending[-1] is events[-1]['event']
+    stream.books[symbol].last_update_id = pending[-2]['u']
+    stream._buffer(symbol, pending[0])
+    ok &= len(pending) == max_pending and pending[-1] is not pending[0]
+    print(f"pending cap: {len(pending)} buffered of {len(events)}, covered events dropped -> {'OK' if ok else 'FAIL'}")
+    return ok
+
+def check_backoff(path: str) -> bool:
+    """A failing snapshot is retried with exponential backoff, not on every event."""
+    events = [e['event'] for e in load_entries(path) if 'event' in e]
+    symbol = events[0]['s'].lower()
+    stream = BinanceDepthStream([symbol], max_backoff=4.0)
+    attempts = []
+
+    def failing_fetch(sym):
+        attempts.append(sym)
+        raise OSError("snapshot unavailable")
+    stream._fetch_snapshot = failing_fetch
+
+    async def feed():
+        stream.running = True
+        for event in events * 4:
+            stream._handle_event(symbol, event)
+            await asyncio.sleep(0.015)  # ~1.5s of events: retried once, after 1s
+
+    asyncio.run(feed())
+    ok = len(attempts) == 2 and stream._backoff[symbol] == 2.0
+    print(f"snapshot backoff: {len(attempts)} fetches over {len(events) * 4} unsynced events, "
+          f"next retry in {stream._backoff[symbol]:.0f}s -> {'OK' if ok else 'FAIL'}")
+    return ok
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Validate depth sync on recorded frames.")
+    parser.add_argument("--frames", default=str(FIXTURE), help="JSONL recorded by data/order_book.py --record")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+    results = [check_replay(args.frames), check_pending_cap(args.frames), check_backoff(args.frames)]
+    sys.exit(0 if all(results) else 1)
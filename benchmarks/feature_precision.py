@@ -0,0 +1,117 @@
+# TARGET_FILE: benchmarks/feature_precision.py
+"""
+Feature precision parity: every pipeline feature computed the old way
+(float32 prices), from float64 prices, and from the int64 tick columns the
+live stream keeps (kline frames -> BinanceKlineStream -> get_columns), each
+compared against an exact reference (Python Fractions over the decimal
+prices). Exits non-zero if the tick path is not exact to 1e-9 of each
+feature's typical magnitude.
+
+    python benchmarks/feature_precision.py --price 107000 --tick 0.01
+"""
+import argparse
+import asyncio
+import json
+import sys
+from fractions import Fraction
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from data.binance_ws import BinanceKlineStream
+from strategies.scalping_features import FeaturePipeline
+
+def make_klines(n: int, price: float, tick: float, seed: int):
+    """Random-walk closes on the tick grid, moving a few ticks per second."""
+    rng = np.random.default_rng(seed)
+    ticks = np.round(price / tick) + np.cumsum(rng.integers(-3, 4, n))
+    klines = []
+    for i, c in enumerate(ticks):
+        o = ticks[i - 1] if i else c
+        klines.append({'t': 1_700_000_000_000 + i * 1000, 'o': o * tick, 'h': (max(o, c) + 1) * tick,
+                       'l': (min(o, c) - 1) * tick, 'c': c * tick, 'v': float(rng.uniform(0.1, 5.0))})
+    return klines
+
+def exact_features(names, klines, tick_str: str):
+    """Reference values: closes as exact decimals, arithmetic in Fractions."""
+    tick = Fraction(tick_str)
+    c = [round(Fraction(k['c']) / tick) * tick for k in klines]
+    out = {}
+    if 'price_change_1s' in names:
+        out['price_change_1s'] = float((c[-1] - c[-2]) / c[-2])
+    if 'price_change_5s' in names:
+        out['price_change_5s'] = float((c[-1] - c[-6]) / c[-6])
+    if 'price_acceleration' in names:
+        out['price_acceleration'] = float((c[-1] - c[-2]) - (c[-2] - c[-3]))
+    if 'volatility_10s' in names:
+        r = [(c[i] - c[i - 1]) / c[i - 1] for i in range(len(c) - 10, len(c))]
+        mean = sum(r) / len(r)
+        out['volatility_10s'] = float(sum((x - mean) ** 2 for x in r) / len(r)) ** 0.5
+    return out
+
+def kline_frame(kline: dict, decimals: int) -> str:
+    """A Binance kline event with prices as the exchange prints them."""
+    fmt = lambda price: f"{price:.{decimals}f}"
+    return json.dumps({"e": "kline", "s": "BTCUSDT", "k": {
+        "t": kline['t'], "o": fmt(kline['o']), "h": fmt(kline['h']), "l": fmt(kline['l']),
+        "c": fmt(kline['c']), "v": f"{kline['v']:.5f}", "x": True}})
+
+def float32_features(pipeline: FeaturePipeline, window):
+    """The previous behaviour: closes cast to float32 before any arithmetic."""
+    cols = {f: np.array([k[f] for k in window], dtype=np.float32) for f in pipeline.fields}
+    return np.array([spec.latest(cols) for spec in pipeline.specs], dtype=np.float32)
+
+def main() -> bool:
+    parser = argparse.ArgumentParser(description="Compare float32 / float64 / int64-tick feature precision.")
+    parser.add_argument("--price", type=float, default=107000.0)
+    parser.add_argument("--tick", default="0.01")
+    parser.add_argument("--n", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    names = ['price_change_1s', 'price_change_5s', 'volatility_10s', 'price_acceleration']
+    pipeline = FeaturePipeline(names)
+    tick = float(args.tick)
+    klines = make_klines(args.n, args.price, tick, args.seed)
+    stream = BinanceKlineStream(["BTCUSDT"], maxlen=pipeline.window, tick_sizes={"BTCUSDT": tick})
+    decimals = stream.klines["btcusdt"].decimals
+    loop = asyncio.new_event_loop()
+
+    errors = {mode: {name: [] for name in names} for mode in ("float32", "float64", "int64 ticks")}
+    for i, kline in enumerate(klines):
+        loop.run_until_complete(stream._handle_message(kline_frame(kline, decimals), "btcusdt"))
+        if i + 1 < pipeline.window:
+            continue
+        window = klines[i + 1 - pipeline.window:i + 1]
+        exact = exact_features(names, window, args.tick)
+        results = {
+            "float32": float32_features(pipeline, window),
+            "float64": pipeline.compute(window),
+            "int64 ticks": pipeline.compute(stream.get_columns("BTCUSDT", pipeline.window), tick_size=tick),
+        }
+        for mode, values in results.items():
+            for name, value in zip(names, values):
+                errors[mode][name].append(abs(float(value) - exact[name]))
+
+    print(f"price ~{args.price:,.2f}, tick {args.tick}, float32 resolution at that price: "
+          f"{np.spacing(np.float32(args.price)):.6f}")
+    print(f"{'feature':<20} {'mode':<12} {'max abs err':>12} {'mean abs err':>13}  scale")
+    ok = True
+    for name in names:
+        # Typical magnitude, to read the errors against
+        scale = np.median(np.abs([float(pipeline.compute(klines[j:j + pipeline.window])[names.index(name)])
+                                  for j in range(0, len(klines) - pipeline.window, 50)])) or 1.0
+        for mode in errors:
+            errs = np.array(errors[mode][name])
+            print(f"{name:<20} {mode:<12} {errs.max():>12.3e} {errs.mean():>13.3e}  {scale:.3e}")
+        ok &= max(errors['int64 ticks'][name]) <= 1e-9 * scale
+    wrong = np.mean(np.array(errors['float32']['price_acceleration']) >= tick / 2)
+    print(f"\nprice_acceleration: float32 off by half a tick or more in {wrong:.1%} of rows")
+    print(f"int64 tick path exact: {'OK' if ok else 'FAIL'}")
+    return ok
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
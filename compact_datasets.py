@@ -0,0 +1,292 @@
+# TARGET_FILE: compact_datasets.py
+"""
+Compaction and integrity check for collected 1s CSVs. The collectors append
+every intra-candle update, so their files hold repeated and out-of-order
+timestamps and the odd zero-price row. This rewrites a file sorted, with one
+row per candle (the last update seen) and invalid prices dropped, and writes
+a <file>.index.json next to it: rows and min/max timestamp overall and per
+UTC day, with each day's byte offset for range reads (read_compacted).
+
+Only the timestamp and close columns are parsed; kept rows are copied byte
+for byte, so values are never re-formatted. Both passes run in a process
+pool and hold at most a block or a day of rows per worker: the file is cut
+into line-aligned blocks, each block's lines are spilled to per-day files,
+then each day is deduped, sorted and checked, and the days are
+concatenated in order.
+
+    python compact_datasets.py                       # every datasets/*.csv, in place
+    python compact_datasets.py datasets/btcusdt_clean_1s.csv --output /tmp/clean.csv
+    python compact_datasets.py --check               # report only
+
+Stop the collector writing a file before compacting it in place; a file
+that grows during the run is left untouched.
+"""
+import argparse
+import glob
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from data.dataset_store import DAY_MS, day_of
+
+STEP_MS = 1000
+SPIKE_RETURN = 0.05  # |close-to-close return| above this is reported as a spike
+MAX_GAPS_LISTED = 20
+GATHER_ROWS = 100_000
+
+def index_path(path: str) -> str:
+    return f"{path}.index.json"
+
+def _empty_report() -> dict:
+    return {"input_rows": 0, "rows": 0, "unparsed_rows": 0, "invalid_price_rows": 0, "duplicate_rows": 0,
+            "out_of_order_rows": 0, "misaligned_rows": 0, "price_spikes": 0, "gaps": 0, "missing_candles": 0,
+            "largest_gaps": []}
+
+def _merge_report(total: dict, part: dict) -> None:
+    for key, value in part.items():
+        if key == "largest_gaps":
+            total[key] = sorted(total[key] + value, key=lambda g: -g[2])[:MAX_GAPS_LISTED]
+        else:
+            total[key] += value
+
+def plan_blocks(path: str, data_start: int, block_bytes: int) -> list:
+    """(start, end) byte ranges of about block_bytes each, cut after a newline."""
+    size = os.path.getsize(path)
+    blocks = []
+    with open(path, 'rb') as f:
+        start = data_start
+        while start < size:
+            f.seek(min(start + block_bytes, size))
+            f.readline()  # Finish the line the cut falls in
+            end = min(f.tell(), size)
+            blocks.append((start, end))
+            start = end
+    return blocks
+
+def spill_block(path: str, start: int, end: int, block_no: int, close_idx: int, spill_dir: str) -> dict:
+    """
+    Process-pool task: split one block of lines by UTC day. The raw lines go
+    to <day>.<block>.csv and (seq, t, close, line length) to <day>.<block>.meta,
+    seq being (block, line) so the input order survives across blocks.
+    """
+    with open(path, 'rb') as f:
+        f.seek(start)
+        buf = f.read(end - start)
+    if not buf.endswith(b'\n'):
+        buf += b'\n'  # Last line without a newline
+    data = np.frombuffer(buf, dtype=np.uint8)
+    ends = np.flatnonzero(data == ord('\n')) + 1
+    starts = np.r_[0, ends[:-1]]
+    cols = pd.read_csv(io.BytesIO(buf), header=None, usecols=[0, close_idx], skip_blank_lines=False)
+    if len(cols) != len(starts):
+        raise ValueError(f"{len(starts)} lines but {len(cols)} rows parsed (quoted newlines?)")
+    t = pd.to_numeric(cols[0], errors='coerce').to_numpy(dtype=np.float64)
+    close = pd.to_numeric(cols[close_idx], errors='coerce').to_numpy(dtype=np.float64)
+    seq = block_no * 2.0 ** 32 + np.arange(len(starts))
+    parsed = ~np.isnan(t)  # Blank lines, repeated headers, truncated writes
+    day = np.where(parsed, np.nan_to_num(t) // DAY_MS, -1).astype(np.int64)
+    days = set()
+    # Runs of consecutive lines on the same day are contiguous bytes: usually one run per block
+    bounds = np.flatnonzero(np.diff(day)) + 1
+    for lo, hi in zip(np.r_[0, bounds], np.r_[bounds, len(day)]):
+        if day[lo] < 0:
+            continue
+        days.add(int(day[lo]))
+        prefix = os.path.join(spill_dir, f"{day[lo]}.{block_no}")
+        with open(f"{prefix}.csv", 'ab') as f:
+            f.write(buf[starts[lo]:ends[hi - 1]])
+        with open(f"{prefix}.meta", 'ab') as f:
+            np.column_stack([seq[lo:hi], t[lo:hi], close[lo:hi], (ends - starts)[lo:hi]]).tofile(f)
+    return {"lines": len(starts), "unparsed": int(len(t) - parsed.sum()), "days": days}
+
+def _record_gaps(t: np.ndarray, report: dict) -> None:
+    diffs = np.diff(t)
+    gap_idx = np.flatnonzero(diffs > STEP_MS)
+    report["gaps"] += len(gap_idx)
+    report["missing_candles"] += int(((diffs[gap_idx] // STEP_MS) - 1).sum())
+    for i in gap_idx:
+        report["largest_gaps"].append([int(t[i]), int(t[i + 1]), int(diffs[i] // STEP_MS) - 1])
+    report["largest_gaps"] = sorted(report["largest_gaps"], key=lambda g: -g[2])[:MAX_GAPS_LISTED]
+
+def _count_spikes(closes: np.ndarray) -> int:
+    return int(np.count_nonzero(np.abs(np.diff(closes) / closes[:-1]) > SPIKE_RETURN))
+
+def compact_day(spill_prefix: str, blocks: list, write: bool = True) -> dict:
+    """
+    Process-pool task: one day's spilled lines (from `blocks`, in order) ->
+    deduped, sorted lines in <spill_prefix>.out. Returns the day's report plus
+    its first/last timestamp and close, for the checks across midnight.
+    """
+    meta = np.concatenate([np.fromfile(f"{spill_prefix}.{b}.meta", dtype=np.float64) for b in blocks]).reshape(-1, 4)
+    seq, t, close = meta[:, 0], meta[:, 1].astype(np.int64), meta[:, 2]
+    lengths = meta[:, 3].astype(np.int64)
+    offsets = np.cumsum(lengths) - lengths
+    report = _empty_report()
+    report["misaligned_rows"] = int(np.count_nonzero(t % STEP_MS))
+    valid = np.flatnonzero(close > 0)  # Also drops NaN
+    report["invalid_price_rows"] = int(len(t) - len(valid))
+    # Spilled lines are in input order: anything earlier than a timestamp already seen is out of order
+    tv = t[valid]
+    report["out_of_order_rows"] = int(np.count_nonzero(tv[1:] < np.maximum.accumulate(tv[:-1]))) if len(tv) else 0
+    # Sort by (t, seq) and keep the last update of every t
+    rows = valid[np.lexsort((seq[valid], tv))]
+    keep = np.ones(len(rows), dtype=bool)
+    keep[:-1] = t[rows[1:]] != t[rows[:-1]]
+    report["duplicate_rows"] = int(len(rows) - keep.sum())
+    rows = rows[keep]
+    report["rows"] = len(rows)
+    if not len(rows):
+        return {"report": report}
+    _record_gaps(t[rows], report)
+    report["price_spikes"] = _count_spikes(close[rows])
+    if write:
+        data = np.concatenate([np.fromfile(f"{spill_prefix}.{b}.csv", dtype=np.uint8) for b in blocks])
+        with open(f"{spill_prefix}.out", 'wb') as out:
+            for i in range(0, len(rows), GATHER_ROWS):
+                part = rows[i:i + GATHER_ROWS]
+                n = lengths[part]
+                idx = np.repeat(offsets[part] - (np.cumsum(n) - n), n) + np.arange(n.sum())
+                out.write(data[idx].tobytes())
+    return {"report": report, "t_min": int(t[rows[0]]), "t_max": int(t[rows[-1]]),
+            "first_close": float(close[rows[0]]), "last_close": float(close[rows[-1]])}
+
+def compact_file(path: str, output: str = None, block_bytes: int = 64 << 20, check_only: bool = False,
+                 workers: int = None) -> dict:
+    """Compact `path` into `output` (default: in place) and write its index; returns the report."""
+    output = output or path
+    started = time.time()
+    size_before = os.path.getsize(path)
+    report = _empty_report()
+    spill_dir = tempfile.mkdtemp(prefix="compact_", dir=os.path.dirname(os.path.abspath(output)))
+    out_path = f"{output}.{os.getpid()}.tmp"
+    day_index = {}
+    try:
+        with open(path, 'rb') as f:
+            header_line = f.readline()
+        header = header_line.decode('utf-8-sig').strip().split(',')
+        if header[0] != 'timestamp' or 'close' not in header:
+            raise ValueError(f"expected a 'timestamp' first column and a 'close' column, got {header}")
+        blocks = plan_blocks(path, len(header_line), block_bytes)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            day_blocks = {}  # day -> blocks holding some of its rows, in input order
+            spilled = pool.map(spill_block, [path] * len(blocks), *zip(*blocks), range(len(blocks)),
+                               [header.index('close')] * len(blocks), [spill_dir] * len(blocks))
+            for block_no, result in enumerate(spilled):
+                report["input_rows"] += result["lines"]
+                report["unparsed_rows"] += result["unparsed"]
+                for day in result["days"]:
+                    day_blocks.setdefault(day, []).append(block_no)
+
+            days = sorted(day_blocks)
+            results = pool.map(compact_day, [os.path.join(spill_dir, str(day)) for day in days],
+                               [day_blocks[day] for day in days], [not check_only] * len(days))
+            with open(os.devnull if check_only else out_path, 'wb') as out:
+                out.write(header_line if header_line.endswith(b'\n') else header_line + b'\n')
+                prev = None
+                for day, result in zip(days, results):
+                    _merge_report(report, result["report"])
+                    if not result["report"]["rows"]:
+                        continue
+                    if prev is not None:  # Across midnight
+                        _record_gaps(np.array([prev["t_max"], result["t_min"]]), report)
+                        report["price_spikes"] += _count_spikes(np.array([prev["last_close"], result["first_close"]]))
+                    prev = result
+                    day_index[day_of(day * DAY_MS)] = {"rows": result["report"]["rows"], "t_min": result["t_min"],
+                                                       "t_max": result["t_max"], "offset": out.tell()}
+                    if not check_only:
+                        with open(os.path.join(spill_dir, f"{day}.out"), 'rb') as part:
+                            shutil.copyfileobj(part, out, 1 << 20)
+    except BaseException:
+        if os.path.exists(out_path):
+            os.remove(out_path)
+        raise
+    finally:
+        shutil.rmtree(spill_dir, ignore_errors=True)
+
+    report["seconds"] = round(time.time() - started, 2)
+    if check_only:
+        return report
+    if output == path and os.path.getsize(path) != size_before:
+        os.remove(out_path)
+        raise RuntimeError("file grew while compacting (collector still running?); left unchanged")
+    os.replace(out_path, output)
+    index = {
+        "columns": header,
+        "rows": report["rows"],
+        "t_min": min((d["t_min"] for d in day_index.values()), default=None),
+        "t_max": max((d["t_max"] for d in day_index.values()), default=None),
+        "size": os.path.getsize(output),
+        "days": day_index,
+        "report": report,
+    }
+    with open(f"{index_path(output)}.tmp", 'w') as f:
+        json.dump(index, f, indent=1)
+    os.replace(f"{index_path(output)}.tmp", index_path(output))
+    return report
+
+def is_compacted(path: str) -> bool:
+    """True if `path` still matches the index written when it was compacted."""
+    try:
+        with open(index_path(path)) as f:
+            return json.load(f)["size"] == os.path.getsize(path)
+    except (OSError, ValueError, KeyError):
+        return False
+
+def read_compacted(path: str, start_ms: int = None, end_ms: int = None) -> pd.DataFrame:
+    """Rows with start_ms <= timestamp < end_ms of a compacted file, reading only the days involved."""
+    with open(index_path(path)) as f:
+        index = json.load(f)
+    days = [d for d in index["days"].values()
+            if (start_ms is None or d["t_max"] >= start_ms) and (end_ms is None or d["t_min"] < end_ms)]
+    if not days:
+        return pd.DataFrame(columns=index["columns"])
+    # Days are stored in order: read from the first selected day up to the day after the last one
+    offsets = [d["offset"] for d in index["days"].values()]
+    after = offsets.index(days[-1]["offset"]) + 1
+    with open(path, 'rb') as f:
+        f.seek(days[0]["offset"])
+        raw = f.read(offsets[after] - days[0]["offset"] if after < len(offsets) else -1)
+    df = pd.read_csv(io.BytesIO(raw), header=None, names=index["columns"])
+    if start_ms is not None:
+        df = df[df['timestamp'] >= start_ms]
+    if end_ms is not None:
+        df = df[df['timestamp'] < end_ms]
+    return df.reset_index(drop=True)
+
+def print_report(path: str, report: dict):
+    print(f"{path}: {report['input_rows']:,} -> {report['rows']:,} rows in {report['seconds']}s")
+    print(f"  duplicates {report['duplicate_rows']:,}, out of order {report['out_of_order_rows']:,}, "
+          f"invalid price {report['invalid_price_rows']:,}, unparsed {report['unparsed_rows']:,}, "
+          f"misaligned {report['misaligned_rows']:,}, spikes >{SPIKE_RETURN:.0%} {report['price_spikes']:,}")
+    print(f"  gaps {report['gaps']:,} ({report['missing_candles']:,} missing candles)")
+    for start, end, missing in report["largest_gaps"][:5]:
+        print(f"    {missing:,} candles missing between {start} and {end}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Dedupe, sort and index collected 1s CSVs.")
+    parser.add_argument("paths", nargs="*", help="CSV files (default: datasets/*.csv)")
+    parser.add_argument("--output", help="Write here instead of in place (single input only)")
+    parser.add_argument("--block-mb", type=int, default=64, help="Input read per step")
+    parser.add_argument("--workers", type=int, default=None, help="Days compacted in parallel")
+    parser.add_argument("--check", action="store_true", help="Report only, write nothing")
+    parser.add_argument("--force", action="store_true", help="Also recompact files unchanged since their index")
+    args = parser.parse_args()
+
+    paths = args.paths or sorted(glob.glob(os.path.join("datasets", "*.csv")))
+    if args.output and len(paths) != 1:
+        parser.error("--output needs exactly one input file")
+    for path in paths:
+        if not args.check and not args.force and not args.output and is_compacted(path):
+            print(f"{path}: unchanged since last compaction")
+            continue
+        try:
+            print_report(path, compact_file(path, args.output, args.block_mb << 20, args.check, args.workers))
+        except (ValueError, RuntimeError) as e:
+            print(f"{path}: skipped: {e}")
@@ -2,14 +2,16 @@
 import streamlit as st
 import json
 import time
-import pandas as pd
-import plotly.graph_objs as go
 from pathlib import Path
 import os
+import trade_journal
+
+# plotly and pandas are imported just before the sections that use them, so the metrics render first
 
 # ----------------------------
 # Configuration
 # ----------------------------
+JOURNAL_FILE = "trade_journal.db"
 STATE_FILE = "shared_state.json"
 KLINE_FILE = "latest_klines.json"
 SYMBOL = "BTCUSDT"
@@ -61,6 +63,28 @@ st.markdown("""
 # ----------------------------
 # Helper Functions
 # ----------------------------
+def load_journal():
+    """Read-only snapshot of the trade journal (the engine keeps writing in WAL mode)."""
+    if not os.path.exists(JOURNAL_FILE):
+        return None
+    try:
+        conn = trade_journal.connect(JOURNAL_FILE, readonly=True)
+        try:
+            signals = trade_journal.recent_events(conn, 'signal', limit=1)
+            return {
+                "summary": trade_journal.summary(conn),
+                "open_trades": trade_journal.open_trades(conn),
+                "last_signal": signals[0] if signals else None,
+                "exits": trade_journal.recent_events(conn, 'exit', limit=20),
+                "win_rate": trade_journal.win_rate_by_symbol_hour(conn),
+                "slippage": trade_journal.slippage_by_symbol(conn),
+                "latency": trade_journal.signal_to_fill_latency(conn),
+            }
+        finally:
+            conn.close()
+    except Exception:
+        return None
+
 def load_state():
     if os.path.exists(STATE_FILE):
         try:
@@ -98,7 +122,7 @@ if st.button("🔄 Refresh Now"):
     st.rerun()
 
 # Load data
-state = load_state()
+journal = load_journal()
 kline_data = load_klines()
 
 # ----------------------------
@@ -106,15 +130,18 @@ kline_data = load_klines()
 # ----------------------------
 col1, col2, col3, col4 = st.columns(4)
 
-portfolio = state.get("portfolio_value_usdt", 1000.0)
-pnl_pct = state.get("total_pnl_pct", 0.0)
-daily_pnl = state.get("daily_pnl_pct", 0.0)
-status = state.get("status", "unknown")
+summary = journal["summary"] if journal else {}
+# Journal equity after the first exit; before that the engine's state (seeded from the account)
+portfolio = summary.get("equity") or load_state().get("portfolio_value_usdt", 1000.0)
+pnl_usdt = summary.get("pnl_usdt", 0.0)
+daily_pnl_usdt = summary.get("daily_pnl_usdt", 0.0)
+pnl_pct = pnl_usdt / (portfolio - pnl_usdt) * 100
+daily_pnl = daily_pnl_usdt / (portfolio - daily_pnl_usdt) * 100
 
 col1.metric("Portfolio (USDT)", f"${portfolio:,.2f}")
 col2.metric("Total PnL", f"{pnl_pct:+.2f}%", delta_color="normal")
 col3.metric("Daily PnL", f"{daily_pnl:+.2f}%", delta_color="normal")
-col4.metric("Status", status.upper())
+col4.metric("Win Rate", f"{summary.get('win_rate', 0.0):.1%} ({summary.get('trades', 0)} trades)")
 
 # ----------------------------
 # Candlestick Chart
@@ -123,15 +150,14 @@ st.subheader("Price Chart (1s)")
 if kline_data and "klines" in kline_data:
     klines = kline_data["klines"]
     if len(klines) > 0:
-        df = pd.DataFrame(klines)
-        df['time'] = pd.to_datetime(df['t'], unit='ms')
-        
+        import plotly.graph_objs as go
+
         fig = go.Figure(data=go.Candlestick(
-            x=df['time'],
-            open=df['o'],
-            high=df['h'],
-            low=df['l'],
-            close=df['c'],
+            x=[k['t'] for k in klines],  # Epoch ms on a date axis
+            open=[k['o'] for k in klines],
+            high=[k['h'] for k in klines],
+            low=[k['l'] for k in klines],
+            close=[k['c'] for k in klines],
             increasing_line_color='#4dff4d',
             decreasing_line_color='#ff4d4d'
         ))
@@ -140,6 +166,7 @@ if kline_data and "klines" in kline_data:
             plot_bgcolor='#000000',
             paper_bgcolor='#000000',
             xaxis=dict(
+                type='date',
                 showgrid=False,
                 color='white'
             ),
@@ -160,12 +187,13 @@ else:
 # Active Position & Signal (same as before)
 # ----------------------------
 st.subheader("Active Position")
-pos = state.get("active_position")
-if pos:
+open_trades = journal["open_trades"] if journal else []
+if open_trades:
+    pos = open_trades[0]
     side = pos["side"]
-    qty = pos["quantity"]
-    entry = pos["entry_price"]
-    open_time = pos["open_time"]
+    qty = pos["qty"]
+    entry = pos["price"]
+    open_time = pos["ts"]
     st.markdown(f"""
     - **Side**: {format_side(side)}
     - **Size**: {qty:.6f} BTC
@@ -176,12 +204,12 @@ else:
     st.info("No active position")
 
 st.subheader("Last Signal")
-signal = state.get("last_signal")
+signal = journal["last_signal"] if journal else None
 if signal:
     side = signal["side"]
     conf = signal["confidence"]
     price = signal["price"]
-    ts = signal["time"]
+    ts = signal["ts"]
     st.markdown(f"""
     - **Action**: {format_side(side)}
     - **Confidence**: {conf:.2%}
@@ -191,13 +219,29 @@ if signal:
 else:
     st.info("No signal yet")
 
-st.subheader("Log")
-errors = state.get("errors", [])
-if errors:
-    for err in errors[-5:]:
-        st.warning(err)
+import pandas as pd  # Only the tables below use it; the metrics and chart render first
+
+st.subheader("Recent Trades")
+if journal and journal["exits"]:
+    trades = pd.DataFrame(journal["exits"])
+    trades['time'] = pd.to_datetime(trades['ts'], unit='s')
+    st.dataframe(trades[['time', 'symbol', 'reason', 'price', 'qty', 'pnl_usdt']], use_container_width=True)
 else:
-    st.success("No errors")
+    st.info("No closed trades yet")
+
+st.subheader("Execution Quality")
+if journal and journal["win_rate"]:
+    st.markdown("**Win rate by symbol / UTC hour**")
+    st.dataframe(pd.DataFrame(journal["win_rate"], columns=['symbol', 'hour', 'trades', 'win_rate', 'pnl_usdt']),
+                 use_container_width=True)
+if journal and journal["slippage"]:
+    st.markdown("**Slippage vs signal price**")
+    st.dataframe(pd.DataFrame(journal["slippage"], columns=['symbol', 'kind', 'fills', 'slippage_bps']),
+                 use_container_width=True)
+if journal and journal["latency"]:
+    lat = journal["latency"]
+    st.markdown(f"**Signal → fill latency**: p50 {lat['p50'] * 1000:.0f} ms | "
+                f"p99 {lat['p99'] * 1000:.0f} ms | max {lat['max'] * 1000:.0f} ms ({lat['count']} fills)")
 
 # ----------------------------
 # Auto-refresh
@@ -0,0 +1,283 @@
+# TARGET_FILE: data/agg_trades.py
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional
+import numpy as np
+import websockets
+
+def parse_bar_spec(spec: str):
+    """
+    '100ms' / '250ms' / '1s' -> ('time', milliseconds)
+    'vol:0.5'                -> ('volume', base-asset quantity per bar)
+    'tick:100'               -> ('tick', trades per bar)
+    """
+    if spec.startswith('vol:'):
+        return 'volume', float(spec[4:])
+    if spec.startswith('tick:'):
+        return 'tick', int(spec[5:])
+    if spec.endswith('ms'):
+        return 'time', int(spec[:-2])
+    if spec.endswith('s'):
+        return 'time', int(float(spec[:-1]) * 1000)
+    raise ValueError(f"Unknown bar spec: {spec}")
+
+class TradeBarBuilder:
+    """
+    Vectorized bar builder. Trades are appended in batches; completed bars are
+    cut with one pass of numpy reductions per batch, and the still-open bar's
+    trades are carried over to the next batch.
+    Bars use the compact kline dict shape ({'t','o','h','l','c','v'}) so they
+    feed the same feature pipeline as 1s klines.
+    """
+    def __init__(self, spec: str):
+        self.spec = spec
+        self.mode, self.size = parse_bar_spec(spec)
+        self.ts = np.empty(0, dtype=np.int64)
+        self.px = np.empty(0, dtype=np.float64)
+        self.qty = np.empty(0, dtype=np.float64)
+        self.last_close: Optional[float] = None
+        self.next_time_bar: Optional[int] = None
+        self.volume_offset = 0.0  # Volume traded before the buffered trades
+        self.count_offset = 0     # Trades seen before the buffered trades
+
+    def add_trades(self, ts: np.ndarray, px: np.ndarray, qty: np.ndarray) -> List[dict]:
+        """Append trades (time-ordered) and return the bars they complete."""
+        if self.mode == 'time' and self.next_time_bar is not None:
+            ts = np.maximum(ts, self.next_time_bar)  # Late trades join the open bar
+        self.ts = np.concatenate((self.ts, ts))
+        self.px = np.concatenate((self.px, px))
+        self.qty = np.concatenate((self.qty, qty))
+        return self._cut(closed_before_ms=None)
+
+    def flush(self, now_ms: int) -> List[dict]:
+        """Close time bars that ended before `now_ms`, even if no trade has arrived since."""
+        if self.mode != 'time':
+            return []
+        return self._cut(closed_before_ms=now_ms)
+
+    def _bar_ids(self) -> np.ndarray:
+        if self.mode == 'time':
+            return self.ts // self.size
+        if self.mode == 'tick':
+            return (self.count_offset + np.arange(len(self.ts))) // self.size
+        # Volume bars: the bar a trade lands in is set by volume traded before it
+        traded_before = self.volume_offset + np.cumsum(self.qty) - self.qty
+        return (traded_before // self.size).astype(np.int64)
+
+    def _cut(self, closed_before_ms: Optional[int]) -> List[dict]:
+        if len(self.ts) == 0:
+            return self._empty_time_bars(closed_before_ms) if closed_before_ms else []
+
+        ids = self._bar_ids()
+        if self.mode == 'time' and closed_before_ms is not None and closed_before_ms // self.size > ids[-1]:
+            n_done = len(ids)  # Even the newest bar is over
+        elif self.mode == 'volume' and self.volume_offset + np.sum(self.qty) >= (ids[-1] + 1) * self.size:
+            n_done = len(ids)  # The newest bar's volume reached its boundary
+        elif self.mode == 'tick' and (self.count_offset + len(ids)) % self.size == 0:
+            n_done = len(ids)
+        else:
+            n_done = int(np.searchsorted(ids, ids[-1]))
+        if n_done == 0:
+            return []
+
+        done_ids = ids[:n_done]
+        starts = np.flatnonzero(np.r_[True, done_ids[1:] != done_ids[:-1]])
+        ends = np.r_[starts[1:], n_done] - 1
+        px, qty = self.px[:n_done], self.qty[:n_done]
+        opens, closes = px[starts], px[ends]
+        highs = np.maximum.reduceat(px, starts)
+        lows = np.minimum.reduceat(px, starts)
+        vols = np.add.reduceat(qty, starts)
+        if self.mode == 'time':
+            times = done_ids[starts] * self.size
+        else:
+            times = self.ts[:n_done][starts]
+
+        bars = []
+        for t, o, h, l, c, v in zip(times.tolist(), opens.tolist(), highs.tolist(),
+                                    lows.tolist(), closes.tolist(), vols.tolist()):
+            if self.mode == 'time':
+                bars.extend(self._gap_bars(t))
+                self.next_time_bar = t + self.size
+            bars.append({'t': t, 'o': o, 'h': h, 'l': l, 'c': c, 'v': v})
+            self.last_close = c
+
+        self.volume_offset += float(np.sum(qty))
+        self.count_offset += n_done
+        self.ts, self.px, self.qty = self.ts[n_done:], self.px[n_done:], self.qty[n_done:]
+        if closed_before_ms is not None and len(self.ts) == 0:
+            bars.extend(self._empty_time_bars(closed_before_ms))
+        return bars
+
+    def _gap_bars(self, until_t: int) -> List[dict]:
+        """Flat zero-volume bars for quiet intervals, like Binance 1s klines."""
+        if self.next_time_bar is None or self.last_close is None:
+            return []
+        c = self.last_close
+        return [{'t': t, 'o': c, 'h': c, 'l': c, 'c': c, 'v': 0.0}
+                for t in range(self.next_time_bar, until_t, self.size)]
+
+    def _empty_time_bars(self, closed_before_ms: int) -> List[dict]:
+        if self.mode != 'time' or self.next_time_bar is None:
+            return []
+        until_t = (closed_before_ms // self.size) * self.size
+        bars = self._gap_bars(until_t)
+        if bars:
+            self.next_time_bar = until_t
+        return bars
+
+class AggTradeStream:
+    def __init__(self, symbols: list, bar_specs: list, maxlen: int = 600,
+                 flush_interval: float = 0.05, close_delay_ms: int = 250,
+                 ws_url: str = "wss://stream.binance.com:9443"):
+        """
+        Stream aggTrades for many symbols over one combined websocket and build
+        bars for every spec in `bar_specs` (e.g. ['100ms', '250ms', 'vol:1.0']).
+        The receive loop only queues raw frames; a separate task parses them
+        in batches every `flush_interval` seconds, so bursts never stall the socket.
+        """
+        self.symbols = [s.lower() for s in symbols]
+        self.bar_specs = list(bar_specs)
+        self.maxlen = maxlen
+        self.flush_interval = flush_interval
+        self.close_delay_ms = close_delay_ms
+        self.ws_url = ws_url.rstrip('/')
+        self.builders: Dict[str, Dict[str, TradeBarBuilder]] = {
+            sym: {spec: TradeBarBuilder(spec) for spec in self.bar_specs} for sym in self.symbols
+        }
+        self.bars: Dict[str, Dict[str, Deque[dict]]] = {
+            sym: {spec: deque(maxlen=maxlen) for spec in self.bar_specs} for sym in self.symbols
+        }
+        self._raw: List[str] = []
+        self.price_listeners: list = []
+        self.trades_processed = 0
+        self.metrics = None  # Optional LatencyRecorder
+        self.last_frame_ns: Dict[str, int] = {}
+        self.running = False
+        self._ws = None
+        self._resubscribing = False
+        self._close_task = None
+        self.logger = logging.getLogger("BinanceAggTrades")
+
+    def process_frames(self, frames: List[str], now_ms: Optional[int] = None):
+        """Parse a batch of raw frames in one json.loads call and update all bars."""
+        metrics = self.metrics
+        t0 = metrics.clock() if metrics else 0
+        if frames:
+            try:
+                payloads = json.loads('[' + ','.join(frames) + ']')
+            except ValueError:
+                payloads = []
+                for frame in frames:
+                    try:
+                        payloads.append(json.loads(frame))
+                    except ValueError:
+                        self.logger.error("Dropping malformed aggTrade frame")
+            by_symbol: Dict[str, list] = {}
+            for p in payloads:
+                data = p.get('data', p)
+                if data.get('e') == 'aggTrade':
+                    by_symbol.setdefault(data['s'].lower(), []).append(data)
+            for symbol, trades in by_symbol.items():
+                if symbol not in self.builders:
+                    continue
+                ts = np.fromiter((t['T'] for t in trades), dtype=np.int64, count=len(trades))
+                px = np.array([t['p'] for t in trades], dtype=np.float64)
+                qty = np.array([t['q'] for t in trades], dtype=np.float64)
+                for spec, builder in self.builders[symbol].items():
+                    self.bars[symbol][spec].extend(builder.add_trades(ts, px, qty))
+                self.trades_processed += len(trades)
+                if metrics:
+                    self.last_frame_ns[symbol] = metrics.since('ws_to_store', t0)
+                for listener in self.price_listeners:
+                    listener(symbol, float(px[-1]))
+        if now_ms is not None:
+            for symbol, builders in self.builders.items():
+                for spec, builder in builders.items():
+                    self.bars[symbol][spec].extend(builder.flush(now_ms))
+
+    async def _process_loop(self):
+        while self.running:
+            await asyncio.sleep(self.flush_interval)
+            frames, self._raw = self._raw, []
+            # Close quiet time bars by wall clock, leaving `close_delay_ms` for in-flight trades
+            self.process_frames(frames, now_ms=int(time.time() * 1000) - self.close_delay_ms)
+
+    async def _receive_loop(self):
+        while self.running:
+            if not self.symbols:
+                await asyncio.sleep(0.5)
+                continue
+            streams = "/".join(f"{sym}@aggTrade" for sym in self.symbols)
+            stream_url = f"{self.ws_url}/stream?streams={streams}"
+            try:
+                async with websockets.connect(stream_url, max_queue=None) as ws:
+                    self._ws = ws
+                    self.logger.info(f"Connected to aggTrade stream for {len(self.symbols)} symbols")
+                    async for msg in ws:
+                        self._raw.append(msg)
+                        if not self.running:
+                            break
+                if self._resubscribing:  # Closed by set_symbols
+                    self._resubscribing = False
+            except Exception as e:
+                if self._resubscribing:
+                    self._resubscribing = False
+                    continue
+                self.logger.error(f"aggTrade WS error: {e}, reconnecting in 2s...")
+                await asyncio.sleep(2)
+            finally:
+                self._ws = None
+
+    async def start(self):
+        self.running = True
+        await asyncio.gather(self._receive_loop(), self._process_loop())
+
+    def stop(self):
+        self.running = False
+
+    def set_symbols(self, symbols: list):
+        """Stream `symbols` from now on: new ones start with empty bars; the combined stream reconnects."""
+        self.symbols = [s.lower() for s in symbols]
+        for sym in self.symbols:
+            if sym not in self.builders:
+                self.builders[sym] = {spec: TradeBarBuilder(spec) for spec in self.bar_specs}
+                self.bars[sym] = {spec: deque(maxlen=self.maxlen) for spec in self.bar_specs}
+        for sym in list(self.builders):
+            if sym not in self.symbols:
+                del self.builders[sym], self.bars[sym]
+                self.last_frame_ns.pop(sym, None)
+        if self._ws is not None:
+            self._resubscribing = True
+            self._close_task = asyncio.get_running_loop().create_task(self._ws.close())
+
+    def add_price_listener(self, listener):
+        """Call `listener(symbol, last_trade_price)` once per symbol per processed batch."""
+        self.price_listeners.append(listener)
+
+    def get_klines_array(self, symbol: str, n: int = 10, bar: Optional[str] = None) -> List[dict]:
+        """Last n bars of `bar` spec (default: first spec) as list of dicts."""
+        per_spec = self.bars.get(symbol.lower())
+        if not per_spec:
+            return []
+        dq = per_spec[bar or self.bar_specs[0]]
+        return list(dq)[-n:]
+
+    def bar_view(self, spec: str) -> "BarView":
+        return BarView(self, spec)
+
+class BarView:
+    """Kline-store interface over one bar spec, so engines can swap clocks."""
+    def __init__(self, stream: AggTradeStream, spec: str):
+        self.stream = stream
+        self.spec = spec
+
+    def get_klines_array(self, symbol: str, n: int = 10) -> List[dict]:
+        return self.stream.get_klines_array(symbol, n, bar=self.spec)
+
+    def get_latest_kline(self, symbol: str):
+        bars = self.get_klines_array(symbol, n=1)
+        return bars[-1] if bars else None
@@ -1,25 +1,71 @@
 import asyncio
 import json
 import logging
+import urllib.parse
 from collections import deque
-from typing import Dict, Deque
+from typing import Callable, Dict, Deque, List, Optional, Tuple, Union
 import websockets
+from data.tick_store import TickKlineBuffer
+
+PriceListener = Callable[[str, float], None]
+
+def market_rest_url(settings: dict) -> Optional[str]:
+    """
+    Public REST base serving the same market data as `binance.stream_url`
+    (depth snapshots, kline backfill): `binance.market_rest_url` when set,
+    Binance's own for its public streams, None for a local or synthetic one.
+    """
+    binance = settings['binance']
+    if 'market_rest_url' in binance:
+        return binance['market_rest_url']
+    host = urllib.parse.urlsplit(binance.get('stream_url', "wss://stream.binance.com:9443")).hostname or ""
+    if host.endswith("testnet.binance.vision"):
+        return "https://testnet.binance.vision"
+    if host.endswith("binance.com"):
+        return "https://api.binance.com"
+    return None
 
 class BinanceKlineStream:
-    def __init__(self, symbols: list, interval: str = '1s', maxlen: int = 60):
+    def __init__(self, symbols: list, interval: str = '1s', maxlen: int = 60,
+                 ws_url: str = "wss://stream.binance.com:9443", tick_sizes: Optional[Dict[str, float]] = None):
         """
         Stream 1s klines from Binance Mainnet (public data, no auth needed).
-        Stores last `maxlen` klines per symbol in a deque.
+        Stores last `maxlen` klines per symbol: as int64 tick columns
+        (TickKlineBuffer, also read by `get_columns`) for symbols in
+        `tick_sizes`, in a deque of dicts otherwise.
         """
         self.symbols = [s.lower() for s in symbols]
         self.interval = interval
-        self.klines: Dict[str, Deque[dict]] = {
-            sym: deque(maxlen=maxlen) for sym in self.symbols
+        self.maxlen = maxlen
+        self.ws_url = ws_url.rstrip('/')
+        ticks_by_symbol = {s.lower(): tick for s, tick in (tick_sizes or {}).items()}
+        self.klines: Dict[str, Union[Deque[dict], TickKlineBuffer]] = {
+            sym: self._new_buffer(sym, ticks_by_symbol) for sym in self.symbols
         }
+        self.price_listeners: List[PriceListener] = []
+        self.kline_listeners: List[Callable[[str, dict], None]] = []
+        self.metrics = None  # Optional LatencyRecorder
+        self.last_frame_ns: Dict[str, int] = {}
         self.running = False
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._stopped = asyncio.Event()
         self.logger = logging.getLogger("BinanceWS")
 
+    def _new_buffer(self, symbol: str, ticks_by_symbol: Dict[str, float]):
+        tick = ticks_by_symbol.get(symbol)
+        return TickKlineBuffer(self.maxlen, tick) if tick is not None else deque(maxlen=self.maxlen)
+
+    def add_price_listener(self, listener: PriceListener):
+        """Call `listener(symbol, close)` on every kline update, after it is stored and passed to the kline listeners."""
+        self.price_listeners.append(listener)
+
+    def add_kline_listener(self, listener: Callable[[str, dict], None]):
+        """Call `listener(symbol, kline)` with every stored kline (e.g. to mirror it elsewhere)."""
+        self.kline_listeners.append(listener)
+
     async def _handle_message(self, msg: str, symbol: str):
+        metrics = self.metrics
+        t0 = metrics.clock() if metrics else 0
         try:
             data = json.loads(msg)
             if 'k' in data:
@@ -32,14 +78,30 @@ class BinanceKlineStream:
                     'l': float(kline['l']),
                     'c': float(kline['c']),
                     'v': float(kline['v']),
+                    'x': kline['x'],  # Final update of this kline
                 }
-                self.klines[symbol].append(compact_kline)
+                buf = self.klines[symbol]
+                if type(buf) is TickKlineBuffer:
+                    if not buf.write(compact_kline):
+                        return  # Older than a restored/backfilled kline
+                elif buf and compact_kline['t'] <= buf[-1]['t']:
+                    if compact_kline['t'] < buf[-1]['t']:
+                        return
+                    buf[-1] = compact_kline  # Update of the last kline (e.g. after a backfill)
+                else:
+                    buf.append(compact_kline)
+                for listener in self.kline_listeners:
+                    listener(symbol, compact_kline)
+                if metrics:
+                    self.last_frame_ns[symbol] = metrics.since('ws_to_store', t0)
+                for listener in self.price_listeners:
+                    listener(symbol, compact_kline['c'])
         except Exception as e:
             self.logger.error(f"Error parsing kline for {symbol}: {e}")
 
     async def _stream_symbol(self, symbol: str):
         # ✅ Use MAINNET WebSocket (public, no auth, supports 1s klines)
-        stream_url = f"wss://stream.binance.com:9443/ws/{symbol}@kline_{self.interval}"
+        stream_url = f"{self.ws_url}/ws/{symbol}@kline_{self.interval}"
         while self.running:
             try:
                 async with websockets.connect(stream_url) as ws:
@@ -53,18 +115,137 @@ class BinanceKlineStream:
 
     async def start(self):
         self.running = True
-        tasks = [self._stream_symbol(sym) for sym in self.symbols]
-        await asyncio.gather(*tasks)
+        self._stopped.clear()
+        self._tasks = {sym: asyncio.create_task(self._stream_symbol(sym)) for sym in self.symbols}
+        try:
+            await self._stopped.wait()
+        finally:
+            for task in self._tasks.values():
+                task.cancel()
 
     def stop(self):
         self.running = False
+        self._stopped.set()
+
+    def set_symbols(self, symbols: list, tick_sizes: Optional[Dict[str, float]] = None):
+        """
+        Stream `symbols` from now on: new ones get an empty buffer (int64 tick
+        columns when in `tick_sizes`) and a connection, dropped ones lose both.
+        """
+        symbols = [s.lower() for s in symbols]
+        ticks_by_symbol = {s.lower(): tick for s, tick in (tick_sizes or {}).items()}
+        for sym in symbols:
+            if sym in self.klines:
+                continue
+            self.klines[sym] = self._new_buffer(sym, ticks_by_symbol)
+            if self.running:
+                self._tasks[sym] = asyncio.get_running_loop().create_task(self._stream_symbol(sym))
+        for sym in self.symbols:
+            if sym not in symbols:
+                task = self._tasks.pop(sym, None)
+                if task:
+                    task.cancel()
+                del self.klines[sym]
+                self.last_frame_ns.pop(sym, None)
+        self.symbols = symbols
+
+    def seed(self, symbol: str, klines: List[dict]):
+        """Put older `klines` (oldest first) in front of whatever has streamed in, e.g. on warm restart."""
+        buf = self.klines[symbol.lower()]
+        live = list(buf)
+        if live:
+            klines = [k for k in klines if k['t'] < live[0]['t']]
+        klines = (klines + live)[-self.maxlen:]
+        if type(buf) is TickKlineBuffer:
+            buf.reset(klines)
+        else:
+            buf.clear()
+            buf.extend(klines)
 
     def get_latest_kline(self, symbol: str):
         """Get most recent kline (dict) or None."""
-        dq = self.klines.get(symbol.lower())
-        return dq[-1] if dq else None
+        buf = self.klines.get(symbol.lower())
+        if type(buf) is TickKlineBuffer:
+            return buf.klines(1)[0] if buf else None
+        return buf[-1] if buf else None
 
     def get_klines_array(self, symbol: str, n: int = 10):
         """Get last n klines as list of dicts."""
-        dq = self.klines.get(symbol.lower())
-        return list(dq)[-n:] if dq else []
\ No newline at end of file
+        buf = self.klines.get(symbol.lower())
+        if type(buf) is TickKlineBuffer:
+            return buf.klines(n)
+        return list(buf)[-n:] if buf else []
+
+    def get_columns(self, symbol: str, n: int):
+        """Last n klines as int64 tick columns (see TickKlineBuffer), or None."""
+        buf = self.klines.get(symbol.lower())
+        return buf.last(n) if type(buf) is TickKlineBuffer else None
+
+class BinanceBookTickerStream:
+    def __init__(self, symbols: list, ws_url: str = "wss://stream.binance.com:9443"):
+        """
+        Real-time best bid/ask for many symbols over one combined stream.
+        Listeners get the mid price on every top-of-book change.
+        """
+        self.symbols = [s.lower() for s in symbols]
+        self.ws_url = ws_url.rstrip('/')
+        self.quotes: Dict[str, Tuple[float, float]] = {}
+        self.price_listeners: List[PriceListener] = []
+        self.running = False
+        self._ws = None
+        self._resubscribing = False
+        self._close_task = None
+        self.logger = logging.getLogger("BinanceBookTicker")
+
+    def add_price_listener(self, listener: PriceListener):
+        self.price_listeners.append(listener)
+
+    async def _handle_message(self, msg: str):
+        try:
+            data = json.loads(msg)
+            data = data.get('data', data)
+            symbol = data['s'].lower()
+            bid, ask = float(data['b']), float(data['a'])
+            self.quotes[symbol] = (bid, ask)
+            mid = (bid + ask) / 2
+            for listener in self.price_listeners:
+                listener(symbol, mid)
+        except Exception as e:
+            self.logger.error(f"Error parsing book ticker: {e}")
+
+    async def start(self):
+        self.running = True
+        while self.running:
+            if not self.symbols:
+                await asyncio.sleep(0.5)
+                continue
+            streams = "/".join(f"{sym}@bookTicker" for sym in self.symbols)
+            stream_url = f"{self.ws_url}/stream?streams={streams}"
+            try:
+                async with websockets.connect(stream_url) as ws:
+                    self._ws = ws
+                    self.logger.info(f"Connected to book ticker for {len(self.symbols)} symbols")
+                    while self.running:
+                        msg = await ws.recv()
+                        await self._handle_message(msg)
+            except Exception as e:
+                if self._resubscribing:
+                    self._resubscribing = False
+                    continue
+                self.logger.error(f"Book ticker WS error: {e}, reconnecting in 2s...")
+                await asyncio.sleep(2)
+            finally:
+                self._ws = None
+
+    def stop(self):
+        self.running = False
+
+    def set_symbols(self, symbols: list):
+        """Stream `symbols` from now on; the combined stream reconnects with the new list."""
+        self.symbols = [s.lower() for s in symbols]
+        for sym in list(self.quotes):
+            if sym not in self.symbols:
+                del self.quotes[sym]
+        if self._ws is not None:
+            self._resubscribing = True
+            self._close_task = asyncio.get_running_loop().create_task(self._ws.close())
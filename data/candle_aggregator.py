@@ -0,0 +1,126 @@
+# TARGET_FILE: data/candle_aggregator.py
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+
+FIELDS = ('t', 'o', 'h', 'l', 'c', 'v')
+_UNIT_SECONDS = {'s': 1, 'm': 60, 'h': 3600}
+
+def timeframe_seconds(timeframe: str) -> int:
+    """'5s' -> 5, '1m' -> 60."""
+    return int(timeframe[:-1]) * _UNIT_SECONDS[timeframe[-1]]
+
+class CandleRing:
+    """
+    Fixed-capacity ring of closed candles. Every row is written twice (at i and
+    i + capacity), so the last n rows are always one contiguous slice: reads
+    are numpy views, appends are O(1).
+    """
+    __slots__ = ("capacity", "data", "count")
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.data = np.zeros((len(FIELDS), 2 * capacity), dtype=np.float64)
+        self.count = 0
+
+    def append(self, row):
+        i = self.count % self.capacity
+        self.data[:, i] = row
+        self.data[:, i + self.capacity] = row
+        self.count += 1
+
+    def last(self, n: int) -> Optional[Dict[str, np.ndarray]]:
+        if self.count < n or n > self.capacity:
+            return None
+        end = self.count % self.capacity + self.capacity
+        return {f: self.data[j, end - n:end] for j, f in enumerate(FIELDS)}
+
+class CandleAggregator:
+    def __init__(self, symbols: List[str], timeframes: Dict[str, int], base_interval_ms: int = 1000):
+        """
+        Rolls 1s klines into higher timeframes as they close. `timeframes` maps
+        e.g. '5s' / '1m' to how many closed candles to keep. Feed it with
+        `on_kline` (a kline listener); each update costs O(1) per timeframe.
+
+        A 1s kline is taken as final when it arrives with x=True or when a
+        later one arrives; repeated updates of the same second replace each
+        other, and anything older than the last final kline is ignored.
+        """
+        self.symbols = [s.lower() for s in symbols]
+        self.base_ms = base_interval_ms
+        self.timeframes = {tf: timeframe_seconds(tf) * 1000 for tf in timeframes}
+        self.capacities = dict(timeframes)
+        self.rings = {s: {tf: CandleRing(n) for tf, n in timeframes.items()} for s in self.symbols}
+        self.forming = {s: {tf: None for tf in timeframes} for s in self.symbols}  # [start, o, h, l, c, v]
+        self.pending: Dict[str, Optional[dict]] = {s: None for s in self.symbols}
+        self.last_final_t: Dict[str, int] = {s: -1 for s in self.symbols}
+
+    def on_kline(self, symbol: str, kline: dict):
+        pending = self.pending[symbol]
+        if kline['t'] <= self.last_final_t[symbol]:
+            return  # Duplicate of a kline already rolled up
+        if pending is not None and kline['t'] > pending['t']:
+            self._commit(symbol, pending)
+        if kline.get('x', False):
+            self._commit(symbol, kline)
+            self.pending[symbol] = None
+        else:
+            self.pending[symbol] = kline
+
+    def _commit(self, symbol: str, kline: dict):
+        t = kline['t']
+        self.last_final_t[symbol] = t
+        rings, forming = self.rings[symbol], self.forming[symbol]
+        for tf, tf_ms in self.timeframes.items():
+            start = t - t % tf_ms
+            candle = forming[tf]
+            if candle is not None and candle[0] != start:
+                rings[tf].append(candle)  # A second was skipped: close on the next bucket's first kline
+                candle = None
+            if candle is None:
+                candle = forming[tf] = [start, kline['o'], kline['h'], kline['l'], kline['c'], kline['v']]
+            else:
+                if kline['h'] > candle[2]:
+                    candle[2] = kline['h']
+                if kline['l'] < candle[3]:
+                    candle[3] = kline['l']
+                candle[4] = kline['c']
+                candle[5] += kline['v']
+            if t + self.base_ms >= start + tf_ms:
+                rings[tf].append(candle)  # Last second of the bucket
+                forming[tf] = None
+
+    def get_columns(self, symbol: str, timeframe: str, n: int) -> Optional[Dict[str, np.ndarray]]:
+        """Last n closed `timeframe` candles as column views, or None until that many have closed."""
+        rings = self.rings.get(symbol.lower())
+        return rings[timeframe].last(n) if rings else None
+
+    def frames(self, symbol: str, windows: Dict[str, int]) -> Optional[Dict[str, Dict[str, np.ndarray]]]:
+        """{timeframe: columns} for every window, or None if any is still warming up."""
+        out = {}
+        for tf, n in windows.items():
+            cols = self.get_columns(symbol, tf, n)
+            if cols is None:
+                return None
+            out[tf] = cols
+        return out
+
+    def set_symbols(self, symbols: List[str]):
+        """Roll up `symbols` from now on: new ones start empty, dropped ones are forgotten."""
+        self.symbols = [s.lower() for s in symbols]
+        for symbol in self.symbols:
+            if symbol not in self.rings:
+                self.rings[symbol] = {tf: CandleRing(n) for tf, n in self.capacities.items()}
+                self.reset(symbol)
+        for symbol in list(self.rings):
+            if symbol not in self.symbols:
+                del self.rings[symbol], self.forming[symbol], self.pending[symbol], self.last_final_t[symbol]
+
+    def reset(self, symbol: str, klines: Iterable[dict] = ()):
+        """Rebuild `symbol` from final klines (e.g. restored ones), oldest first."""
+        symbol = symbol.lower()
+        self.rings[symbol] = {tf: CandleRing(r.capacity) for tf, r in self.rings[symbol].items()}
+        self.forming[symbol] = {tf: None for tf in self.timeframes}
+        self.pending[symbol] = None
+        self.last_final_t[symbol] = -1
+        for kline in klines:
+            self.on_kline(symbol, kline)
@@ -0,0 +1,201 @@
+# TARGET_FILE: data/dataset_cache.py
+"""
+Content-addressed cache of featurized and labeled datasets. An entry is a
+directory of .npy arrays (opened memory-mapped) named by a hash of what
+produced it:
+
+    features: source content + feature set  -> t, close, X (float32)
+    labels:   source content + feature set + labeling parameters and code -> y, fwd
+
+so a labeling sweep recomputes only labels, and an unchanged experiment
+only maps files. Reads refresh an entry's mtime; when the cache grows past
+`max_bytes` the least recently used entries are deleted.
+"""
+import hashlib
+import inspect
+import json
+import logging
+import os
+import shutil
+import time
+from typing import Dict, NamedTuple, Optional, Union
+import numpy as np
+import yaml
+
+logger = logging.getLogger("DatasetCache")
+
+CACHE_DIR = os.path.join("datasets", ".cache", "features")
+
+class StoreSlice(NamedTuple):
+    """A DatasetStore range as a dataset source: start_ms <= t < end_ms (None = open)."""
+    root: str
+    symbol: str
+    interval: str = "1s"
+    start_ms: Optional[int] = None
+    end_ms: Optional[int] = None
+
+def cache_key(*parts) -> str:
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()[:32]
+
+def feature_set_key(pipeline) -> str:
+    """The pipeline's feature names plus the feature code itself, so editing a feature invalidates."""
+    from strategies import scalping_features
+    return cache_key(pipeline.names, hashlib.sha256(inspect.getsource(scalping_features).encode()).hexdigest())
+
+def labeling_key(labeling) -> str:
+    """Labeling parameters plus the labeling code, like feature_set_key."""
+    from data import labeling as labeling_module
+    return cache_key(labeling, hashlib.sha256(inspect.getsource(labeling_module).encode()).hexdigest())
+
+class DatasetCache:
+    def __init__(self, root: str = CACHE_DIR, max_bytes: int = 5 * 1024 ** 3):
+        self.root = root
+        self.max_bytes = max_bytes
+
+    @classmethod
+    def from_settings(cls, config_path: str = "settings.yaml") -> "DatasetCache":
+        with open(config_path) as f:
+            cfg = (yaml.safe_load(f) or {}).get('dataset_cache', {})
+        return cls(cfg.get('dir', CACHE_DIR), int(cfg.get('max_gb', 5) * 1024 ** 3))
+
+    def _entry(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def get(self, key: str) -> Optional[Dict[str, np.ndarray]]:
+        """The entry's arrays memory-mapped read-only, or None."""
+        path = self._entry(key)
+        try:
+            with open(os.path.join(path, "meta.json")) as f:
+                names = json.load(f)["arrays"]
+            arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r') for name in names}
+        except (OSError, ValueError, KeyError):
+            return None
+        os.utime(os.path.join(path, "meta.json"))  # LRU clock
+        return arrays
+
+    def put(self, key: str, arrays: Dict[str, np.ndarray], **meta) -> Dict[str, np.ndarray]:
+        """Store arrays under `key` (atomically: written aside, then renamed) and return them mapped."""
+        path = self._entry(key)
+        if os.path.isdir(path) and self.get(key) is None:
+            shutil.rmtree(path, ignore_errors=True)  # Left incomplete by a crash
+        tmp = f"{path}.{os.getpid()}.tmp"
+        os.makedirs(tmp, exist_ok=True)
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp, f"{name}.npy"), np.ascontiguousarray(array))
+        with open(os.path.join(tmp, "meta.json"), 'w') as f:
+            json.dump({"arrays": list(arrays), "created": time.time(), **meta}, f, default=str)
+        try:
+            os.rename(tmp, path)
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)  # Another process stored the same entry first
+        self.evict(keep=key)
+        return self.get(key)
+
+    def evict(self, keep: Optional[str] = None):
+        """Delete least recently used entries until the cache fits in max_bytes."""
+        if not os.path.isdir(self.root):
+            return
+        entries = []
+        for name in os.listdir(self.root):
+            path = self._entry(name)
+            meta = os.path.join(path, "meta.json")
+            if name.endswith(".tmp") or not os.path.exists(meta):
+                continue
+            size = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+            entries.append((os.path.getmtime(meta), size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if name == keep:
+                continue
+            shutil.rmtree(self._entry(name), ignore_errors=True)
+            total -= size
+            logger.info(f"Evicted dataset cache entry {name} ({size / 1e6:.1f} MB)")
+
+    def source_key(self, source: Union[str, StoreSlice]) -> str:
+        """
+        Content hash of a dataset source. A CSV's sha256 is remembered by
+        (size, mtime) so unchanged files are hashed once; a store range is
+        identified by its index entries and partition files.
+        """
+        if isinstance(source, StoreSlice):
+            from data.dataset_store import DatasetStore
+            store = DatasetStore(source.root)
+            parts = []
+            for day, entry in store.load_index(source.symbol, source.interval).items():
+                if (source.start_ms is not None and entry["t_max"] < source.start_ms) or \
+                        (source.end_ms is not None and entry["t_min"] >= source.end_ms):
+                    continue
+                st = os.stat(store.partition_path(source.symbol, source.interval, day))
+                parts.append((day, entry, st.st_size, st.st_mtime_ns))
+            return cache_key(source.symbol.upper(), source.interval, source.start_ms, source.end_ms, parts)
+
+        st = os.stat(source)
+        stamp = [st.st_size, st.st_mtime_ns]
+        hashes_path = os.path.join(self.root, "sources.json")
+        try:
+            with open(hashes_path) as f:
+                hashes = json.load(f)
+        except (OSError, ValueError):
+            hashes = {}
+        known = hashes.get(os.path.abspath(source))
+        if known and known[:2] == stamp:
+            return known[2]
+        with open(source, 'rb') as f:
+            digest = hashlib.file_digest(f, "sha256").hexdigest()
+        hashes[os.path.abspath(source)] = stamp + [digest]
+        os.makedirs(self.root, exist_ok=True)
+        with open(f"{hashes_path}.{os.getpid()}.tmp", 'w') as f:
+            json.dump(hashes, f)
+        os.replace(f"{hashes_path}.{os.getpid()}.tmp", hashes_path)
+        return digest
+
+def load_frame(source: Union[str, StoreSlice]):
+    """A source as a DataFrame with one valid row per candle, in time order."""
+    import pandas as pd
+    if isinstance(source, StoreSlice):
+        from data.dataset_store import DatasetStore
+        df = DatasetStore(source.root).read_frame(source.symbol, source.interval, source.start_ms, source.end_ms)
+    else:
+        df = pd.read_csv(source)
+    df = df[df['close'] > 0]
+    df = df.drop_duplicates(subset='timestamp', keep='last')
+    return df.sort_values('timestamp').reset_index(drop=True)
+
+def load_training_data(source: Union[str, StoreSlice], pipeline, labeling: Optional[Dict] = None,
+                       cache: Optional[DatasetCache] = None) -> Dict[str, np.ndarray]:
+    """
+    {'t', 'close', 'X', 'y', 'fwd'} for `source`, from the cache when the
+    same source, feature set and labeling were seen before. Rows are the
+    candles with every feature present. `labeling` is {"method": ..., params}
+    (see data.labeling); None takes the source's 'label' column as is, and
+    then 'fwd' is all NaN.
+    """
+    from data.labeling import label_closes
+    cache = cache or DatasetCache()
+    source_key = cache.source_key(source)
+    features_key = cache_key("features", source_key, feature_set_key(pipeline))
+    labels_key = cache_key("labels", features_key, labeling_key(labeling) if labeling else "label column")
+    features = cache.get(features_key)
+    labels = cache.get(labels_key)
+    if features is None or (labels is None and not labeling):
+        started = time.time()
+        df = pipeline.ensure_columns(load_frame(source)).dropna(subset=pipeline.names).reset_index(drop=True)
+        if features is None:
+            features = cache.put(features_key, {
+                't': df['timestamp'].to_numpy(dtype=np.int64),
+                'close': df['close'].to_numpy(dtype=np.float64),
+                'X': df[pipeline.names].to_numpy(dtype=np.float32),
+            }, source=source, features=pipeline.names)
+        if labels is None and not labeling:
+            if 'label' not in df.columns:
+                raise ValueError(f"{source} has no 'label' column; pass a labeling")
+            labels = cache.put(labels_key, {'y': df['label'].to_numpy(dtype=np.float64),
+                                            'fwd': np.full(len(df), np.nan)}, labeling=labeling)
+        logger.info(f"Featurized {source} ({len(df)} rows) in {time.time() - started:.2f}s")
+    if labels is None:
+        # Labels depend only on the closes, so a labeling sweep reuses the features entry
+        y, fwd = label_closes(np.asarray(features['close']), labeling)
+        labels = cache.put(labels_key, {'y': y, 'fwd': fwd}, labeling=labeling)
+    return {**features, **labels}
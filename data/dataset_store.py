@@ -0,0 +1,139 @@
+# TARGET_FILE: data/dataset_store.py
+"""
+Columnar kline dataset store: one uncompressed .npz per symbol, interval and
+UTC day (int64 't' open time in ms, float64 'o'/'h'/'l'/'c'/'v'), sorted by
+'t' with one row per kline. Each symbol/interval directory has an
+index.json of {day: {rows, t_min, t_max}}, so range reads open only the
+partitions they need.
+
+    <root>/BTCUSDT/1s/2024-01-05.npz
+    <root>/BTCUSDT/1s/index.json
+"""
+import json
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+import numpy as np
+
+logger = logging.getLogger("DatasetStore")
+
+FIELDS = ('t', 'o', 'h', 'l', 'c', 'v')
+DAY_MS = 86_400_000
+
+def day_of(t_ms: int) -> str:
+    return datetime.fromtimestamp(t_ms / 1000, tz=timezone.utc).strftime("%Y-%m-%d")
+
+def day_start_ms(day: str) -> int:
+    return int(datetime.strptime(day, "%Y-%m-%d").replace(tzinfo=timezone.utc).timestamp() * 1000)
+
+def dedupe_sorted(cols: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Sort by 't' and keep the last row of every timestamp (stable, so 'last' means last given)."""
+    t = cols['t']
+    order = np.argsort(t, kind='stable')
+    t = t[order]
+    keep = np.ones(len(t), dtype=bool)
+    keep[:-1] = t[1:] != t[:-1]
+    idx = order[keep]
+    return {f: cols[f][idx] for f in cols}
+
+def split_days(cols: Dict[str, np.ndarray]) -> Iterator[Tuple[str, Dict[str, np.ndarray]]]:
+    """(day, columns) per UTC day of already sorted columns."""
+    t = cols['t']
+    if not len(t):
+        return
+    day_idx = t // DAY_MS
+    bounds = np.flatnonzero(np.diff(day_idx)) + 1
+    for lo, hi in zip(np.r_[0, bounds], np.r_[bounds, len(t)]):
+        yield day_of(int(t[lo])), {f: v[lo:hi] for f, v in cols.items()}
+
+class DatasetStore:
+    def __init__(self, root: str = os.path.join("datasets", "store")):
+        self.root = root
+
+    def _dir(self, symbol: str, interval: str) -> str:
+        return os.path.join(self.root, symbol.upper(), interval)
+
+    def partition_path(self, symbol: str, interval: str, day: str) -> str:
+        return os.path.join(self._dir(symbol, interval), f"{day}.npz")
+
+    def symbols(self) -> List[str]:
+        return sorted(os.listdir(self.root)) if os.path.isdir(self.root) else []
+
+    def load_index(self, symbol: str, interval: str) -> Dict[str, dict]:
+        try:
+            with open(os.path.join(self._dir(symbol, interval), "index.json")) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def update_index(self, symbol: str, interval: str, entries: Dict[str, dict]):
+        """Merge {day: {rows, t_min, t_max}} into the index (single writer)."""
+        index = self.load_index(symbol, interval)
+        index.update(entries)
+        path = os.path.join(self._dir(symbol, interval), "index.json")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(f"{path}.tmp", 'w') as f:
+            json.dump(dict(sorted(index.items())), f, indent=1)
+        os.replace(f"{path}.tmp", path)
+
+    def read_partition(self, symbol: str, interval: str, day: str) -> Optional[Dict[str, np.ndarray]]:
+        try:
+            with np.load(self.partition_path(symbol, interval, day)) as data:
+                return {f: data[f] for f in FIELDS}
+        except FileNotFoundError:
+            return None
+
+    def write_partition(self, symbol: str, interval: str, day: str, cols: Dict[str, np.ndarray],
+                        merge: bool = True) -> dict:
+        """
+        Write one day atomically, merged with what is already stored for it
+        (new rows win on equal 't'). Returns its index entry; call update_index
+        with it, since partitions may be written from several processes.
+        """
+        cols = {'t': np.asarray(cols['t'], dtype=np.int64),
+                **{f: np.asarray(cols[f], dtype=np.float64) for f in FIELDS[1:]}}
+        existing = self.read_partition(symbol, interval, day) if merge else None
+        if existing is not None:
+            cols = {f: np.concatenate([existing[f], cols[f]]) for f in FIELDS}
+        cols = dedupe_sorted(cols)
+        path = self.partition_path(symbol, interval, day)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            np.savez(f, **cols)
+        os.replace(tmp, path)
+        return {"rows": int(len(cols['t'])), "t_min": int(cols['t'][0]), "t_max": int(cols['t'][-1])}
+
+    def write(self, symbol: str, interval: str, cols: Dict[str, np.ndarray]) -> Dict[str, dict]:
+        """Write columns spanning any number of days and update the index."""
+        entries = {day: self.write_partition(symbol, interval, day, part)
+                   for day, part in split_days(dedupe_sorted(cols))}
+        if entries:
+            self.update_index(symbol, interval, entries)
+        return entries
+
+    def read(self, symbol: str, interval: str, start_ms: Optional[int] = None,
+             end_ms: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """Columns for start_ms <= t < end_ms (everything by default), oldest first."""
+        parts = []
+        for day, entry in self.load_index(symbol, interval).items():
+            if (start_ms is not None and entry["t_max"] < start_ms) or (end_ms is not None and entry["t_min"] >= end_ms):
+                continue
+            cols = self.read_partition(symbol, interval, day)
+            if cols is None:
+                logger.warning(f"{symbol} {interval} {day} is indexed but missing")
+                continue
+            lo = np.searchsorted(cols['t'], start_ms) if start_ms is not None else 0
+            hi = np.searchsorted(cols['t'], end_ms) if end_ms is not None else len(cols['t'])
+            parts.append({f: v[lo:hi] for f, v in cols.items()})
+        if not parts:
+            return {'t': np.zeros(0, dtype=np.int64), **{f: np.zeros(0) for f in FIELDS[1:]}}
+        return {f: np.concatenate([p[f] for p in parts]) for f in FIELDS}
+
+    def read_frame(self, symbol: str, interval: str, start_ms: Optional[int] = None, end_ms: Optional[int] = None):
+        """read() as a DataFrame with the dataset column names (timestamp, open, ..., volume)."""
+        import pandas as pd
+        from strategies.scalping_features import DATASET_COLUMNS
+        cols = self.read(symbol, interval, start_ms, end_ms)
+        return pd.DataFrame({DATASET_COLUMNS[f]: cols[f] for f in FIELDS})
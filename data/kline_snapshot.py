@@ -0,0 +1,154 @@
+# TARGET_FILE: data/kline_snapshot.py
+"""
+Warm restart for BinanceKlineStream buffers: snapshot the deques to one .npz
+file (a float64 (n, 6) array per symbol) periodically and on shutdown, then
+on startup restore it and fetch only the missing klines over REST.
+Features are recomputed from the kline window, so the buffers are all the
+state there is to keep.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+import urllib.request
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+from data.binance_ws import market_rest_url
+
+logger = logging.getLogger("KlineSnapshot")
+
+FIELDS = ('t', 'o', 'h', 'l', 'c', 'v')
+_UNIT_MS = {'s': 1000, 'm': 60_000, 'h': 3_600_000, 'd': 86_400_000}
+
+def interval_ms(interval: str) -> int:
+    return int(interval[:-1]) * _UNIT_MS[interval[-1]]
+
+def save_snapshot(path: str, klines: Dict[str, Iterable[dict]], interval: str):
+    """Write every symbol's buffer atomically (tmp file + rename)."""
+    arrays = {
+        symbol: np.array([[k[f] for f in FIELDS] for k in rows], dtype=np.float64).reshape(-1, len(FIELDS))
+        for symbol, rows in klines.items()
+    }
+    meta = {"interval": interval, "saved_at": time.time()}
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, 'wb') as f:
+        np.savez(f, __meta__=np.frombuffer(json.dumps(meta).encode(), dtype=np.uint8), **arrays)
+    os.replace(tmp, path)
+
+def load_snapshot(path: str, interval: str, max_age_seconds: float) -> Dict[str, List[dict]]:
+    """{symbol: klines} from `path`, or {} if missing, unreadable, stale or for another interval."""
+    try:
+        with np.load(path) as data:
+            meta = json.loads(data['__meta__'].tobytes())
+            if meta["interval"] != interval or time.time() - meta["saved_at"] > max_age_seconds:
+                return {}
+            return {
+                symbol: [{'t': int(r[0]), 'o': r[1], 'h': r[2], 'l': r[3], 'c': r[4], 'v': r[5]}
+                         for r in data[symbol].tolist()]
+                for symbol in data.files if symbol != '__meta__'
+            }
+    except (OSError, ValueError, KeyError) as e:
+        if not isinstance(e, FileNotFoundError):
+            logger.warning(f"Ignoring unreadable kline snapshot {path}: {e}")
+        return {}
+
+def fetch_klines(rest_url: str, symbol: str, interval: str, start_ms: Optional[int] = None,
+                 limit: int = 1000) -> List[dict]:
+    """Public /api/v3/klines as compact kline dicts (the last one may still be open)."""
+    url = f"{rest_url.rstrip('/')}/api/v3/klines?symbol={symbol.upper()}&interval={interval}&limit={limit}"
+    if start_ms is not None:
+        url += f"&startTime={start_ms}"
+    with urllib.request.urlopen(url, timeout=5) as resp:
+        rows = json.loads(resp.read())
+    return [{'t': int(r[0]), 'o': float(r[1]), 'h': float(r[2]), 'l': float(r[3]),
+             'c': float(r[4]), 'v': float(r[5])} for r in rows]
+
+def restore_klines(stream, path: str, rest_url: Optional[str], max_age_seconds: float = 3600,
+                   symbols: Optional[List[str]] = None) -> Dict[str, List[dict]]:
+    """
+    Klines to refill each of `stream`'s buffers with: the snapshot plus a REST
+    backfill of the gap (or of the whole buffer when there is no usable
+    snapshot). A symbol whose gap cannot be fetched starts cold rather than
+    with a hole in its window. Safe to run in a thread: `stream` is only read.
+    `symbols` limits the restore to some of the stream's symbols. Without a
+    `rest_url` (a local or synthetic market source) nothing is fetched.
+    """
+    step = interval_ms(stream.interval)
+    snapshot = load_snapshot(path, stream.interval, max_age_seconds)
+    now_ms = int(time.time() * 1000)
+    restored = {}
+    for symbol, dq in list(stream.klines.items()):
+        if symbols is not None and symbol not in symbols:
+            continue
+        klines = snapshot.get(symbol, [])[-dq.maxlen:]
+        # Only the missing tail (from the snapshot's last, possibly unfinished kline),
+        # capped at what the buffer can hold
+        start_ms = max(klines[-1]['t'] if klines else 0, now_ms - dq.maxlen * step)
+        fetched = []
+        if rest_url:
+            try:
+                fetched = fetch_klines(rest_url, symbol, stream.interval, start_ms, limit=min(dq.maxlen, 1000))
+            except Exception as e:
+                logger.warning(f"Backfill failed for {symbol}: {e}")
+        if fetched:
+            klines = [k for k in klines if k['t'] < fetched[0]['t']]
+        if klines and (fetched[0]['t'] if fetched else now_ms) - klines[-1]['t'] > 2 * step:
+            klines = []  # Hole between snapshot and backfill/live data
+        restored[symbol] = (klines + fetched)[-dq.maxlen:]
+    logger.info(f"Restored klines: { {s: len(k) for s, k in restored.items()} } "
+                f"({len(snapshot)} symbols from snapshot)")
+    return restored
+
+async def snapshot_loop(stream, path: str, interval_seconds: float = 30.0):
+    """Periodic snapshots; the copy happens on the loop, the write in a thread."""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            frozen = {symbol: list(dq) for symbol, dq in stream.klines.items()}
+            await asyncio.to_thread(save_snapshot, path, frozen, stream.interval)
+        except Exception as e:
+            logger.error(f"Kline snapshot failed: {e}")
+
+class KlineSnapshotter:
+    def __init__(self, stream, settings: dict, name: str):
+        """
+        Warm-restart wiring for one process, configured by the `warm_start`
+        settings section; `name` picks the snapshot file under its `dir`.
+        """
+        cfg = settings.get('warm_start', {})
+        self.stream = stream
+        self.enabled = cfg.get('enabled', False)
+        self.path = os.path.join(cfg.get('dir', 'snapshots'), f"{name}.npz")
+        # Backfill from the REST side of the stream the klines come from; none for a local one
+        self.rest_url = cfg.get('rest_url') or market_rest_url(settings)
+        self.max_age_seconds = cfg.get('max_age_seconds', 3600)
+        self.interval_seconds = cfg.get('interval_seconds', 30)
+
+    async def restore(self, min_klines: int, symbols: Optional[List[str]] = None) -> bool:
+        """
+        Fetch in a thread, then seed the buffers on the loop (the stream may
+        already be running); True if every restored symbol has `min_klines`
+        ready. `symbols` (lowercase) restores only those, e.g. newly streamed ones.
+        """
+        if not self.enabled:
+            return False
+        restored = await asyncio.to_thread(
+            restore_klines, self.stream, self.path, self.rest_url, self.max_age_seconds, symbols
+        )
+        restored = {s: k for s, k in restored.items() if s in self.stream.klines}  # Still streamed
+        for symbol, klines in restored.items():
+            self.stream.seed(symbol, klines)
+        return bool(restored) and min(len(self.stream.klines[s]) for s in restored) >= min_klines
+
+    async def run(self):
+        if self.enabled:
+            await snapshot_loop(self.stream, self.path, self.interval_seconds)
+
+    def save(self):
+        if self.enabled:
+            try:
+                save_snapshot(self.path, self.stream.klines, self.stream.interval)
+            except Exception as e:
+                logger.error(f"Kline snapshot failed: {e}")
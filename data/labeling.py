@@ -0,0 +1,54 @@
+# TARGET_FILE: data/labeling.py
+"""
+Vectorized versions of the relabel scripts' rules, over a 1s close series
+(one row per candle, oldest first). Each returns (labels, forward returns):
+1 = buy, 0 = sell, NaN = unlabeled, and NaN returns for the last
+`look_ahead_seconds` rows.
+"""
+from typing import Dict, Tuple
+import numpy as np
+import pandas as pd
+
+def forward_returns(closes: np.ndarray, look_ahead: int) -> np.ndarray:
+    closes = np.asarray(closes, dtype=np.float64)
+    fwd = np.full(len(closes), np.nan)
+    if len(closes) > look_ahead:
+        now, future = closes[:-look_ahead], closes[look_ahead:]
+        valid = (now > 0) & (future > 0)
+        fwd[:-look_ahead][valid] = (future[valid] - now[valid]) / now[valid]
+    return fwd
+
+def _apply_threshold(fwd: np.ndarray, threshold) -> np.ndarray:
+    labels = np.full(len(fwd), np.nan)
+    labels[fwd >= threshold] = 1
+    labels[fwd <= -threshold] = 0
+    return labels
+
+def label_threshold(closes: np.ndarray, look_ahead_seconds: int = 2,
+                    threshold_pct: float = 0.02) -> Tuple[np.ndarray, np.ndarray]:
+    """Fixed threshold (relabel_dataset.py, relabel_fixed_threshold.py)."""
+    fwd = forward_returns(closes, look_ahead_seconds)
+    return _apply_threshold(fwd, threshold_pct / 100.0), fwd
+
+def label_volatile(closes: np.ndarray, look_ahead_seconds: int = 2, vol_window: int = 30,
+                   vol_multiplier: float = 1.5, min_threshold: float = 0.0003,
+                   fallback_threshold: float = 0.0005) -> Tuple[np.ndarray, np.ndarray]:
+    """Threshold of vol_multiplier x the rolling std of 1s returns (relabel_volatile_data.py)."""
+    fwd = forward_returns(closes, look_ahead_seconds)
+    vol = pd.Series(closes, dtype=np.float64).pct_change().rolling(vol_window, min_periods=10).std().to_numpy()
+    threshold = np.where(np.isnan(vol) | (vol == 0), fallback_threshold,
+                         np.maximum(min_threshold, vol_multiplier * vol))
+    return _apply_threshold(fwd, threshold), fwd
+
+LABELERS = {
+    "threshold": label_threshold,
+    "volatile": label_volatile,
+}
+
+def label_closes(closes: np.ndarray, labeling: Dict) -> Tuple[np.ndarray, np.ndarray]:
+    """Labels for {"method": <LABELERS key>, **its parameters}."""
+    params = dict(labeling)
+    method = params.pop("method")
+    if method not in LABELERS:
+        raise ValueError(f"Unknown labeling method {method!r}; expected one of {sorted(LABELERS)}")
+    return LABELERS[method](closes, **params)
@@ -0,0 +1,374 @@
+# TARGET_FILE: data/order_book.py
+import asyncio
+import json
+import logging
+import time
+import urllib.request
+from bisect import bisect_left
+from typing import Dict, List, Optional, Set
+import websockets
+
+class BookSide:
+    """
+    One side of a price-level book kept in sorted parallel arrays, best
+    level last: keys ascend toward the best price (asks use negated
+    prices). Lookups are O(log n) bisects. An insert or delete shifts the
+    levels between it and the best price, so it is O(n) in the worst case
+    but only a few moves for the near-touch levels most diffs touch.
+    """
+    def __init__(self, is_bid: bool):
+        self.sign = 1.0 if is_bid else -1.0
+        self.keys: List[float] = []
+        self.qtys: List[float] = []
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def clear(self):
+        self.keys.clear()
+        self.qtys.clear()
+
+    def update(self, price: float, qty: float):
+        key = self.sign * price
+        i = bisect_left(self.keys, key)
+        if i < len(self.keys) and self.keys[i] == key:
+            if qty == 0.0:
+                del self.keys[i]
+                del self.qtys[i]
+            else:
+                self.qtys[i] = qty
+        elif qty != 0.0:
+            self.keys.insert(i, key)
+            self.qtys.insert(i, qty)
+
+    def trim(self, max_levels: int):
+        excess = len(self.keys) - max_levels
+        if excess > 0:
+            del self.keys[:excess]  # Worst levels
+            del self.qtys[:excess]
+
+    def best(self):
+        """(price, qty) of the best level or None."""
+        if not self.keys:
+            return None
+        return self.sign * self.keys[-1], self.qtys[-1]
+
+    def depth_qty(self, levels: int) -> float:
+        return sum(self.qtys[max(0, len(self.qtys) - levels):])
+
+    def levels(self, n: int) -> list:
+        """The best n levels as (price, qty), best first."""
+        start = max(0, len(self.keys) - n)
+        return [(self.sign * k, q) for k, q in zip(reversed(self.keys[start:]), reversed(self.qtys[start:]))]
+
+class LocalOrderBook:
+    """
+    Local copy of one symbol's book, synced from a REST snapshot plus
+    diff-depth events following Binance's update-id sequencing rules.
+    """
+    def __init__(self, symbol: str, max_levels: int = 5000):
+        self.symbol = symbol
+        self.max_levels = max_levels
+        self.bids = BookSide(is_bid=True)
+        self.asks = BookSide(is_bid=False)
+        self.last_update_id = 0
+        self.synced = False
+        self._first_event = True
+
+    def apply_snapshot(self, snapshot: dict):
+        self.bids.clear()
+        self.asks.clear()
+        for price, qty in snapshot['bids']:
+            self.bids.update(float(price), float(qty))
+        for price, qty in snapshot['asks']:
+            self.asks.update(float(price), float(qty))
+        self.last_update_id = snapshot['lastUpdateId']
+        self.synced = True
+        self._first_event = True
+
+    def apply_diff(self, event: dict) -> bool:
+        """
+        Apply one depthUpdate event. Returns False when a sequence gap means
+        the book must be resynced from a new snapshot.
+        """
+        first_id, final_id = event['U'], event['u']
+        if final_id <= self.last_update_id:
+            return True  # Already covered by the snapshot
+        if self._first_event:
+            if first_id > self.last_update_id + 1:
+                self.synced = False
+                return False
+            self._first_event = False
+        elif first_id != self.last_update_id + 1:
+            self.synced = False
+            return False
+
+        for price, qty in event['b']:
+            self.bids.update(float(price), float(qty))
+        for price, qty in event['a']:
+            self.asks.update(float(price), float(qty))
+        self.bids.trim(self.max_levels)
+        self.asks.trim(self.max_levels)
+        self.last_update_id = final_id
+        return True
+
+    # ----------------------------
+    # Microstructure features
+    # ----------------------------
+    def top_of_book(self):
+        """(bid, bid_qty, ask, ask_qty) or None if either side is empty."""
+        bid, ask = self.bids.best(), self.asks.best()
+        if bid is None or ask is None:
+            return None
+        return bid[0], bid[1], ask[0], ask[1]
+
+    def mid_price(self) -> Optional[float]:
+        top = self.top_of_book()
+        return (top[0] + top[2]) / 2 if top else None
+
+    def spread_bps(self) -> Optional[float]:
+        top = self.top_of_book()
+        if not top:
+            return None
+        mid = (top[0] + top[2]) / 2
+        return (top[2] - top[0]) / mid * 10000
+
+    def microprice(self) -> Optional[float]:
+        """Top-of-book price weighted towards the side with less resting size."""
+        top = self.top_of_book()
+        if not top:
+            return None
+        bid, bid_qty, ask, ask_qty = top
+        total = bid_qty + ask_qty
+        return (bid * ask_qty + ask * bid_qty) / total if total > 0 else (bid + ask) / 2
+
+    def imbalance(self, levels: int = 5) -> Optional[float]:
+        """(bid_qty - ask_qty) / total over the top `levels`, in [-1, 1]."""
+        bid_qty = self.bids.depth_qty(levels)
+        ask_qty = self.asks.depth_qty(levels)
+        total = bid_qty + ask_qty
+        return (bid_qty - ask_qty) / total if total > 0 else None
+
+class BinanceDepthStream:
+    def __init__(self, symbols: list, speed: str = '100ms', snapshot_limit: int = 1000,
+                 ws_url: str = "wss://stream.binance.com:9443",
+                 rest_url: Optional[str] = "https://api.binance.com",
+                 record_path: Optional[str] = None, max_pending: int = 1000, max_backoff: float = 60.0):
+        """
+        Diff-depth stream for many symbols over one combined websocket,
+        keeping a LocalOrderBook per symbol. Frames (and snapshots) can be
+        recorded to a JSONL file and replayed offline with `replay`.
+        Snapshots come from `rest_url` (None: the source has no REST side and
+        books never sync); after a failed one the next waits exponentially
+        longer, up to `max_backoff` seconds. Up to `max_pending` events are
+        buffered per symbol while it syncs.
+        """
+        self.symbols = [s.lower() for s in symbols]
+        self.speed = speed
+        self.snapshot_limit = snapshot_limit
+        self.ws_url = ws_url.rstrip('/')
+        self.rest_url = rest_url.rstrip('/') if rest_url else None
+        self.max_pending = max_pending
+        self.max_backoff = max_backoff
+        self.books: Dict[str, LocalOrderBook] = {sym: LocalOrderBook(sym) for sym in self.symbols}
+        self._pending: Dict[str, list] = {sym: [] for sym in self.symbols}
+        self._syncing: Dict[str, bool] = {sym: False for sym in self.symbols}
+        self._backoff: Dict[str, float] = {sym: 0.0 for sym in self.symbols}
+        self._retry_at: Dict[str, float] = {sym: 0.0 for sym in self.symbols}
+        self.record_path = record_path
+        self._record_file = None
+        self.running = False
+        self._ws = None
+        self._resubscribing = False
+        self._close_task = None
+        self._sync_tasks: Set[asyncio.Task] = set()
+        self.logger = logging.getLogger("BinanceDepth")
+
+    def _record(self, entry: dict):
+        if self._record_file:
+            self._record_file.write(json.dumps(entry) + "\n")
+
+    def _fetch_snapshot(self, symbol: str) -> dict:
+        url = f"{self.rest_url}/api/v3/depth?symbol={symbol.upper()}&limit={self.snapshot_limit}"
+        with urllib.request.urlopen(url, timeout=10) as resp:
+            return json.loads(resp.read())
+
+    async def _sync_book(self, symbol: str):
+        """Load a REST snapshot, then replay the events buffered while it was in flight."""
+        self._syncing[symbol] = True
+        try:
+            snapshot = await asyncio.to_thread(self._fetch_snapshot, symbol)
+            if symbol not in self.books:
+                return  # Unsubscribed meanwhile
+            self._record({"symbol": symbol, "snapshot": snapshot})
+            self._apply_snapshot(symbol, snapshot)
+            self._backoff[symbol] = 0.0
+        except Exception as e:
+            if symbol in self.books:
+                self._backoff[symbol] = min(max(1.0, 2 * self._backoff[symbol]), self.max_backoff)
+                self._retry_at[symbol] = time.monotonic() + self._backoff[symbol]
+                self.logger.error(f"Depth snapshot failed for {symbol}: {e}, "
+                                  f"retrying in {self._backoff[symbol]:.0f}s")
+        finally:
+            if symbol in self._syncing:
+                self._syncing[symbol] = False
+
+    def _request_sync(self, symbol: str):
+        """Start a snapshot sync unless one is running or backing off after a failure."""
+        if self._syncing[symbol] or not self.running or self.rest_url is None:
+            return
+        if time.monotonic() < self._retry_at[symbol]:
+            return
+        task = asyncio.get_running_loop().create_task(self._sync_book(symbol))
+        self._sync_tasks.add(task)  # Held until done; _sync_book logs its own failures
+        task.add_done_callback(self._sync_tasks.discard)
+
+    def _buffer(self, symbol: str, event: dict):
+        """Hold an event until the next snapshot: only ones it may not cover, and at most max_pending."""
+        if event['u'] <= self.books[symbol].last_update_id:
+            return
+        pending = self._pending[symbol]
+        pending.append(event)
+        if len(pending) > self.max_pending:
+            del pending[:len(pending) - self.max_pending]
+
+    def _apply_snapshot(self, symbol: str, snapshot: dict):
+        book = self.books[symbol]
+        book.apply_snapshot(snapshot)
+        pending, self._pending[symbol] = self._pending[symbol], []
+        for i, event in enumerate(pending):
+            if not book.apply_diff(event):
+                self.logger.warning(f"Gap while replaying buffered depth for {symbol}, resyncing")
+                self._pending[symbol] = pending[i:]  # Still newer than this snapshot: keep for the next
+                break
+
+    def _handle_event(self, symbol: str, event: dict):
+        book = self.books[symbol]
+        if not book.synced:
+            self._buffer(symbol, event)
+            self._request_sync(symbol)
+            return
+        if not book.apply_diff(event):
+            self.logger.warning(f"Depth sequence gap for {symbol}, resyncing")
+            self._pending[symbol] = [event]
+            self._request_sync(symbol)
+
+    async def _handle_message(self, msg: str):
+        try:
+            frame = json.loads(msg)
+            data = frame.get('data', frame)
+            if data.get('e') != 'depthUpdate':
+                return
+            symbol = data['s'].lower()
+            if symbol in self.books:
+                self._record({"symbol": symbol, "event": data})
+                self._handle_event(symbol, data)
+        except Exception as e:
+            self.logger.error(f"Error parsing depth frame: {e}")
+
+    async def start(self):
+        self.running = True
+        if self.rest_url is None:
+            self.logger.warning("Depth stream has no REST snapshot source: books stay unsynced")
+        if self.record_path:
+            self._record_file = open(self.record_path, 'a', encoding='utf-8')
+        try:
+            while self.running:
+                if not self.symbols:
+                    await asyncio.sleep(0.5)
+                    continue
+                streams = "/".join(f"{sym}@depth@{self.speed}" for sym in self.symbols)
+                stream_url = f"{self.ws_url}/stream?streams={streams}"
+                try:
+                    async with websockets.connect(stream_url, max_queue=None) as ws:
+                        self._ws = ws
+                        self.logger.info(f"Connected to depth stream for {len(self.symbols)} symbols")
+                        for book in self.books.values():
+                            book.synced = False  # Missed events while disconnected
+                        while self.running:
+                            msg = await ws.recv()
+                            await self._handle_message(msg)
+                except Exception as e:
+                    if self._resubscribing:
+                        self._resubscribing = False
+                        continue
+                    self.logger.error(f"Depth WS error: {e}, reconnecting in 2s...")
+                    await asyncio.sleep(2)
+                finally:
+                    self._ws = None
+        finally:
+            for task in list(self._sync_tasks):
+                task.cancel()
+            if self._record_file:
+                self._record_file.close()
+                self._record_file = None
+
+    def stop(self):
+        self.running = False
+
+    def set_symbols(self, symbols: list):
+        """Keep books for `symbols` from now on; the combined stream reconnects (and resyncs) with the new list."""
+        self.symbols = [s.lower() for s in symbols]
+        for sym in self.symbols:
+            if sym not in self.books:
+                self.books[sym] = LocalOrderBook(sym)
+                self._pending[sym] = []
+                self._syncing[sym] = False
+                self._backoff[sym] = self._retry_at[sym] = 0.0
+        for sym in list(self.books):
+            if sym not in self.symbols:
+                for state in (self.books, self._pending, self._syncing, self._backoff, self._retry_at):
+                    del state[sym]
+        if self._ws is not None:
+            self._resubscribing = True
+            self._close_task = asyncio.get_running_loop().create_task(self._ws.close())
+
+    def replay(self, record_path: str) -> int:
+        """
+        Feed a recorded JSONL file through the same sync logic, offline.
+        Returns the number of depth events applied.
+        """
+        applied = 0
+        with open(record_path, encoding='utf-8') as f:
+            for line in f:
+                entry = json.loads(line)
+                symbol = entry['symbol']
+                if symbol not in self.books:
+                    continue
+                if 'snapshot' in entry:
+                    self._apply_snapshot(symbol, entry['snapshot'])
+                elif self.books[symbol].synced:
+                    if self.books[symbol].apply_diff(entry['event']):
+                        applied += 1
+                    else:
+                        self.logger.warning(f"Gap in recording for {symbol} at u={entry['event']['u']}")
+                else:
+                    self._buffer(symbol, entry['event'])
+        return applied
+
+    def get_book(self, symbol: str) -> Optional[LocalOrderBook]:
+        """Synced book for `symbol`, or None while (re)syncing."""
+        book = self.books.get(symbol.lower())
+        return book if book and book.synced else None
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Record or replay Binance diff-depth frames.")
+    parser.add_argument("symbols", nargs="+")
+    parser.add_argument("--record", help="Record live frames to this JSONL file")
+    parser.add_argument("--replay", help="Replay a recorded JSONL file and print book features")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    stream = BinanceDepthStream(args.symbols, record_path=args.record)
+    if args.replay:
+        count = stream.replay(args.replay)
+        print(f"Applied {count} depth events")
+        for sym, book in stream.books.items():
+            print(f"{sym}: top={book.top_of_book()} spread_bps={book.spread_bps()} "
+                  f"imbalance={book.imbalance()} microprice={book.microprice()}")
+    else:
+        try:
+            asyncio.run(stream.start())
+        except KeyboardInterrupt:
+            pass
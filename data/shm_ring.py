@@ -0,0 +1,176 @@
+# TARGET_FILE: data/shm_ring.py
+import asyncio
+import time
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional
+import numpy as np
+
+FIELDS = ('t', 'o', 'h', 'l', 'c', 'v')
+
+class KlineRing:
+    """
+    Per-symbol kline ring buffers in one shared-memory block: an int64 kline
+    counter and an int64 update counter per symbol, followed by a float64
+    (n_symbols, capacity, 6) array. One writer (the market-data hub) appends,
+    or replaces the newest row on an update of the same kline; any number of
+    reader processes map the same block and read numpy views straight out of it.
+    """
+    def __init__(self, symbols: List[str], capacity: int, shm: shared_memory.SharedMemory, owner: bool):
+        self.symbols = [s.lower() for s in symbols]
+        self.index = {s: i for i, s in enumerate(self.symbols)}
+        self.capacity = capacity
+        self.shm = shm
+        self.owner = owner
+        n = len(self.symbols)
+        self.counts = np.ndarray((n,), dtype=np.int64, buffer=shm.buf, offset=0)
+        self.versions = np.ndarray((n,), dtype=np.int64, buffer=shm.buf, offset=8 * n)
+        self.data = np.ndarray((n, capacity, len(FIELDS)), dtype=np.float64, buffer=shm.buf, offset=16 * n)
+
+    @staticmethod
+    def nbytes(n_symbols: int, capacity: int) -> int:
+        return 16 * n_symbols + 8 * n_symbols * capacity * len(FIELDS)
+
+    @classmethod
+    def create(cls, symbols: List[str], capacity: int = 600, name: Optional[str] = None) -> "KlineRing":
+        shm = shared_memory.SharedMemory(name=name, create=True, size=cls.nbytes(len(symbols), capacity))
+        ring = cls(symbols, capacity, shm, owner=True)
+        ring.counts[:] = 0
+        ring.versions[:] = 0
+        return ring
+
+    @classmethod
+    def attach(cls, name: str, symbols: List[str], capacity: int = 600) -> "KlineRing":
+        return cls(symbols, capacity, shared_memory.SharedMemory(name=name), owner=False)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def write(self, symbol: str, kline: dict):
+        """
+        Store one kline update (single writer per symbol): a new open time is
+        appended, the newest kline's own open time replaces it in place, and
+        older ones are dropped. Data lands before the counters move.
+        """
+        i = self.index[symbol.lower()]
+        count = int(self.counts[i])
+        row = (kline['t'], kline['o'], kline['h'], kline['l'], kline['c'], kline['v'])
+        last_t = self.data[i, (count - 1) % self.capacity, 0] if count else None
+        if last_t is not None and kline['t'] <= last_t:
+            if kline['t'] < last_t:
+                return  # Out of order
+            self.data[i, (count - 1) % self.capacity] = row
+        else:
+            self.data[i, count % self.capacity] = row
+            self.counts[i] = count + 1
+        self.versions[i] += 1
+
+    def count(self, symbol: str) -> int:
+        """Klines stored for `symbol` so far (each open time once)."""
+        return int(self.counts[self.index[symbol.lower()]])
+
+    def version(self, symbol: str) -> int:
+        """Updates written for `symbol` so far, including in-place ones."""
+        return int(self.versions[self.index[symbol.lower()]])
+
+    def get_columns(self, symbol: str, n: int) -> Optional[Dict[str, np.ndarray]]:
+        """
+        Last n klines as {'t','o','h','l','c','v'} arrays, oldest first, or None if
+        fewer than n are stored. Without wrap-around these are views into shared
+        memory (no copy); they stay valid until `capacity - n` newer klines arrive,
+        and the newest row changes in place while its kline is still forming.
+        """
+        i = self.index.get(symbol.lower())
+        if i is None:
+            return None
+        count = int(self.counts[i])
+        n = min(n, self.capacity)
+        if count < n:
+            return None
+        start = (count - n) % self.capacity
+        if start + n <= self.capacity:
+            rows = self.data[i, start:start + n]
+        else:
+            rows = np.concatenate((self.data[i, start:], self.data[i, :start + n - self.capacity]))
+        if int(self.counts[i]) - (count - n) > self.capacity:
+            return self.get_columns(symbol, n)  # Overwritten while reading: retry
+        return {f: rows[:, j] for j, f in enumerate(FIELDS)}
+
+    def get_klines_array(self, symbol: str, n: int = 10) -> List[dict]:
+        """Last n klines as list of dicts (copies), like BinanceKlineStream."""
+        i = self.index.get(symbol.lower())
+        if i is None:
+            return []
+        n = min(n, int(self.counts[i]))
+        cols = self.get_columns(symbol, n) if n else None
+        if not cols:
+            return []
+        rows = np.column_stack([cols[f] for f in FIELDS]).tolist()
+        return [{'t': int(r[0]), 'o': r[1], 'h': r[2], 'l': r[3], 'c': r[4], 'v': r[5]} for r in rows]
+
+    def close(self):
+        # Drop numpy views before closing the mapping
+        self.counts = self.versions = self.data = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+class RingKlineStore:
+    def __init__(self, ring: KlineRing, symbols: List[str], poll_interval: float = 0.02):
+        """
+        Kline store interface over a KlineRing for engines in reader processes.
+        `start()` polls the update counters and calls kline listeners with each
+        new or updated kline and price listeners with the newest close,
+        standing in for the websocket callbacks.
+        """
+        self.ring = ring
+        self.symbols = [s.lower() for s in symbols]
+        self.poll_interval = poll_interval
+        self.price_listeners: list = []
+        self.kline_listeners: list = []
+        self.metrics = None  # Optional LatencyRecorder
+        self.last_frame_ns: Dict[str, int] = {}
+        self.seen = {s: 0 for s in self.symbols}  # Kline count at the last poll
+        self.seen_version = {s: 0 for s in self.symbols}
+        self.running = False
+
+    def add_price_listener(self, listener):
+        self.price_listeners.append(listener)
+
+    def add_kline_listener(self, listener):
+        self.kline_listeners.append(listener)
+
+    def get_klines_array(self, symbol: str, n: int = 10) -> List[dict]:
+        return self.ring.get_klines_array(symbol, n)
+
+    def get_columns(self, symbol: str, n: int) -> Optional[Dict[str, np.ndarray]]:
+        return self.ring.get_columns(symbol, n)
+
+    def get_latest_kline(self, symbol: str):
+        klines = self.ring.get_klines_array(symbol, 1)
+        return klines[-1] if klines else None
+
+    async def start(self):
+        self.running = True
+        while self.running:
+            for symbol in self.symbols:
+                version = self.ring.version(symbol)
+                if version != self.seen_version[symbol]:
+                    count = self.ring.count(symbol)
+                    if self.kline_listeners:
+                        # New klines, plus the last one seen: it may have been updated in place since
+                        seen = self.seen[symbol]
+                        new = min(count - seen + (1 if seen else 0), self.ring.capacity)
+                        for kline in self.ring.get_klines_array(symbol, new):
+                            for listener in self.kline_listeners:
+                                listener(symbol, kline)
+                    self.seen[symbol] = count
+                    self.seen_version[symbol] = version
+                    self.last_frame_ns[symbol] = time.perf_counter_ns()
+                    close = self.ring.get_columns(symbol, 1)['c'][-1]
+                    for listener in self.price_listeners:
+                        listener(symbol, float(close))
+            await asyncio.sleep(self.poll_interval)
+
+    def stop(self):
+        self.running = False
@@ -0,0 +1,328 @@
+# TARGET_FILE: data/synthetic_market.py
+import argparse
+import asyncio
+import json
+import logging
+import time
+from typing import Dict, List, Optional, Set
+import numpy as np
+import websockets
+
+# name: (drift per second, volatility multiplier)
+REGIMES = {
+    'calm': (0.0, 0.6),
+    'trend_up': (2e-5, 1.0),
+    'trend_down': (-2e-5, 1.0),
+    'volatile': (0.0, 2.5),
+}
+
+def _ar1(noise: np.ndarray, phi: float, x0: np.ndarray, block: int = 512) -> np.ndarray:
+    """
+    x_t = phi * x_{t-1} + noise_t along the last axis, vectorized per block
+    (x_t = phi^t * (x0 + sum phi^-s * noise_s)); blocks keep phi^-s bounded.
+    """
+    out = np.empty_like(noise)
+    x = x0
+    for start in range(0, noise.shape[-1], block):
+        chunk = noise[..., start:start + block]
+        powers = phi ** np.arange(1, chunk.shape[-1] + 1)
+        out[..., start:start + block] = powers * (x[..., None] + np.cumsum(chunk / powers, axis=-1))
+        x = out[..., start + chunk.shape[-1] - 1]
+    return out
+
+class SyntheticMarket:
+    def __init__(self, symbols: List[str], seed: int = 42, start_ms: Optional[int] = None,
+                 base_prices: Optional[Dict[str, float]] = None, base_vol: float = 2e-4,
+                 correlation: float = 0.6, ticks_per_second: int = 10, mean_regime_seconds: float = 300.0):
+        """
+        Correlated multi-symbol 1s OHLCV. All symbols share a market factor and
+        a regime (calm / trending / volatile, switching after random durations);
+        each symbol's volatility is an AR(1) log-vol process, so big moves
+        cluster. Bars are built from `ticks_per_second` sub-second ticks, and
+        the state carries across `next_seconds` calls, so hours of data can be
+        generated in bounded memory.
+        """
+        self.symbols = [s.upper() for s in symbols]
+        self.rng = np.random.default_rng(seed)
+        self.t_ms = start_ms if start_ms is not None else int(time.time()) * 1000
+        n = len(self.symbols)
+        if base_prices:
+            prices = [base_prices.get(s, 100.0) for s in self.symbols]
+        else:
+            prices = np.exp(self.rng.uniform(np.log(0.5), np.log(60000.0), n))
+        self.prices = np.asarray(prices, dtype=np.float64)
+        self.base_vol = base_vol * np.exp(self.rng.normal(0, 0.3, n))  # Per-symbol vol level
+        self.base_volume = 1e4 / self.prices * np.exp(self.rng.normal(0, 0.5, n))  # ~10k USDT/s
+        self.correlation = correlation
+        self.ticks_per_second = ticks_per_second
+        self.mean_regime_seconds = mean_regime_seconds
+        self.log_vol = np.zeros(n)
+        self.regime_names = list(REGIMES)
+        self.regime = 'calm'
+        self.regime_left = self._regime_duration()
+
+    def _regime_duration(self) -> int:
+        return max(1, int(self.rng.exponential(self.mean_regime_seconds)))
+
+    def _regime_path(self, n_seconds: int):
+        """Per-second drift and vol multiplier for the next n_seconds."""
+        names = []
+        while len(names) < n_seconds:
+            take = min(self.regime_left, n_seconds - len(names))
+            names.extend([self.regime] * take)
+            self.regime_left -= take
+            if self.regime_left == 0:
+                self.regime = self.regime_names[self.rng.integers(len(self.regime_names))]
+                self.regime_left = self._regime_duration()
+        drift = np.array([REGIMES[r][0] for r in names])
+        vol_mult = np.array([REGIMES[r][1] for r in names])
+        return drift, vol_mult, names
+
+    def next_seconds(self, n_seconds: int) -> dict:
+        """
+        Next n_seconds of bars: {'t': (n,), 'o','h','l','c','v': (n_symbols, n),
+        'regime': [name per second], 'ticks': (n_symbols, n, ticks_per_second) prices}.
+        """
+        n_sym, k = len(self.symbols), self.ticks_per_second
+        drift, vol_mult, regimes = self._regime_path(n_seconds)
+
+        # Volatility clustering: AR(1) log-vol per symbol, plus the regime multiplier
+        log_vol = _ar1(self.rng.normal(0, 0.08, (n_sym, n_seconds)), 0.995, self.log_vol)
+        self.log_vol = log_vol[:, -1]
+        sigma = self.base_vol[:, None] * np.exp(log_vol) * vol_mult[None, :]
+
+        # Correlated tick returns: shared market factor + idiosyncratic noise
+        market = self.rng.standard_normal((1, n_seconds, k))
+        idio = self.rng.standard_normal((n_sym, n_seconds, k))
+        shocks = np.sqrt(self.correlation) * market + np.sqrt(1 - self.correlation) * idio
+        tick_returns = shocks * (sigma / np.sqrt(k))[..., None] + (drift / k)[None, :, None]
+        log_path = np.log(self.prices)[:, None] + np.cumsum(tick_returns.reshape(n_sym, -1), axis=1)
+        ticks = np.exp(log_path).reshape(n_sym, n_seconds, k)
+
+        opens = np.concatenate((self.prices[:, None], ticks[:, :-1, -1]), axis=1)
+        closes = ticks[:, :, -1]
+        highs = np.maximum(ticks.max(axis=2), opens)
+        lows = np.minimum(ticks.min(axis=2), opens)
+        # Volume rises with the size of the move and the volatility state
+        move = np.abs(np.log(closes / opens)) / sigma
+        volumes = self.base_volume[:, None] * (0.5 + move) * np.exp(self.rng.normal(0, 0.4, (n_sym, n_seconds)))
+
+        times = self.t_ms + np.arange(n_seconds, dtype=np.int64) * 1000
+        self.t_ms += n_seconds * 1000
+        self.prices = closes[:, -1].copy()
+        return {'t': times, 'o': opens, 'h': highs, 'l': lows, 'c': closes, 'v': volumes,
+                'regime': regimes, 'ticks': ticks}
+
+def bars_to_klines(bars: dict, symbol_index: int) -> List[dict]:
+    """One symbol's bars in the compact kline shape used by the streams."""
+    i = symbol_index
+    return [
+        {'t': t, 'o': o, 'h': h, 'l': l, 'c': c, 'v': v}
+        for t, o, h, l, c, v in zip(bars['t'].tolist(), bars['o'][i].tolist(), bars['h'][i].tolist(),
+                                    bars['l'][i].tolist(), bars['c'][i].tolist(), bars['v'][i].tolist())
+    ]
+
+def trades_from_bars(bars: dict, symbol_index: int, second: int, first_id: int = 0) -> List[dict]:
+    """aggTrade events for one symbol-second: one trade per tick, volume split evenly."""
+    ticks = bars['ticks'][symbol_index, second]
+    qty = bars['v'][symbol_index, second] / len(ticks)
+    t0 = int(bars['t'][second])
+    step = 1000 // len(ticks)
+    return [
+        {'a': first_id + j, 'p': f"{p:.8f}", 'q': f"{qty:.8f}", 'T': t0 + j * step, 'm': bool(j % 2)}
+        for j, p in enumerate(ticks.tolist())
+    ]
+
+def depth_levels(mid: float, spread_bps: float = 1.0, levels: int = 20, qty: float = 1.0,
+                 rng: Optional[np.random.Generator] = None):
+    """Synthetic (bids, asks) ladders of [price, qty] strings around `mid`."""
+    rng = rng or np.random.default_rng()
+    half = mid * spread_bps / 2e4
+    offsets = half + np.arange(levels) * half * 2
+    sizes = qty * rng.exponential(1.0, (2, levels)) * (1 + np.arange(levels) / levels)
+    bids = [[f"{mid - o:.8f}", f"{q:.8f}"] for o, q in zip(offsets, sizes[0])]
+    asks = [[f"{mid + o:.8f}", f"{q:.8f}"] for o, q in zip(offsets, sizes[1])]
+    return bids, asks
+
+class FakeBinanceServer:
+    def __init__(self, market: SyntheticMarket, host: str = "127.0.0.1", port: int = 8765,
+                 speed: float = 1.0, chunk_seconds: int = 60, duration_seconds: Optional[int] = None,
+                 min_connections: int = 0):
+        """
+        Local websocket server speaking Binance's public stream format, fed by a
+        SyntheticMarket. Serves `/ws/<symbol>@kline_1s` and combined
+        `/stream?streams=...` with @kline_1s, @aggTrade, @bookTicker and
+        @depth@100ms streams. `speed` is simulated seconds per wall-clock second;
+        the clock starts once `min_connections` clients are connected.
+        """
+        self.market = market
+        self.host = host
+        self.port = port
+        self.speed = speed
+        self.chunk_seconds = chunk_seconds
+        self.duration_seconds = duration_seconds
+        self.min_connections = min_connections
+        self.connections: Set = set()
+        self.subscribers: Dict[str, Set] = {}  # stream name -> connections
+        self.combined: Set = set()
+        self.index = {s.lower(): i for i, s in enumerate(market.symbols)}
+        self.frames_sent = 0
+        self.seconds_sent = 0
+        self.trade_ids = 0
+        self.update_ids = 0
+        self.logger = logging.getLogger("FakeBinanceServer")
+
+    async def _handler(self, ws):
+        path = ws.request.path if hasattr(ws, 'request') else ws.path
+        if path.startswith('/ws/'):
+            streams = [path[len('/ws/'):]]
+        elif path.startswith('/stream'):
+            streams = path.split('streams=', 1)[-1].split('/')
+            self.combined.add(ws)
+        else:
+            await ws.close(1008, "unknown path")
+            return
+        self.connections.add(ws)
+        for stream in streams:
+            self.subscribers.setdefault(stream, set()).add(ws)
+        try:
+            await ws.wait_closed()
+        finally:
+            self.connections.discard(ws)
+            self.combined.discard(ws)
+            for stream in streams:
+                self.subscribers.get(stream, set()).discard(ws)
+
+    def _payloads(self, bars: dict, second: int, symbol: str, i: int, stream: str) -> List[dict]:
+        t = int(bars['t'][second])
+        if stream.endswith('@kline_1s'):
+            return [{"e": "kline", "E": t + 1000, "s": symbol.upper(), "k": {
+                "t": t, "T": t + 999, "s": symbol.upper(), "i": "1s",
+                "o": f"{bars['o'][i, second]:.8f}", "h": f"{bars['h'][i, second]:.8f}",
+                "l": f"{bars['l'][i, second]:.8f}", "c": f"{bars['c'][i, second]:.8f}",
+                "v": f"{bars['v'][i, second]:.8f}", "x": True}}]
+        if stream.endswith('@aggTrade'):
+            trades = trades_from_bars(bars, i, second, self.trade_ids)
+            self.trade_ids += len(trades)
+            return [{"e": "aggTrade", "E": tr['T'], "s": symbol.upper(), **tr} for tr in trades]
+        mid = float(bars['c'][i, second])
+        bids, asks = depth_levels(mid, rng=self.market.rng)
+        if stream.endswith('@bookTicker'):
+            return [{"u": t, "s": symbol.upper(), "b": bids[0][0], "B": bids[0][1],
+                     "a": asks[0][0], "A": asks[0][1]}]
+        if '@depth' in stream:
+            first = self.update_ids + 1
+            self.update_ids += 1
+            return [{"e": "depthUpdate", "E": t + 1000, "s": symbol.upper(),
+                     "U": first, "u": self.update_ids, "b": bids, "a": asks}]
+        return []
+
+    def _send_second(self, bars: dict, second: int):
+        for stream, conns in list(self.subscribers.items()):
+            if not conns:
+                continue
+            symbol = stream.split('@', 1)[0]
+            i = self.index.get(symbol)
+            if i is None:
+                continue
+            for payload in self._payloads(bars, second, symbol, i, stream):
+                raw = json.dumps(payload)
+                wrapped = json.dumps({"stream": stream, "data": payload})
+                for ws in conns:
+                    # Fire-and-forget keeps one slow client from stalling the rest
+                    asyncio.ensure_future(ws.send(wrapped if ws in self.combined else raw))
+                    self.frames_sent += 1
+
+    async def run(self):
+        async with websockets.serve(self._handler, self.host, self.port, max_queue=None):
+            self.logger.info(f"Fake Binance streams on ws://{self.host}:{self.port} "
+                             f"({len(self.market.symbols)} symbols, {self.speed}x)")
+            while len(self.connections) < self.min_connections:
+                await asyncio.sleep(0.05)
+            interval = 1.0 / self.speed
+            next_tick = time.perf_counter()
+            while self.duration_seconds is None or self.seconds_sent < self.duration_seconds:
+                n = self.chunk_seconds
+                if self.duration_seconds is not None:
+                    n = min(n, self.duration_seconds - self.seconds_sent)
+                bars = self.market.next_seconds(n)
+                for second in range(n):
+                    self._send_second(bars, second)
+                    self.seconds_sent += 1
+                    next_tick += interval
+                    await asyncio.sleep(max(0.0, next_tick - time.perf_counter()))
+
+def write_csv(market: SyntheticMarket, n_seconds: int, path: str, symbol_index: int = 0, chunk_seconds: int = 3600):
+    """Dataset CSV in the collectors' raw kline layout, generated chunk by chunk."""
+    import csv
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+        done = 0
+        while done < n_seconds:
+            n = min(chunk_seconds, n_seconds - done)
+            bars = market.next_seconds(n)
+            i = symbol_index
+            writer.writerows(zip(bars['t'].tolist(), bars['o'][i].tolist(), bars['h'][i].tolist(),
+                                 bars['l'][i].tolist(), bars['c'][i].tolist(), bars['v'][i].tolist()))
+            done += n
+
+async def soak(n_symbols: int, seconds: int, speed: float, port: int):
+    """Serve `n_symbols` and consume them with BinanceKlineStream; report throughput and lag."""
+    from data.binance_ws import BinanceKlineStream
+    symbols = [f"SYN{i:03d}USDT" for i in range(n_symbols)]
+    server = FakeBinanceServer(SyntheticMarket(symbols), port=port, speed=speed, duration_seconds=seconds,
+                               min_connections=n_symbols)
+    client = BinanceKlineStream(symbols, maxlen=60, ws_url=f"ws://127.0.0.1:{port}")
+    received = [0]
+    client.add_price_listener(lambda symbol, price: received.__setitem__(0, received[0] + 1))
+    client_task = asyncio.create_task(client.start())
+    started = time.perf_counter()
+    await server.run()
+    await asyncio.sleep(1.0)  # Drain in-flight frames
+    client.stop()
+    client_task.cancel()
+    elapsed = time.perf_counter() - started
+    expected = n_symbols * seconds
+    print(f"Simulated {seconds}s x {n_symbols} symbols in {elapsed:.1f}s wall")
+    print(f"Frames sent: {server.frames_sent:,} | received: {received[0]:,} / {expected:,} "
+          f"({received[0] / elapsed:,.0f} frames/s)")
+
+if __name__ == "__main__":
+    import sys
+    from pathlib import Path
+    sys.path.insert(0, str(Path(__file__).parent.parent))
+
+    parser = argparse.ArgumentParser(description="Synthetic Binance market data.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_serve = sub.add_parser("serve", help="Run a fake Binance websocket server")
+    p_serve.add_argument("--symbols", default="BTCUSDT,ETHUSDT", help="Comma list, or a count for SYNxxxUSDT")
+    p_serve.add_argument("--port", type=int, default=8765)
+    p_serve.add_argument("--speed", type=float, default=1.0, help="Simulated seconds per wall second")
+    p_serve.add_argument("--hours", type=float, default=None)
+    p_csv = sub.add_parser("csv", help="Write one symbol's bars as a dataset CSV")
+    p_csv.add_argument("output")
+    p_csv.add_argument("--hours", type=float, default=1.0)
+    p_soak = sub.add_parser("soak", help="Serve and consume N symbols locally")
+    p_soak.add_argument("--symbols", type=int, default=100)
+    p_soak.add_argument("--seconds", type=int, default=600)
+    p_soak.add_argument("--speed", type=float, default=60.0)
+    p_soak.add_argument("--port", type=int, default=8765)
+    for p in (p_serve, p_csv):
+        p.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if args.cmd == "serve":
+        symbols = ([f"SYN{i:03d}USDT" for i in range(int(args.symbols))] if args.symbols.isdigit()
+                   else args.symbols.split(','))
+        duration = int(args.hours * 3600) if args.hours else None
+        market = SyntheticMarket(symbols, seed=args.seed,
+                                 base_prices={"BTCUSDT": 60000.0, "ETHUSDT": 3000.0})
+        asyncio.run(FakeBinanceServer(market, port=args.port, speed=args.speed, duration_seconds=duration).run())
+    elif args.cmd == "csv":
+        market = SyntheticMarket(["BTCUSDT"], seed=args.seed, base_prices={"BTCUSDT": 60000.0})
+        write_csv(market, int(args.hours * 3600), args.output)
+        print(f"✅ Wrote {int(args.hours * 3600)} synthetic 1s bars to {args.output}")
+    else:
+        asyncio.run(soak(args.symbols, args.seconds, args.speed, args.port))
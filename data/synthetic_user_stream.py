@@ -0,0 +1,175 @@
+# TARGET_FILE: data/synthetic_user_stream.py
+"""
+Local stand-in for Binance's user data stream: listenKeys issued in-process
+and a websocket server at /ws/<listenKey> pushing executionReport,
+outboundAccountPosition and listenKeyExpired events in Binance's format,
+so AccountModel and UserDataStream can be exercised offline.
+
+    python data/synthetic_user_stream.py demo
+"""
+import argparse
+import asyncio
+import json
+import logging
+import time
+import uuid
+from typing import Dict, Optional, Set
+import websockets
+
+def execution_report(order_id: int, symbol: str, side: str, order_type: str, status: str, qty: float,
+                     price: float, executed_qty: Optional[float] = None, order_list_id: int = -1) -> dict:
+    """executionReport for one order; FILLED defaults to fully executed at `price`."""
+    if executed_qty is None:
+        executed_qty = qty if status == 'FILLED' else 0.0
+    now = int(time.time() * 1000)
+    return {
+        "e": "executionReport", "E": now, "s": symbol, "c": f"local{order_id}", "S": side, "o": order_type,
+        "q": f"{qty:.8f}", "p": f"{price:.8f}", "X": status, "x": "TRADE" if executed_qty else status,
+        "i": order_id, "l": f"{executed_qty:.8f}", "z": f"{executed_qty:.8f}",
+        "L": f"{price if executed_qty else 0.0:.8f}", "Z": f"{executed_qty * price:.8f}", "T": now,
+        "g": order_list_id,
+    }
+
+def account_position(balances: Dict[str, tuple]) -> dict:
+    """outboundAccountPosition from {asset: (free, locked)}."""
+    now = int(time.time() * 1000)
+    return {"e": "outboundAccountPosition", "E": now, "u": now,
+            "B": [{"a": a, "f": f"{free:.8f}", "l": f"{locked:.8f}"} for a, (free, locked) in balances.items()]}
+
+class FakeUserStreamServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 8767):
+        self.host = host
+        self.port = port
+        self.listen_keys: Dict[str, float] = {}  # listenKey -> last keepalive (monotonic)
+        self.connections: Dict[str, Set] = {}
+        self.issued = 0
+        self.server = None
+
+    @property
+    def ws_url(self) -> str:
+        return f"ws://{self.host}:{self.port}"
+
+    def new_listen_key(self) -> str:
+        key = uuid.uuid4().hex
+        self.listen_keys[key] = time.monotonic()
+        self.issued += 1
+        return key
+
+    def keepalive(self, listen_key: str):
+        if listen_key not in self.listen_keys:
+            raise ValueError(f"Unknown listenKey {listen_key}")
+        self.listen_keys[listen_key] = time.monotonic()
+
+    async def _handler(self, ws):
+        path = ws.request.path if hasattr(ws, 'request') else ws.path
+        key = path[len('/ws/'):]
+        if not path.startswith('/ws/') or key not in self.listen_keys:
+            await ws.close(1008, "invalid listenKey")
+            return
+        self.connections.setdefault(key, set()).add(ws)
+        try:
+            await ws.wait_closed()
+        finally:
+            self.connections[key].discard(ws)
+
+    async def start(self):
+        self.server = await websockets.serve(self._handler, self.host, self.port)
+
+    async def close(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+
+    async def publish(self, event: dict, listen_key: Optional[str] = None):
+        """Send `event` to one listenKey's connections, or to every live one."""
+        msg = json.dumps(event)
+        keys = [listen_key] if listen_key else [k for k in self.connections if k in self.listen_keys]
+        for key in keys:
+            for ws in list(self.connections.get(key, ())):
+                await ws.send(msg)
+
+    async def expire(self, listen_key: str):
+        """Invalidate a listenKey the way Binance does: a listenKeyExpired event, then no more data."""
+        await self.publish({"e": "listenKeyExpired", "E": int(time.time() * 1000), "listenKey": listen_key},
+                           listen_key)
+        self.listen_keys.pop(listen_key, None)
+
+class LocalListenKeyClient:
+    """The two python-binance Client calls UserDataStream makes, served by a FakeUserStreamServer."""
+    def __init__(self, server: FakeUserStreamServer):
+        self.server = server
+
+    def stream_get_listen_key(self) -> str:
+        return self.server.new_listen_key()
+
+    def stream_keepalive(self, listen_key: str):
+        self.server.keepalive(listen_key)
+
+async def _wait_for(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise TimeoutError("condition not met")
+        await asyncio.sleep(0.01)
+
+async def demo(port: int) -> bool:
+    """An entry fill and its OCO bracket resolving, then a listenKey expiry, through UserDataStream."""
+    from data.user_stream import AccountModel, UserDataStream
+    server = FakeUserStreamServer(port=port)
+    await server.start()
+    account = AccountModel()
+    account.seed({"balances": [{"asset": "USDT", "free": "1000", "locked": "0"}]})
+    updates = []
+    account.add_order_listener(updates.append)
+    stream = UserDataStream(LocalListenKeyClient(server), account, ws_url=server.ws_url)
+    task = asyncio.create_task(stream.start())
+    try:
+        await _wait_for(lambda: stream.connected)
+        await server.publish(execution_report(1, "BTCUSDT", "BUY", "MARKET", "FILLED", 0.001, 60000.0))
+        await server.publish(account_position({"USDT": (940.0, 0.0), "BTC": (0.001, 0.0)}))
+        await server.publish(execution_report(2, "BTCUSDT", "SELL", "LIMIT_MAKER", "NEW", 0.001, 60150.0,
+                                              order_list_id=7))
+        await server.publish(execution_report(3, "BTCUSDT", "SELL", "STOP_LOSS_LIMIT", "NEW", 0.001, 59910.0,
+                                              order_list_id=7))
+        await server.publish(execution_report(3, "BTCUSDT", "SELL", "STOP_LOSS_LIMIT", "FILLED", 0.001, 59910.0,
+                                              order_list_id=7))
+        await server.publish(execution_report(2, "BTCUSDT", "SELL", "LIMIT_MAKER", "EXPIRED", 0.001, 60150.0,
+                                              order_list_id=7))
+        await _wait_for(lambda: len(updates) == 5)
+
+        # Expiry: the stream takes a new listenKey and reconnects
+        expired = stream.listen_key
+        await server.expire(expired)
+        await _wait_for(lambda: stream.connected and stream.listen_key != expired)
+        await server.publish(account_position({"USDT": (999.91, 0.0), "BTC": (0.0, 0.0)}))
+        await _wait_for(lambda: account.free("BTC") == 0.0)
+    except TimeoutError:
+        pass
+    finally:
+        stream.stop()
+        task.cancel()
+        await server.close()
+
+    statuses = [(o["order_id"], o["status"]) for o in updates]
+    entry = account.orders.get(1, {})
+    ok = (statuses == [(1, 'FILLED'), (2, 'NEW'), (3, 'NEW'), (3, 'FILLED'), (2, 'EXPIRED')]
+          and entry.get("avg_price") == 60000.0 and account.free("USDT") == 999.91 and account.free("BTC") == 0.0)
+    print(f"Order updates: {statuses}")
+    print(f"Entry avg price: {entry.get('avg_price')} | balances: USDT {account.free('USDT')}, "
+          f"BTC {account.free('BTC')} | listenKeys issued: {server.issued}")
+    print("✅ User stream demo OK" if ok else "❌ User stream demo FAILED")
+    return ok
+
+if __name__ == "__main__":
+    import sys
+    from pathlib import Path
+    sys.path.insert(0, str(Path(__file__).parent.parent))
+
+    parser = argparse.ArgumentParser(description="Local Binance user data stream stand-in.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_demo = sub.add_parser("demo", help="Drive UserDataStream + AccountModel through fills and a listenKey expiry")
+    p_demo.add_argument("--port", type=int, default=8767)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    sys.exit(0 if asyncio.run(demo(args.port)) else 1)
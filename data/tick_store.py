@@ -0,0 +1,97 @@
+# TARGET_FILE: data/tick_store.py
+import logging
+from decimal import Decimal
+from typing import Dict, Iterable, Iterator, List, Optional
+import numpy as np
+
+logger = logging.getLogger("TickStore")
+
+PRICE_FIELDS = ('o', 'h', 'l', 'c')
+
+class TickKlineBuffer:
+    """
+    Last `capacity` klines of one symbol as columns: 't' (open time, ms) and
+    'o'/'h'/'l'/'c' as int64 multiples of the symbol's tick size, 'v' as
+    float64. Prices are exact integers, so deltas between them are exact.
+    Each row is written twice (at i and i + capacity) so every window is one
+    contiguous view; updates of the newest kline overwrite it in place.
+
+    It is the symbol's only kline store, so it also reads like the deque of
+    kline dicts it replaces: len(), `maxlen`, and iteration (oldest first)
+    rebuild the dicts, prices rounded back to the tick's decimals.
+    benchmarks/feature_precision.py checks features from these columns
+    against exact arithmetic and measures what float32 prices lose.
+    """
+    def __init__(self, capacity: int, tick_size: float):
+        self.capacity = capacity
+        self.tick_size = tick_size
+        self.inv_tick = 1.0 / tick_size
+        self.decimals = max(0, -Decimal(repr(tick_size)).normalize().as_tuple().exponent)
+        self.ints = np.zeros((5, 2 * capacity), dtype=np.int64)  # t, o, h, l, c
+        self.volume = np.zeros(2 * capacity, dtype=np.float64)
+        self.count = 0
+        self.last_t = None
+        self.last_final = False
+        self.misaligned = False
+
+    @property
+    def maxlen(self) -> int:
+        return self.capacity
+
+    def __len__(self) -> int:
+        return min(self.count, self.capacity)
+
+    def __iter__(self) -> Iterator[dict]:
+        return iter(self.klines(len(self)))
+
+    def to_ticks(self, price: float) -> int:
+        ticks = round(price * self.inv_tick)
+        if not self.misaligned and abs(ticks * self.tick_size - price) > self.tick_size * 1e-3:
+            self.misaligned = True
+            logger.warning(f"Price {price} is not a multiple of tick size {self.tick_size}")
+        return ticks
+
+    def write(self, kline: dict) -> bool:
+        """Store `kline`; False (and nothing stored) if it is older than the newest one."""
+        if self.last_t is not None and kline['t'] <= self.last_t:
+            if kline['t'] < self.last_t:
+                return False
+            self.count -= 1  # Newer update of the same kline
+        i = self.count % self.capacity
+        row = (kline['t'], self.to_ticks(kline['o']), self.to_ticks(kline['h']),
+               self.to_ticks(kline['l']), self.to_ticks(kline['c']))
+        self.ints[:, i] = row
+        self.ints[:, i + self.capacity] = row
+        self.volume[i] = self.volume[i + self.capacity] = kline['v']
+        self.count += 1
+        self.last_t = kline['t']
+        self.last_final = kline.get('x', True)
+        return True
+
+    def reset(self, klines: Iterable[dict]):
+        self.count = 0
+        self.last_t = None
+        for kline in klines:
+            self.write(kline)
+
+    def last(self, n: int) -> Optional[Dict[str, np.ndarray]]:
+        """Last n klines as column views, oldest first, or None if fewer are stored."""
+        if self.count < n or n > self.capacity:
+            return None
+        end = self.count % self.capacity + self.capacity
+        cols = {f: self.ints[j, end - n:end] for j, f in enumerate(('t',) + PRICE_FIELDS)}
+        cols['v'] = self.volume[end - n:end]
+        return cols
+
+    def klines(self, n: int) -> List[dict]:
+        """Up to the last n klines as dicts, oldest first; all but the newest are final."""
+        n = min(n, len(self))
+        if n <= 0:
+            return []
+        cols = self.last(n)
+        tick, decimals = self.tick_size, self.decimals
+        rows = zip(cols['t'].tolist(), *((cols[f] * tick).tolist() for f in PRICE_FIELDS), cols['v'].tolist())
+        klines = [{'t': t, 'o': round(o, decimals), 'h': round(h, decimals), 'l': round(l, decimals),
+                   'c': round(c, decimals), 'v': v, 'x': True} for t, o, h, l, c, v in rows]
+        klines[-1]['x'] = self.last_final
+        return klines
@@ -0,0 +1,134 @@
+# TARGET_FILE: data/user_stream.py
+import asyncio
+import json
+import logging
+from typing import Callable, Dict, List, Optional
+import websockets
+
+class AccountModel:
+    """
+    In-memory balances and order states, kept current from user-data stream
+    events. Fill prices come from the exchange (cumulative quote / cumulative
+    qty), not from the last kline.
+    """
+    def __init__(self, max_orders: int = 1000):
+        self.max_orders = max_orders
+        self.balances: Dict[str, Dict[str, float]] = {}
+        self.orders: Dict[int, dict] = {}
+        self.order_listeners: List[Callable[[dict], None]] = []
+        self.seeded = False
+
+    def seed(self, account_info: dict):
+        """Initial balances from one GET /api/v3/account; the stream keeps them current."""
+        for bal in account_info['balances']:
+            self.balances[bal['asset']] = {"free": float(bal['free']), "locked": float(bal['locked'])}
+        self.seeded = True
+
+    def add_order_listener(self, listener: Callable[[dict], None]):
+        """Call `listener(order)` on every executionReport."""
+        self.order_listeners.append(listener)
+
+    def free(self, asset: str) -> float:
+        return self.balances.get(asset, {}).get("free", 0.0)
+
+    def apply_event(self, event: dict):
+        kind = event.get('e')
+        if kind == 'executionReport':
+            self._apply_execution_report(event)
+        elif kind == 'outboundAccountPosition':
+            for bal in event['B']:
+                self.balances[bal['a']] = {"free": float(bal['f']), "locked": float(bal['l'])}
+        elif kind == 'balanceUpdate':
+            bal = self.balances.setdefault(event['a'], {"free": 0.0, "locked": 0.0})
+            bal["free"] += float(event['d'])
+
+    def _apply_execution_report(self, event: dict):
+        executed = float(event['z'])
+        cum_quote = float(event['Z'])
+        order = {
+            "order_id": event['i'],
+            "client_order_id": event['c'],
+            "symbol": event['s'],
+            "side": event['S'],
+            "type": event['o'],
+            "status": event['X'],
+            "order_list_id": event.get('g', -1),
+            "executed_qty": executed,
+            "cum_quote_qty": cum_quote,
+            "avg_price": cum_quote / executed if executed > 0 else None,
+            "last_fill_price": float(event['L']),
+            "update_time": event['T'],
+        }
+        self.orders.pop(order["order_id"], None)
+        self.orders[order["order_id"]] = order  # Re-insert: dict order = recency
+        if len(self.orders) > self.max_orders:
+            del self.orders[next(iter(self.orders))]
+        for listener in self.order_listeners:
+            listener(order)
+
+class UserDataStream:
+    def __init__(self, client, account: AccountModel,
+                 ws_url: str = "wss://stream.testnet.binance.vision",
+                 keepalive_interval: float = 30 * 60):
+        """
+        listenKey-based user-data stream. `client` only needs
+        stream_get_listen_key() and stream_keepalive(listenKey) (python-binance
+        Client, or data/synthetic_user_stream.py's LocalListenKeyClient together
+        with its server's `ws_url`).
+        """
+        self.client = client
+        self.account = account
+        self.ws_url = ws_url.rstrip('/')
+        self.keepalive_interval = keepalive_interval
+        self.listen_key: Optional[str] = None
+        self.connected = False
+        self.running = False
+        self.logger = logging.getLogger("UserDataStream")
+
+    async def _handle_message(self, msg: str) -> bool:
+        """Apply one frame; False when the listen key expired and must be renewed."""
+        try:
+            event = json.loads(msg)
+            event = event.get('data', event)
+            if event.get('e') == 'listenKeyExpired':
+                return False
+            self.account.apply_event(event)
+        except Exception as e:
+            self.logger.error(f"Error parsing user data event: {e}")
+        return True
+
+    async def _keepalive_loop(self):
+        while self.running:
+            await asyncio.sleep(self.keepalive_interval)
+            try:
+                await asyncio.to_thread(self.client.stream_keepalive, self.listen_key)
+            except Exception as e:
+                self.logger.error(f"listenKey keepalive failed: {e}")
+
+    async def start(self):
+        self.running = True
+        keepalive_task = None
+        try:
+            while self.running:
+                try:
+                    self.listen_key = await asyncio.to_thread(self.client.stream_get_listen_key)
+                    if keepalive_task is None:
+                        keepalive_task = asyncio.create_task(self._keepalive_loop())
+                    async with websockets.connect(f"{self.ws_url}/ws/{self.listen_key}") as ws:
+                        self.connected = True
+                        self.logger.info("Connected to user data stream")
+                        while self.running:
+                            if not await self._handle_message(await ws.recv()):
+                                self.logger.warning("listenKey expired, renewing")
+                                break
+                except Exception as e:
+                    self.logger.error(f"User data WS error: {e}, reconnecting in 2s...")
+                    await asyncio.sleep(2)
+                finally:
+                    self.connected = False
+        finally:
+            if keepalive_task:
+                keepalive_task.cancel()
+
+    def stop(self):
+        self.running = False
@@ -0,0 +1,220 @@
+# TARGET_FILE: evaluate_walk_forward.py
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import xgboost as xgb
+
+from data.dataset_cache import DatasetCache, feature_set_key, labeling_key, load_training_data
+from strategies.scalping_features import FeaturePipeline, load_feature_pipeline
+
+CACHE_DIR = os.path.join("datasets", ".cache", "walk_forward")
+BUY_CUTOFF = 0.6   # Same cutoffs as predict_signal
+SELL_CUTOFF = 0.4
+
+MODEL_PARAMS = dict(
+    n_estimators=100,
+    max_depth=4,
+    learning_rate=0.1,
+    subsample=0.8,
+    colsample_bytree=0.8,
+    random_state=42,
+    eval_metric='logloss',
+    n_jobs=1  # One core per window; the pool provides the parallelism
+)
+
+def _fingerprint(*parts) -> str:
+    return hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+def _source_fingerprint(data_path: str) -> str:
+    st = os.stat(data_path)
+    return _fingerprint(os.path.abspath(data_path), st.st_size, st.st_mtime_ns)
+
+def build_windows(n_rows: int, train_size: int, test_size: int, step: int) -> list:
+    """Rolling (train_start, train_end, test_end) index triples."""
+    windows = []
+    start = 0
+    while start + train_size + test_size <= n_rows:
+        windows.append((start, start + train_size, start + train_size + test_size))
+        start += step
+    return windows
+
+def _window_data(task: dict) -> dict:
+    """One window's train/test slices of the (cached, memory-mapped) featurized dataset."""
+    data = load_training_data(task["data_path"], FeaturePipeline(task["feature_cols"]), task["labeling"],
+                              DatasetCache(task["dataset_cache_dir"], float('inf')))
+    train_start, train_end, test_end = task["window"]
+    # Drop the last `look_ahead` training rows: their labels peek into the test window
+    train_stop = max(train_start, train_end - task["labeling"]["look_ahead_seconds"])
+    return {
+        "X_train": data['X'][train_start:train_stop],
+        "y_train": data['y'][train_start:train_stop],
+        "X_test": data['X'][train_end:test_end],
+        "y_test": data['y'][train_end:test_end],
+        "fwd_test": data['fwd'][train_end:test_end],
+        "t_range": (data['t'][train_start], data['t'][test_end - 1]),
+    }
+
+def _score(prob: np.ndarray, y: np.ndarray, fwd: np.ndarray, fee_pct: float) -> dict:
+    labeled = ~np.isnan(y)
+    buy = prob > BUY_CUTOFF
+    sell = prob < SELL_CUTOFF
+    accuracy = float(np.mean((prob[labeled] > 0.5) == (y[labeled] == 1))) if labeled.any() else float('nan')
+    buy_lab = buy & labeled
+    sell_lab = sell & labeled
+    precision_buy = float(np.mean(y[buy_lab] == 1)) if buy_lab.any() else float('nan')
+    precision_sell = float(np.mean(y[sell_lab] == 0)) if sell_lab.any() else float('nan')
+
+    # Simulated PnL: enter on every signal, exit after the look-ahead horizon
+    direction = buy.astype(np.float64) - sell.astype(np.float64)
+    traded = (direction != 0) & ~np.isnan(fwd)
+    trade_returns = direction[traded] * fwd[traded] - fee_pct / 100.0
+    return {
+        "accuracy": accuracy,
+        "precision_buy": precision_buy,
+        "precision_sell": precision_sell,
+        "trades": int(traded.sum()),
+        "pnl_pct": float(trade_returns.sum() * 100),
+        "win_rate": float(np.mean(trade_returns > 0)) if len(trade_returns) else float('nan'),
+    }
+
+def evaluate_window(task: dict) -> dict:
+    """Train on one window's history and score the following test slice."""
+    result_path = task["result_path"]
+    if os.path.exists(result_path):
+        with open(result_path) as f:
+            return json.load(f)
+
+    data = _window_data(task)
+    train_mask = ~np.isnan(data["y_train"])
+    X_train = data["X_train"][train_mask]
+    y_train = data["y_train"][train_mask].astype(int)
+    result = {
+        "window": task["index"],
+        "t_start": int(data["t_range"][0]),
+        "t_end": int(data["t_range"][1]),
+        "train_samples": int(len(y_train)),
+        "test_rows": int(len(data["y_test"])),
+    }
+
+    if len(np.unique(y_train)) < 2:
+        result["status"] = "skipped: single class in training window"
+    else:
+        model = xgb.XGBClassifier(**MODEL_PARAMS)
+        model.fit(X_train, y_train)
+        prob = model.predict_proba(data["X_test"])[:, 1]
+        result["candidate"] = _score(prob, data["y_test"], data["fwd_test"], task["fee_pct"])
+        result["status"] = "ok"
+
+    if task.get("baseline_path"):
+        baseline = xgb.Booster()
+        baseline.load_model(task["baseline_path"])
+        prob = baseline.predict(xgb.DMatrix(data["X_test"]))
+        result["baseline"] = _score(prob, data["y_test"], data["fwd_test"], task["fee_pct"])
+
+    with open(result_path, 'w') as f:
+        json.dump(result, f)
+    return result
+
+def walk_forward_evaluate(data_path: str, train_size: int = 300, test_size: int = 60, step: int = 60,
+                          look_ahead: int = 2, threshold_pct: float = 0.02, fee_pct: float = 0.0,
+                          baseline_path: str = None, workers: int = None, cache_dir: str = CACHE_DIR,
+                          config_path: str = "settings.yaml") -> list:
+    pipeline = load_feature_pipeline(config_path)
+    feature_cols = pipeline.names
+    labeling = {"method": "threshold", "look_ahead_seconds": look_ahead, "threshold_pct": threshold_pct}
+    # Featurize and label once (or reuse the cached matrices); workers map the same files
+    dataset_cache = DatasetCache.from_settings(config_path)
+    n_rows = len(load_training_data(data_path, pipeline, labeling, dataset_cache)['t'])
+
+    windows = build_windows(n_rows, train_size, test_size, step)
+    if not windows:
+        print(f"Not enough data for one window ({n_rows} rows, need {train_size + test_size}).")
+        return []
+
+    os.makedirs(cache_dir, exist_ok=True)
+    source_key = dataset_cache.source_key(data_path)
+    baseline_fp = _source_fingerprint(baseline_path) if baseline_path and os.path.exists(baseline_path) else None
+    tasks = []
+    for i, window in enumerate(windows):
+        result_key = _fingerprint(source_key, window, labeling_key(labeling), feature_set_key(pipeline),
+                                  MODEL_PARAMS, fee_pct, baseline_fp)
+        tasks.append({
+            "index": i,
+            "window": window,
+            "data_path": data_path,
+            "feature_cols": feature_cols,
+            "labeling": labeling,
+            "dataset_cache_dir": dataset_cache.root,
+            "result_path": os.path.join(cache_dir, f"result_{result_key}.json"),
+            "baseline_path": baseline_path if baseline_fp else None,
+            "fee_pct": fee_pct,
+        })
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(evaluate_window, tasks))
+
+def _nanmean(values: list) -> float:
+    values = [v for v in values if not np.isnan(v)]
+    return float(np.mean(values)) if values else float('nan')
+
+def _summarize(results: list, key: str) -> dict:
+    scored = [r[key] for r in results if key in r]
+    if not scored:
+        return {}
+    return {
+        "windows": len(scored),
+        "mean_accuracy": _nanmean([s["accuracy"] for s in scored]),
+        "mean_precision_buy": _nanmean([s["precision_buy"] for s in scored]),
+        "mean_precision_sell": _nanmean([s["precision_sell"] for s in scored]),
+        "total_trades": int(sum(s["trades"] for s in scored)),
+        "total_pnl_pct": float(sum(s["pnl_pct"] for s in scored)),
+    }
+
+def print_report(results: list):
+    print(f"\n{'win':>4} {'model':>9} {'acc':>6} {'p_buy':>6} {'p_sell':>6} {'trades':>6} {'pnl%':>8}")
+    for r in results:
+        for key in ("candidate", "baseline"):
+            if key in r:
+                s = r[key]
+                print(f"{r['window']:>4} {key:>9} {s['accuracy']:>6.3f} {s['precision_buy']:>6.3f} "
+                      f"{s['precision_sell']:>6.3f} {s['trades']:>6} {s['pnl_pct']:>8.4f}")
+        if r.get("status", "ok") != "ok":
+            print(f"{r['window']:>4} {r['status']}")
+    for key in ("candidate", "baseline"):
+        summary = _summarize(results, key)
+        if summary:
+            print(f"\n{key.capitalize()} summary: {json.dumps(summary, indent=2)}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Walk-forward evaluation of the scalping model.")
+    parser.add_argument("--data", default="datasets/btcusdt_volatile_1s_data.csv")
+    parser.add_argument("--baseline", default="models/scalping_model.json",
+                        help="Existing model to score on the same test windows")
+    parser.add_argument("--train-size", type=int, default=300)
+    parser.add_argument("--test-size", type=int, default=60)
+    parser.add_argument("--step", type=int, default=60)
+    parser.add_argument("--look-ahead", type=int, default=2)
+    parser.add_argument("--threshold-pct", type=float, default=0.02)
+    parser.add_argument("--fee-pct", type=float, default=0.0, help="Round-trip fee per simulated trade")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--json", help="Write per-window results to this file")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.data):
+        print(f"Error: {args.data} not found!")
+    else:
+        started = time.time()
+        results = walk_forward_evaluate(
+            args.data, args.train_size, args.test_size, args.step, args.look_ahead,
+            args.threshold_pct, args.fee_pct, args.baseline, args.workers
+        )
+        print_report(results)
+        print(f"\nEvaluated {len(results)} windows in {time.time() - started:.2f}s")
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump(results, f, indent=2)
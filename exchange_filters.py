@@ -0,0 +1,125 @@
+# TARGET_FILE: exchange_filters.py
+import json
+import logging
+import os
+import time
+import urllib.request
+from decimal import Decimal, ROUND_CEILING, ROUND_FLOOR, ROUND_HALF_UP
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger("ExchangeFilters")
+
+class SymbolFilters:
+    """LOT_SIZE / PRICE_FILTER / MIN_NOTIONAL for one symbol as exact Decimal quantizers."""
+    __slots__ = ("symbol", "step_size", "min_qty", "max_qty", "tick_size", "min_notional")
+
+    def __init__(self, symbol: str, step_size: str, min_qty: str, max_qty: str, tick_size: str, min_notional: str):
+        self.symbol = symbol
+        self.step_size = Decimal(step_size).normalize()
+        self.min_qty = Decimal(min_qty)
+        self.max_qty = Decimal(max_qty)
+        self.tick_size = Decimal(tick_size).normalize()
+        self.min_notional = Decimal(min_notional)
+
+    @classmethod
+    def fallback(cls, symbol: str) -> "SymbolFilters":
+        """Best guess used only when exchangeInfo is unavailable (BTC/ETH-style pairs)."""
+        step = "0.0001" if 'ETH' in symbol and 'BTC' not in symbol else "0.00001"
+        return cls(symbol, step, step, "9000", "0.01", "10")
+
+    def quantize_qty(self, qty: float) -> Decimal:
+        """Round down to a multiple of the lot step (never over-sell)."""
+        return (Decimal(repr(qty)) / self.step_size).to_integral_value(ROUND_FLOOR) * self.step_size
+
+    def quantize_price(self, price: float) -> Decimal:
+        return (Decimal(repr(price)) / self.tick_size).quantize(Decimal(1), rounding=ROUND_HALF_UP) * self.tick_size
+
+    def format_qty(self, qty: float) -> str:
+        return format(self.quantize_qty(qty).quantize(self.step_size), 'f')
+
+    def format_price(self, price: float) -> str:
+        return format(self.quantize_price(price).quantize(self.tick_size), 'f')
+
+    def size_for_notional(self, usdt_amount: float, price: float) -> Decimal:
+        """Largest valid qty for `usdt_amount`, raised to the smallest one meeting min qty / notional."""
+        price_d = Decimal(repr(price))
+        qty = self.quantize_qty(usdt_amount / price)
+        floor_qty = max(self.min_qty, (self.min_notional / price_d / self.step_size).to_integral_value(ROUND_CEILING) * self.step_size)
+        return min(max(qty, floor_qty), self.max_qty)
+
+    def to_dict(self) -> dict:
+        return {
+            "step_size": str(self.step_size), "min_qty": str(self.min_qty), "max_qty": str(self.max_qty),
+            "tick_size": str(self.tick_size), "min_notional": str(self.min_notional)
+        }
+
+def parse_exchange_info(info: dict) -> Dict[str, SymbolFilters]:
+    filters = {}
+    for sym in info['symbols']:
+        by_type = {f['filterType']: f for f in sym['filters']}
+        lot = by_type.get('LOT_SIZE', {})
+        price = by_type.get('PRICE_FILTER', {})
+        notional = by_type.get('NOTIONAL') or by_type.get('MIN_NOTIONAL') or {}
+        filters[sym['symbol']] = SymbolFilters(
+            sym['symbol'],
+            lot.get('stepSize', "0.00001"), lot.get('minQty', "0"), lot.get('maxQty', "9000000"),
+            price.get('tickSize', "0.01"), notional.get('minNotional', "0")
+        )
+    return filters
+
+class ExchangeFilterCache:
+    def __init__(self, base_url: str = "https://testnet.binance.vision",
+                 path: str = "exchange_info_cache.json", ttl_seconds: float = 24 * 3600,
+                 fetch: Optional[Callable[[], dict]] = None):
+        """
+        exchangeInfo filters for all symbols, fetched once and persisted to
+        `path` for `ttl_seconds`. `fetch` overrides the REST call (stand-ins).
+        """
+        self.base_url = base_url.rstrip('/')
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.fetch = fetch or self._fetch_exchange_info
+        self.filters: Dict[str, SymbolFilters] = {}
+
+    def _fetch_exchange_info(self) -> dict:
+        with urllib.request.urlopen(f"{self.base_url}/api/v3/exchangeInfo", timeout=10) as resp:
+            return json.loads(resp.read())
+
+    def _load_from_disk(self, allow_stale: bool) -> bool:
+        try:
+            with open(self.path) as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if not allow_stale and time.time() - cached.get("fetched_at", 0) > self.ttl_seconds:
+            return False
+        self.filters = {sym: SymbolFilters(sym, **f) for sym, f in cached["symbols"].items()}
+        return True
+
+    def load(self) -> "ExchangeFilterCache":
+        if self._load_from_disk(allow_stale=False):
+            logger.info(f"Loaded filters for {len(self.filters)} symbols from {self.path}")
+            return self
+        try:
+            self.filters = parse_exchange_info(self.fetch())
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump({
+                    "fetched_at": time.time(),
+                    "symbols": {sym: flt.to_dict() for sym, flt in self.filters.items()}
+                }, f)
+            os.replace(tmp_path, self.path)
+            logger.info(f"Fetched filters for {len(self.filters)} symbols")
+        except Exception as e:
+            logger.error(f"Failed to fetch exchangeInfo: {e}")
+            if self._load_from_disk(allow_stale=True):
+                logger.warning(f"Using stale filters from {self.path}")
+        return self
+
+    def get(self, symbol: str) -> SymbolFilters:
+        symbol = symbol.upper()
+        flt = self.filters.get(symbol)
+        if flt is None:
+            logger.warning(f"No exchange filters for {symbol}, using fallback precision")
+            flt = self.filters[symbol] = SymbolFilters.fallback(symbol)
+        return flt
@@ -48,5 +48,22 @@ def generate_mock_scalping_data(output_path: str, n_samples: int = 2000):
     print(f"✅ Generated {len(df)} mock labeled samples to {output_path}")
     print(f"Class distribution:\n{df['label'].value_counts()}")
 
+def generate_mock_klines(n_klines: int = 3600, seed: int = 42, base_price: float = 60000.0,
+                         start_ms: int = 1700000000000) -> list:
+    """Deterministic 1s klines in the compact stream shape ({'t','o','h','l','c','v'})."""
+    rng = np.random.default_rng(seed)
+    closes = base_price * np.exp(np.cumsum(rng.normal(0, 0.0002, n_klines)))
+    opens = np.r_[base_price, closes[:-1]]
+    wick = np.abs(rng.normal(0, 0.0001, (2, n_klines))) * closes
+    highs = np.maximum(opens, closes) + wick[0]
+    lows = np.minimum(opens, closes) - wick[1]
+    volumes = rng.exponential(1.0, n_klines)
+    times = start_ms + np.arange(n_klines) * 1000
+    return [
+        {'t': t, 'o': o, 'h': h, 'l': l, 'c': c, 'v': v}
+        for t, o, h, l, c, v in zip(times.tolist(), opens.tolist(), highs.tolist(),
+                                    lows.tolist(), closes.tolist(), volumes.tolist())
+    ]
+
 if __name__ == "__main__":
     generate_mock_scalping_data("datasets/btcusdt_1s_labeled.csv", n_samples=2000)
\ No newline at end of file
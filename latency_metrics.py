@@ -0,0 +1,194 @@
+# TARGET_FILE: latency_metrics.py
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+logger = logging.getLogger("LatencyMetrics")
+
+SUB_BITS = 5           # 32 sub-buckets per power of two: ~3% relative error
+SUB_COUNT = 1 << SUB_BITS
+MAX_BUCKETS = SUB_COUNT * (64 - SUB_BITS + 1)
+
+def _bucket_index(value: int) -> int:
+    if value < SUB_COUNT:
+        return value
+    shift = value.bit_length() - SUB_BITS - 1
+    return SUB_COUNT * (shift + 1) + (value >> shift) - SUB_COUNT
+
+def _bucket_value(index: int) -> int:
+    """Midpoint of the values that land in `index`."""
+    if index < SUB_COUNT:
+        return index
+    shift = index // SUB_COUNT - 1
+    low = (SUB_COUNT + index % SUB_COUNT) << shift
+    return low + ((1 << shift) >> 1)
+
+class LatencyHistogram:
+    """
+    HDR-style log-linear histogram of nanosecond durations. Recording is one
+    list increment; memory is fixed regardless of sample count.
+    """
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts: List[int] = [0] * MAX_BUCKETS
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, value_ns: int):
+        if value_ns < 0:
+            value_ns = 0
+        self.counts[_bucket_index(value_ns)] += 1
+        self.count += 1
+        self.total += value_ns
+        if value_ns > self.max:
+            self.max = value_ns
+
+    def percentile(self, q: float) -> int:
+        if self.count == 0:
+            return 0
+        rank = max(1, int(q * self.count + 0.5))
+        seen = 0
+        for index, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min(_bucket_value(index), self.max)
+        return self.max
+
+class LatencyRecorder:
+    QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+    def __init__(self):
+        """Per-stage histograms keyed by stage name, timed with the monotonic ns clock."""
+        self.enabled = True
+        self.clock = time.perf_counter_ns
+        self.histograms: Dict[str, LatencyHistogram] = {}
+
+    def record_ns(self, stage: str, elapsed_ns: int):
+        hist = self.histograms.get(stage)
+        if hist is None:
+            hist = self.histograms[stage] = LatencyHistogram()
+        hist.record(elapsed_ns)
+
+    def since(self, stage: str, start_ns: int) -> int:
+        """Record time elapsed since `start_ns`; returns now, so stages can be chained."""
+        now = time.perf_counter_ns()
+        self.record_ns(stage, now - start_ns)
+        return now
+
+    def snapshot(self) -> Dict[str, dict]:
+        """{stage: {count, mean_ms, p50_ms, ..., max_ms}}"""
+        out = {}
+        for stage, hist in sorted(self.histograms.items()):
+            if not hist.count:
+                continue
+            stats = {"count": hist.count, "mean_ms": hist.total / hist.count / 1e6}
+            for q in self.QUANTILES:
+                stats[f"p{q * 100:g}_ms"] = hist.percentile(q) / 1e6
+            stats["max_ms"] = hist.max / 1e6
+            out[stage] = stats
+        return out
+
+    def prometheus_text(self) -> str:
+        lines = [
+            "# HELP coco_stage_latency_seconds Hot-path stage latency.",
+            "# TYPE coco_stage_latency_seconds summary",
+        ]
+        for stage, hist in sorted(self.histograms.items()):
+            for q in self.QUANTILES:
+                lines.append(f'coco_stage_latency_seconds{{stage="{stage}",quantile="{q:g}"}} '
+                             f'{hist.percentile(q) / 1e9:.9f}')
+            lines.append(f'coco_stage_latency_seconds_sum{{stage="{stage}"}} {hist.total / 1e9:.9f}')
+            lines.append(f'coco_stage_latency_seconds_count{{stage="{stage}"}} {hist.count}')
+        return "\n".join(lines) + "\n"
+
+    async def _handle_http(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await reader.readline()
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass  # Skip headers
+            path = request_line.split(b" ")[1] if request_line.count(b" ") >= 2 else b"/"
+            if path.startswith(b"/metrics"):
+                body, status = self.prometheus_text().encode(), b"200 OK"
+            else:
+                body, status = b"not found\n", b"404 Not Found"
+            writer.write(b"HTTP/1.1 " + status + b"\r\nContent-Type: text/plain; version=0.0.4\r\n"
+                         b"Content-Length: " + str(len(body)).encode() + b"\r\nConnection: close\r\n\r\n" + body)
+            await writer.drain()
+        except Exception as e:
+            logger.debug(f"Metrics request failed: {e}")
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 9108):
+        """Prometheus text endpoint at http://host:port/metrics, until cancelled."""
+        server = await asyncio.start_server(self._handle_http, host, port)
+        logger.info(f"Serving latency metrics on http://{host}:{port}/metrics")
+        async with server:
+            await server.serve_forever()
+
+    async def log_loop(self, interval: float = 60.0):
+        while True:
+            await asyncio.sleep(interval)
+            for stage, stats in self.snapshot().items():
+                logger.info(f"{stage:<18} n={stats['count']:<8} p50={stats['p50_ms']:.3f}ms "
+                            f"p99={stats['p99_ms']:.3f}ms max={stats['max_ms']:.3f}ms")
+
+class NullRecorder:
+    """Drop-in recorder for when metrics are off: every call is a no-op."""
+    enabled = False
+
+    @staticmethod
+    def clock() -> int:
+        return 0
+
+    def record_ns(self, stage: str, elapsed_ns: int):
+        pass
+
+    def since(self, stage: str, start_ns: int) -> int:
+        return 0
+
+NULL_RECORDER = NullRecorder()
+
+def make_recorder(settings: dict):
+    """LatencyRecorder when `metrics.enabled` is set, else the shared no-op recorder."""
+    if settings.get('metrics', {}).get('enabled', False):
+        return LatencyRecorder()
+    return NULL_RECORDER
+
+class StartupProfile:
+    """
+    Wall time of each startup stage (stages may overlap across threads),
+    reported once `finish()` marks the first trading decision.
+    """
+    def __init__(self, start: Optional[float] = None, enabled: bool = False):
+        self.start = start if start is not None else time.perf_counter()
+        self.enabled = enabled
+        self.stages: List[tuple] = []  # (name, offset_s, duration_s)
+        self.finished = False
+
+    def add(self, name: str, offset: float, duration: float):
+        self.stages.append((name, offset, duration))
+
+    @contextmanager
+    def stage(self, name: str):
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, t - self.start, time.perf_counter() - t)
+
+    def finish(self, name: str):
+        self.add(name, time.perf_counter() - self.start, 0.0)
+        self.finished = True
+        if self.enabled:
+            logger.info("Startup profile:\n" + self.report())
+
+    def report(self) -> str:
+        lines = [f"{'stage':<24} {'at_ms':>9} {'took_ms':>9}"]
+        for name, offset, duration in sorted(self.stages, key=lambda s: s[1]):
+            lines.append(f"{name:<24} {offset * 1000:>9.1f} {duration * 1000:>9.1f}")
+        return "\n".join(lines)
@@ -0,0 +1,186 @@
+# TARGET_FILE: log_setup.py
+import atexit
+import json
+import logging
+import os
+import queue
+import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional, Tuple
+import yaml
+
+# LogRecord attributes that are not user-supplied `extra` fields
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "suppressed"}
+
+class EnqueueOnlyHandler(QueueHandler):
+    """
+    QueueHandler whose hot-path cost is one queue put: formatting, filtering
+    and I/O all happen on the listener thread.
+    """
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, msg, `extra` fields, exc."""
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS:
+                entry[key] = value
+        if getattr(record, "suppressed", 0):
+            entry["suppressed"] = record.suppressed
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class ConsoleFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        if getattr(record, "suppressed", 0):
+            line += f" ({record.suppressed} similar suppressed)"
+        return line
+
+class RateLimitFilter(logging.Filter):
+    """
+    Token bucket per call site (logger, file, line), so one noisy message type
+    (e.g. a malformed-frame storm) is sampled down without hiding others.
+    The next record let through carries how many were dropped.
+    """
+    def __init__(self, rate_per_second: float = 5.0, burst: int = 20):
+        super().__init__()
+        self.rate = rate_per_second
+        self.burst = burst
+        self.buckets: Dict[Tuple[str, str, int], list] = {}  # key -> [tokens, last_time, suppressed]
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.CRITICAL:
+            return True
+        key = (record.name, record.pathname, record.lineno)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = [float(self.burst), record.created, 0]
+        tokens = min(self.burst, bucket[0] + (record.created - bucket[1]) * self.rate)
+        bucket[1] = record.created
+        if tokens < 1.0:
+            bucket[0] = tokens
+            bucket[2] += 1
+            return False
+        bucket[0] = tokens - 1.0
+        record.suppressed, bucket[2] = bucket[2], 0
+        return True
+
+class BatchedFileHandler(logging.Handler):
+    """Buffers formatted lines and writes them in one call per batch or flush interval."""
+    def __init__(self, path: str, batch_size: int = 256, flush_interval: float = 1.0):
+        super().__init__()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.stream = open(path, 'a', encoding='utf-8')
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.buffer = []
+        self.last_flush = time.monotonic()
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            self.buffer.append(self.format(record))
+        except Exception:
+            self.handleError(record)
+            return
+        if len(self.buffer) >= self.batch_size or time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.stream.write("\n".join(self.buffer) + "\n")
+            self.stream.flush()
+            self.buffer = []
+        self.last_flush = time.monotonic()
+
+    def close(self):
+        self.flush()
+        self.stream.close()
+        super().close()
+
+class FlushingQueueListener(QueueListener):
+    """
+    Applies the rate limit once per record, then fans out to the handlers;
+    flushes batching handlers whenever the queue goes idle for `flush_interval`.
+    """
+    def __init__(self, log_queue, *handlers, rate_limit: Optional[RateLimitFilter] = None,
+                 flush_interval: float = 1.0):
+        super().__init__(log_queue, *handlers, respect_handler_level=True)
+        self.rate_limit = rate_limit
+        self.flush_interval = flush_interval
+
+    def handle(self, record: logging.LogRecord):
+        if self.rate_limit is None or self.rate_limit.filter(record):
+            super().handle(record)
+
+    def dequeue(self, block: bool):
+        if not block:
+            return self.queue.get_nowait()
+        while True:
+            try:
+                return self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                for handler in self.handlers:
+                    handler.flush()
+
+_listener: Optional[QueueListener] = None
+
+def setup_logging(config_path: Optional[str] = "settings.yaml", log_file: Optional[str] = None,
+                  level: Optional[str] = None) -> QueueListener:
+    """
+    Route all logging through one queue to a background listener that writes
+    rate-limited records to the console and as JSON lines to a batched file.
+    Settings come from the `logging` section of `config_path` (if present);
+    `log_file` / `level` override them.
+    """
+    global _listener
+    cfg = {}
+    if config_path and os.path.exists(config_path):
+        with open(config_path) as f:
+            cfg = (yaml.safe_load(f) or {}).get('logging', {}) or {}
+    level = getattr(logging, (level or cfg.get('level', 'INFO')).upper())
+    log_file = log_file or cfg.get('file', 'logs/engine.jsonl')
+    flush_interval = cfg.get('flush_interval_seconds', 1.0)
+
+    rate_limit = RateLimitFilter(cfg.get('rate_per_second', 5.0), cfg.get('burst', 20))
+    console = logging.StreamHandler(sys.stderr)
+    console.setFormatter(ConsoleFormatter())
+    file_handler = BatchedFileHandler(log_file, cfg.get('batch_size', 256), flush_interval)
+    file_handler.setFormatter(JsonFormatter())
+
+    if _listener is not None:
+        _listener.stop()
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(EnqueueOnlyHandler(log_queue))
+    root.setLevel(level)
+
+    _listener = FlushingQueueListener(log_queue, console, file_handler, rate_limit=rate_limit,
+                                      flush_interval=flush_interval)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    return _listener
+
+def shutdown_logging():
+    """Drain the queue and close the file; safe to call more than once."""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
@@ -0,0 +1,103 @@
+# TARGET_FILE: loop_monitor.py
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from typing import Coroutine, Optional
+
+from latency_metrics import NULL_RECORDER
+
+logger = logging.getLogger("LoopMonitor")
+
+def loop_factory(settings: dict):
+    """uvloop's loop when `event_loop.uvloop` is set and it is installed, else asyncio's default."""
+    if not settings.get('event_loop', {}).get('uvloop', False):
+        return None
+    try:
+        import uvloop
+    except ImportError:
+        logger.warning("event_loop.uvloop is set but uvloop is not installed, using the asyncio loop")
+        return None
+    return uvloop.new_event_loop
+
+class LoopLagMonitor:
+    def __init__(self, metrics=NULL_RECORDER, interval: float = 0.05, threshold: float = 0.1):
+        """
+        Scheduling delay of the event loop: a task sleeps `interval` and records
+        how late it wakes as the `loop_lag` stage. A watchdog thread notices when
+        the loop has not come back for `threshold` and logs the loop thread's
+        stack at that moment, i.e. the callback that is blocking it.
+        """
+        self.metrics = metrics
+        self.interval = interval
+        self.threshold = threshold
+        self.last_tick = time.monotonic()
+        self.max_lag = 0.0
+        self.stalls = 0
+        self.loop_thread_id: Optional[int] = None
+        self.stopped = threading.Event()
+
+    async def run(self):
+        self.loop_thread_id = threading.get_ident()
+        watchdog = threading.Thread(target=self._watchdog, name="loop-watchdog", daemon=True)
+        watchdog.start()
+        try:
+            while True:
+                start = time.monotonic()
+                self.last_tick = start
+                await asyncio.sleep(self.interval)
+                lag = time.monotonic() - start - self.interval
+                self.last_tick = time.monotonic()
+                self.metrics.record_ns('loop_lag', int(lag * 1e9))
+                if lag > self.max_lag:
+                    self.max_lag = lag
+                if lag > self.threshold:
+                    logger.warning(f"Event loop lagged {lag * 1000:.1f} ms")
+        finally:
+            self.stopped.set()
+
+    def _watchdog(self):
+        reported = 0.0  # last_tick of the stall already logged
+        while not self.stopped.wait(self.threshold / 2):
+            tick = self.last_tick
+            if time.monotonic() - tick - self.interval < self.threshold or tick == reported:
+                continue
+            frame = sys._current_frames().get(self.loop_thread_id)
+            stack = traceback.extract_stack(frame) if frame is not None else []
+            if stack and (stack[-1].filename.endswith("selectors.py") or stack[-1].name == "select"):
+                # Waiting in select(): the loop is idle and the process itself was not scheduled
+                # (suspend, CPU starvation), nothing on the loop is blocking it
+                continue
+            reported = tick
+            self.stalls += 1
+            if stack:
+                # Drop the event loop's own frames: start at the callback it is running
+                starts = [i for i, f in enumerate(stack)
+                          if f.filename.endswith(("asyncio/events.py", "asyncio\\events.py"))]
+                stack = stack[starts[-1] + 1:] if starts else stack
+                logger.warning(f"Event loop blocked > {self.threshold * 1000:.0f} ms in:\n"
+                               + "".join(traceback.format_list(stack)))
+
+def run_event_loop(main: Coroutine, settings: dict, metrics=NULL_RECORDER):
+    """
+    asyncio.run() on the configured loop, with a LoopLagMonitor alongside
+    `main` unless `event_loop.lag_monitor` is off.
+    """
+    cfg = settings.get('event_loop', {})
+
+    async def monitored():
+        monitor_task = None
+        if cfg.get('lag_monitor', True):
+            monitor = LoopLagMonitor(metrics, cfg.get('lag_interval_ms', 50) / 1000,
+                                     cfg.get('lag_threshold_ms', 100) / 1000)
+            monitor_task = asyncio.create_task(monitor.run())
+        try:
+            return await main
+        finally:
+            if monitor_task:
+                monitor_task.cancel()
+
+    with asyncio.Runner(loop_factory=loop_factory(settings)) as runner:
+        return runner.run(monitored())
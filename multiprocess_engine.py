@@ -0,0 +1,361 @@
+# TARGET_FILE: multiprocess_engine.py
+"""
+Multi-core layout on one box:
+
+    hub process        owns the market websockets, appends klines to shared-memory rings
+    worker processes   ScalpingEngine per shard of symbols, reading the rings without copying
+    executor process   the only process that talks to the exchange; workers send it orders,
+                       and reserve every entry against account-wide position/exposure limits
+
+    python multiprocess_engine.py --workers 4
+    python multiprocess_engine.py --workers 2 --paper --stream-url ws://127.0.0.1:8765   # local stand-ins
+"""
+import argparse
+import asyncio
+import copy
+import functools
+import logging
+import multiprocessing as mp
+import queue
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import yaml
+from data.binance_ws import BinanceKlineStream
+from data.shm_ring import KlineRing, RingKlineStore
+from log_setup import setup_logging
+from loop_monitor import run_event_loop
+
+logger = logging.getLogger("MultiProcessEngine")
+
+class PaperExecutor:
+    """Local stand-in for TestnetOrderExecutor: market orders fill at the hub's last close."""
+    def __init__(self, ring: KlineRing):
+        self.ring = ring
+        self.client = None
+        self.account = None
+        self.next_order_id = 0
+
+    def place_market_order(self, symbol: str, side: str, quantity: float) -> dict:
+        cols = self.ring.get_columns(symbol, 1)
+        if cols is None:
+            return None
+        price = float(cols['c'][-1])
+        self.next_order_id += 1
+        return {"orderId": self.next_order_id, "status": "FILLED", "executedQty": str(quantity),
+                "cummulativeQuoteQty": str(price * quantity), "avgPrice": price}
+
+    def get_account_balance(self, asset: str = "USDT") -> float:
+        return 1000.0
+
+    def cancel_all_orders(self, symbol: str):
+        pass
+
+    def place_bracket_order(self, *args, **kwargs):
+        return None  # Engine falls back to client-side stop/target
+
+    def track_bracket(self, *args, **kwargs):
+        pass
+
+    def reconcile_bracket(self, symbol: str):
+        return None
+
+    def cancel_bracket(self, symbol: str) -> bool:
+        return True
+
+    def match_bracket_fill(self, order: dict):
+        return None
+
+class SharedRiskGate:
+    """
+    Account-wide pre-trade limits, held by the executor process. Each worker's
+    risk manager only sees its own shard, so entries are also reserved here:
+    at most max_active_positions open across all workers, and total notional
+    under max_total_exposure_pct of the account equity. Workers report their
+    open exposure every heartbeat; a reservation stands in for a position
+    until it shows up in a report (or expires).
+    """
+    def __init__(self, settings: dict, equity: float, reservation_ttl: float = 30.0):
+        self.max_active_positions = settings['trading']['max_active_positions']
+        self.max_total_exposure_usdt = equity * settings['risk'].get('max_total_exposure_pct', 100.0) / 100
+        self.reservation_ttl = reservation_ttl
+        self.reports: dict = {}       # worker_id -> {symbol: usdt}
+        self.reservations: dict = {}  # symbol -> (worker_id, usdt, expires)
+
+    def open_exposure(self) -> dict:
+        now = time.monotonic()
+        self.reservations = {s: r for s, r in self.reservations.items() if r[2] > now}
+        exposure = {s: r[1] for s, r in self.reservations.items()}
+        for report in self.reports.values():
+            exposure.update(report)
+        return exposure
+
+    def reserve(self, worker_id: int, symbol: str, notional: float):
+        """(ok, reason) for opening `notional` USDT on `symbol`."""
+        symbol = symbol.upper()
+        exposure = self.open_exposure()
+        if symbol in exposure:
+            return False, "position_open"
+        if len(exposure) >= self.max_active_positions:
+            return False, "max_active_positions"
+        if sum(exposure.values()) + notional > self.max_total_exposure_usdt:
+            return False, "total_exposure"
+        self.reservations[symbol] = (worker_id, notional, time.monotonic() + self.reservation_ttl)
+        return True, None
+
+    def release(self, worker_id: int, symbol: str):
+        if self.reservations.get(symbol.upper(), (None,))[0] == worker_id:
+            del self.reservations[symbol.upper()]
+
+    def report(self, worker_id: int, exposure: dict, equity: float = None):
+        self.reports[worker_id] = {s.upper(): v for s, v in exposure.items() if v > 0}
+        for symbol in self.reports[worker_id]:
+            self.release(worker_id, symbol)  # Reported now, so stop counting the reservation as well
+
+# Executor-process calls that change exchange state: a worker must learn their outcome,
+# so they are never given up on (a timed-out market order may still have filled)
+ORDER_METHODS = {'place_market_order', 'place_bracket_order', 'cancel_bracket', 'cancel_all_orders'}
+# Served by the SharedRiskGate instead of the executor, with the calling worker's id
+GATE_METHODS = {'reserve_position': 'reserve', 'release_position': 'release', 'report_exposure': 'report'}
+
+class ExecutorProxy:
+    """
+    Worker-side stand-in for the order executor: every method call is sent to
+    the executor process and blocks for its reply, so the engine calls it
+    through asyncio.to_thread. Queries give up after `timeout` and return
+    None; order calls wait for their reply however long it takes.
+    """
+    def __init__(self, worker_id: int, requests, responses, timeout: float = 30.0):
+        self.worker_id = worker_id
+        self.requests = requests
+        self.responses = responses
+        self.timeout = timeout
+        self.client = None  # No user data stream in workers
+        self.next_request_id = 0
+        self.lock = threading.Lock()  # Engine calls come from the loop and from to_thread
+
+    def attach_account(self, account):
+        pass
+
+    def _call(self, method: str, *args, **kwargs):
+        with self.lock:
+            self.next_request_id += 1
+            request_id = self.next_request_id
+            self.requests.put((self.worker_id, request_id, method, args, kwargs))
+            started = time.monotonic()
+            deadline = started + self.timeout
+            while True:
+                try:
+                    reply_id, result = self.responses.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    if method not in ORDER_METHODS:
+                        logger.error(f"Executor did not answer {method} within {self.timeout}s")
+                        return None
+                    logger.warning(f"Still waiting for the executor's {method} reply "
+                                   f"({time.monotonic() - started:.0f}s)")
+                    deadline = time.monotonic() + self.timeout
+                    continue
+                if reply_id == request_id:
+                    return result
+
+    def __getattr__(self, method: str):
+        if method.startswith('_'):
+            raise AttributeError(method)
+        return functools.partial(self._call, method)
+
+class SharedRiskClient:
+    """
+    The engine's coordinator interface (reserve/release/start/stop) backed by
+    the executor's SharedRiskGate; `start()` reports the worker's exposure
+    every `heartbeat_interval` seconds.
+    """
+    def __init__(self, proxy: ExecutorProxy, report, heartbeat_interval: float = 1.0):
+        self.proxy = proxy
+        self.report = report
+        self.heartbeat_interval = heartbeat_interval
+        self.running = False
+
+    async def start(self):
+        self.running = True
+        while self.running:
+            await asyncio.to_thread(self.proxy.report_exposure, **self.report())
+            await asyncio.sleep(self.heartbeat_interval)
+
+    async def reserve(self, symbol: str, notional: float):
+        """(ok, reason); fails closed when the executor does not answer."""
+        result = await asyncio.to_thread(self.proxy.reserve_position, symbol, notional)
+        return tuple(result) if result else (False, "executor_timeout")
+
+    async def release(self, symbol: str):
+        await asyncio.to_thread(self.proxy.release_position, symbol)
+
+    def stop(self):
+        self.running = False
+
+def hub_main(ring_name: str, symbols: list, capacity: int, stream_url: str, stop_event, config_path: str):
+    setup_logging(config_path, log_file="logs/hub.jsonl")
+    ring = KlineRing.attach(ring_name, symbols, capacity)
+    stream = BinanceKlineStream(symbols, interval='1s', maxlen=1, ws_url=stream_url)
+    stream.add_kline_listener(ring.write)
+
+    async def run():
+        task = asyncio.create_task(stream.start())
+        while not stop_event.is_set():
+            await asyncio.sleep(0.2)
+        stream.stop()
+        task.cancel()
+
+    with open(config_path) as f:
+        settings = yaml.safe_load(f)
+    try:
+        run_event_loop(run(), settings)
+    finally:
+        ring.close()
+
+def executor_main(ring_name: str, symbols: list, capacity: int, requests, responses: list,
+                  stop_event, config_path: str, paper: bool):
+    setup_logging(config_path, log_file="logs/executor.jsonl")
+    ring = KlineRing.attach(ring_name, symbols, capacity)
+    if paper:
+        executor = PaperExecutor(ring)
+    else:
+        from order_executor import TestnetOrderExecutor
+        executor = TestnetOrderExecutor(config_path)
+    with open(config_path) as f:
+        settings = yaml.safe_load(f)
+    gate = SharedRiskGate(settings, settings['risk'].get('initial_equity_usdt') or executor.get_account_balance())
+    logger.info(f"Executor ready ({'paper' if paper else 'testnet'}), "
+                f"max {gate.max_active_positions} positions / {gate.max_total_exposure_usdt:.2f} USDT across workers")
+    try:
+        while not stop_event.is_set():
+            try:
+                worker_id, request_id, method, args, kwargs = requests.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            try:
+                if method in GATE_METHODS:
+                    result = getattr(gate, GATE_METHODS[method])(worker_id, *args, **kwargs)
+                else:
+                    result = getattr(executor, method)(*args, **kwargs)
+            except Exception as e:
+                logger.error(f"Executor {method} failed: {e}")
+                result = None
+            responses[worker_id].put((request_id, result))
+    finally:
+        ring.close()
+
+def worker_main(worker_id: int, shard: list, ring_name: str, symbols: list, capacity: int,
+                requests, responses, stop_event, config_path: str):
+    setup_logging(config_path, log_file=f"logs/worker{worker_id}.jsonl")
+    from trading_engine import ScalpingEngine
+
+    class ShardEngine(ScalpingEngine):
+        def read_klines(self, symbol: str):
+            # Column views straight out of shared memory
+            cols = self.ws_client.get_columns(symbol, self.feature_pipeline.window)
+            if cols is None:
+                return None, None
+            return cols, float(cols['c'][-1])
+
+    with open(config_path) as f:
+        settings = yaml.safe_load(f)
+    settings = copy.deepcopy(settings)
+    settings['trading']['symbols'] = shard
+    settings['trading']['trade_symbols'] = shard
+    settings['trading']['state_file'] = f"shared_state_w{worker_id}.json"
+    settings['trading']['exit_price_stream'] = 'kline'  # Ring updates drive per-tick exits
+    settings['trading']['bar'] = '1s'
+    settings['binance']['user_stream'] = False
+    settings['coordinator'] = {**settings.get('coordinator', {}), 'enabled': False}  # Shards are assigned locally
+
+    ring = KlineRing.attach(ring_name, symbols, capacity)
+    proxy = ExecutorProxy(worker_id, requests, responses)
+    engine = ShardEngine(config_path, settings=settings, ws_client=RingKlineStore(ring, shard),
+                         order_executor=proxy)
+    # Every entry is also reserved against the account-wide limits in the executor process
+    engine.coordinator = SharedRiskClient(proxy, engine.exposure_report)
+
+    async def run():
+        task = asyncio.create_task(engine.run())
+        while not stop_event.is_set() and not task.done():
+            await asyncio.sleep(0.2)
+        engine.shutdown()
+        await task
+
+    try:
+        run_event_loop(run(), settings, engine.metrics)
+    finally:
+        ring.close()
+
+def shard_symbols(symbols: list, n_workers: int) -> list:
+    """Round-robin shards; never more workers than symbols."""
+    n_workers = max(1, min(n_workers, len(symbols)))
+    return [symbols[i::n_workers] for i in range(n_workers)]
+
+def main(config_path: str, n_workers: int, paper: bool, stream_url: str = None, duration: float = None):
+    with open(config_path) as f:
+        settings = yaml.safe_load(f)
+    symbols = settings['trading']['symbols']
+    mp_cfg = settings.get('multiprocess', {})
+    capacity = mp_cfg.get('ring_capacity', 600)
+    stream_url = stream_url or settings['binance'].get('stream_url', "wss://stream.binance.com:9443")
+    shards = shard_symbols(symbols, n_workers or mp_cfg.get('workers', 2))
+
+    ctx = mp.get_context('spawn')
+    ring = KlineRing.create(symbols, capacity)
+    stop_event = ctx.Event()
+    executor_stop = ctx.Event()  # Set once the workers are gone, so their last calls are answered
+    requests = ctx.Queue()
+    responses = [ctx.Queue() for _ in shards]
+    procs = [
+        ctx.Process(target=hub_main, name="hub",
+                    args=(ring.name, symbols, capacity, stream_url, stop_event, config_path)),
+        ctx.Process(target=executor_main, name="executor",
+                    args=(ring.name, symbols, capacity, requests, responses, executor_stop, config_path, paper)),
+    ] + [
+        ctx.Process(target=worker_main, name=f"worker{i}",
+                    args=(i, shard, ring.name, symbols, capacity, requests, responses[i], stop_event, config_path))
+        for i, shard in enumerate(shards)
+    ]
+    for proc in procs:
+        proc.start()
+    logger.info(f"Started hub, executor and {len(shards)} workers: {shards}")
+
+    started = time.monotonic()
+    try:
+        while all(p.is_alive() for p in procs):
+            if duration is not None and time.monotonic() - started > duration:
+                break
+            time.sleep(0.5)
+        dead = [p.name for p in procs if not p.is_alive()]
+        if dead:
+            logger.error(f"Process exited early: {dead}, shutting down")
+    except KeyboardInterrupt:
+        logger.info("Received Ctrl+C. Shutting down gracefully...")
+    finally:
+        stop_event.set()
+        for proc in procs[2:] + procs[:2]:
+            if proc.name == "executor":
+                executor_stop.set()
+            proc.join(timeout=10)
+            if proc.is_alive():
+                proc.terminate()
+        counts = {s: ring.count(s) for s in symbols}
+        ring.close()
+        logger.info(f"All processes stopped; klines written per symbol: {counts}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the engine as hub + strategy workers + executor processes.")
+    parser.add_argument("--config", default="settings.yaml")
+    parser.add_argument("--workers", type=int, default=None, help="Strategy worker processes (default: settings)")
+    parser.add_argument("--paper", action="store_true", help="Fill orders locally at the last close")
+    parser.add_argument("--stream-url", default=None, help="e.g. ws://127.0.0.1:8765 for data/synthetic_market.py")
+    parser.add_argument("--duration", type=float, default=None, help="Stop after N seconds")
+    args = parser.parse_args()
+
+    setup_logging(args.config, log_file="logs/multiprocess.jsonl")
+    main(args.config, args.workers, args.paper, args.stream_url, args.duration)
@@ -4,45 +4,58 @@ from binance import Client
 from binance.exceptions import BinanceAPIException
 import yaml
 import os
+from exchange_filters import ExchangeFilterCache, SymbolFilters
 
 logger = logging.getLogger("OrderExecutor")
 
-def format_quantity(qty: float, symbol: str) -> str:
+def format_quantity(qty: float, symbol: str, filters: ExchangeFilterCache = None) -> str:
     """
     Format quantity as decimal string without scientific notation.
     Respect Binance step sizes.
     """
-    if 'BTC' in symbol:
-        # BTCUSDT: 5 decimal places
-        return f"{qty:.5f}"
-    elif 'ETH' in symbol:
-        # ETHUSDT: 4 decimal places
-        return f"{qty:.4f}"
-    else:
-        return f"{qty:.5f}"
+    flt = filters.get(symbol) if filters else SymbolFilters.fallback(symbol)
+    return flt.format_qty(qty)
+
+def format_price(price: float, symbol: str, filters: ExchangeFilterCache = None) -> str:
+    """Format price for limit/stop legs, rounded to the symbol's tick size."""
+    flt = filters.get(symbol) if filters else SymbolFilters.fallback(symbol)
+    return flt.format_price(price)
 
 class TestnetOrderExecutor:
-    def __init__(self, config_path: str = "settings.yaml"):
+    def __init__(self, config_path: str = "settings.yaml", filters: ExchangeFilterCache = None):
         with open(config_path) as f:
             config = yaml.safe_load(f)
+        self.filters = filters or ExchangeFilterCache(config['binance']['base_url']).load()
         
         api_key = config['binance']['api_key']
         api_secret = config['binance']['api_secret']
         
         self.client = Client(api_key, api_secret, testnet=True)
         self.client.API_URL = 'https://testnet.binance.vision/api'
+        # symbol -> {"order_list_id", "legs": {orderId: reason}, "quantity"}
+        self.brackets = {}
+        self.account = None  # AccountModel fed by the user data stream, if attached
         logger.info("Initialized Binance Testnet client")
 
+    def attach_account(self, account):
+        """Serve balances from a stream-fed AccountModel instead of REST polling."""
+        self.account = account
+
     def place_market_order(self, symbol: str, side: str, quantity: float) -> dict:
         try:
-            qty_str = format_quantity(quantity, symbol)
+            qty_str = format_quantity(quantity, symbol, self.filters)
             logger.info(f"Placing {side} market order: {qty_str} {symbol}")
             order = self.client.create_order(
                 symbol=symbol,
                 side=side.upper(),
                 type='MARKET',
-                quantity=qty_str
+                quantity=qty_str,
+                newOrderRespType='FULL'
             )
+            executed = float(order.get('executedQty', 0))
+            if 'avgPrice' not in order and executed > 0:
+                # Spot responses have no avgPrice; derive it from the actual fills
+                order['avgPrice'] = float(order['cummulativeQuoteQty']) / executed
             logger.info(f"Order filled: {order['orderId']} @ avgPrice={order.get('avgPrice', 'N/A')}")
             return order
         except BinanceAPIException as e:
@@ -53,8 +66,12 @@ class TestnetOrderExecutor:
             return None
 
     def get_account_balance(self, asset: str = "USDT") -> float:
+        if self.account is not None and self.account.seeded:
+            return self.account.free(asset)
         try:
             info = self.client.get_account()
+            if self.account is not None:
+                self.account.seed(info)  # One REST snapshot; the stream keeps it current
             for bal in info['balances']:
                 if bal['asset'] == asset:
                     return float(bal['free'])
@@ -69,4 +86,122 @@ class TestnetOrderExecutor:
                 self.client.cancel_order(symbol=symbol, orderId=order['orderId'])
                 logger.info(f"Cancelled order {order['orderId']}")
         except Exception as e:
-            logger.error(f"Failed to cancel orders: {e}")
\ No newline at end of file
+            logger.error(f"Failed to cancel orders: {e}")
+
+    def place_bracket_order(self, symbol: str, position_side: str, quantity: float,
+                            take_profit: float, stop_price: float, stop_slippage_pct: float = 0.05) -> dict:
+        """
+        Protect an open position with an exchange-side OCO: a LIMIT_MAKER at the
+        target and a STOP_LOSS_LIMIT at the stop. `position_side` is the entry
+        side ('buy'/'sell'); the OCO closes it. Returns the order list or None.
+        """
+        try:
+            flt = self.filters.get(symbol)
+            qty_str = flt.format_qty(quantity)
+            slip = stop_slippage_pct / 100.0
+            if position_side == 'buy':
+                # Closing a long: target above, stop below
+                params = dict(
+                    side='SELL',
+                    aboveType='LIMIT_MAKER', abovePrice=flt.format_price(take_profit),
+                    belowType='STOP_LOSS_LIMIT', belowStopPrice=flt.format_price(stop_price),
+                    belowPrice=flt.format_price(stop_price * (1 - slip)), belowTimeInForce='GTC'
+                )
+            else:
+                # Closing a short: stop above, target below
+                params = dict(
+                    side='BUY',
+                    aboveType='STOP_LOSS_LIMIT', aboveStopPrice=flt.format_price(stop_price),
+                    abovePrice=flt.format_price(stop_price * (1 + slip)), aboveTimeInForce='GTC',
+                    belowType='LIMIT_MAKER', belowPrice=flt.format_price(take_profit)
+                )
+            logger.info(f"Placing {params['side']} OCO bracket: {qty_str} {symbol} "
+                        f"tp={take_profit:.2f} stop={stop_price:.2f}")
+            order_list = self.client.create_oco_order(symbol=symbol, quantity=qty_str, **params)
+            legs = {
+                report['orderId']: 'take_profit' if report['type'] == 'LIMIT_MAKER' else 'stop_loss'
+                for report in order_list['orderReports']
+            }
+            self.brackets[symbol] = {
+                "order_list_id": order_list['orderListId'],
+                "legs": legs,
+                "quantity": quantity
+            }
+            return order_list
+        except BinanceAPIException as e:
+            logger.error(f"Binance API error placing bracket: {e.message} (code {e.code})")
+            return None
+        except Exception as e:
+            logger.error(f"Bracket order error: {e}")
+            return None
+
+    def track_bracket(self, symbol: str, order_list_id: int, quantity: float) -> bool:
+        """Re-attach to a bracket placed by a previous run (legs are looked up on the exchange)."""
+        try:
+            order_list = self.client.v3_get_order_list(orderListId=order_list_id)
+            legs = {}
+            for leg in order_list['orders']:
+                order = self.client.get_order(symbol=symbol, orderId=leg['orderId'])
+                legs[leg['orderId']] = 'take_profit' if order['type'] == 'LIMIT_MAKER' else 'stop_loss'
+            self.brackets[symbol] = {"order_list_id": order_list_id, "legs": legs, "quantity": quantity}
+            return True
+        except Exception as e:
+            logger.error(f"Failed to load bracket {order_list_id}: {e}")
+            return False
+
+    def reconcile_bracket(self, symbol: str) -> dict:
+        """
+        Check whether a leg of `symbol`'s bracket has filled. Returns
+        {"reason", "avg_price", "order_id"} for a filled leg (and forgets the
+        bracket), or None while it is still working.
+        """
+        bracket = self.brackets.get(symbol)
+        if not bracket:
+            return None
+        try:
+            for order_id, reason in bracket["legs"].items():
+                order = self.client.get_order(symbol=symbol, orderId=order_id)
+                executed = float(order['executedQty'])
+                if order['status'] == 'FILLED' and executed > 0:
+                    self.brackets.pop(symbol, None)
+                    return {
+                        "reason": reason,
+                        "avg_price": float(order['cummulativeQuoteQty']) / executed,
+                        "order_id": order_id
+                    }
+        except Exception as e:
+            logger.error(f"Failed to reconcile bracket for {symbol}: {e}")
+        return None
+
+    def match_bracket_fill(self, order: dict) -> dict:
+        """
+        Same result as reconcile_bracket, but from a user-data-stream order
+        update (AccountModel order dict) instead of REST queries.
+        """
+        bracket = self.brackets.get(order["symbol"])
+        if not bracket or order["order_id"] not in bracket["legs"]:
+            return None
+        if order["status"] != 'FILLED' or not order["executed_qty"]:
+            return None
+        self.brackets.pop(order["symbol"], None)
+        return {
+            "reason": bracket["legs"][order["order_id"]],
+            "avg_price": order["avg_price"],
+            "order_id": order["order_id"]
+        }
+
+    def cancel_bracket(self, symbol: str) -> bool:
+        """Cancel `symbol`'s bracket. False if it is gone (e.g. a leg already filled)."""
+        bracket = self.brackets.get(symbol)
+        if not bracket:
+            return False
+        try:
+            self.client.v3_delete_order_list(symbol=symbol, orderListId=bracket["order_list_id"])
+            self.brackets.pop(symbol, None)
+            logger.info(f"Cancelled bracket {bracket['order_list_id']} for {symbol}")
+            return True
+        except BinanceAPIException as e:
+            logger.error(f"Binance API error cancelling bracket: {e.message} (code {e.code})")
+        except Exception as e:
+            logger.error(f"Failed to cancel bracket: {e}")
+        return False
@@ -1,8 +1,10 @@
 ﻿import pandas as pd
-import numpy as np
 import os
+from data.labeling import label_threshold
+from strategies.scalping_features import load_feature_pipeline
 
-def relabel_scalping_data(input_path: str, output_path: str, look_ahead_seconds: int = 3, threshold_pct: float = 0.08):
+def relabel_scalping_data(input_path: str, output_path: str, look_ahead_seconds: int = 3, threshold_pct: float = 0.08,
+                          config_path: str = "settings.yaml"):
     """
     Add labels to raw feature dataset based on future price movement.
     """
@@ -14,20 +16,8 @@ def relabel_scalping_data(input_path: str, output_path: str, look_ahead_seconds:
         return
 
     df = df.sort_values('timestamp').reset_index(drop=True)
-    df['label'] = np.nan
-    threshold = threshold_pct / 100.0
-    
-    for i in range(len(df) - look_ahead_seconds):
-        current_price = df.loc[i, 'close']
-        future_price = df.loc[i + look_ahead_seconds, 'close']
-        if current_price <= 0:
-            continue
-        change = (future_price - current_price) / current_price
-        
-        if change >= threshold:
-            df.loc[i, 'label'] = 1
-        elif change <= -threshold:
-            df.loc[i, 'label'] = 0
+    load_feature_pipeline(config_path).ensure_columns(df)
+    df['label'], _ = label_threshold(df['close'].to_numpy(), look_ahead_seconds, threshold_pct)
     
     labeled_df = df.dropna(subset=['label']).copy()
     labeled_df['label'] = labeled_df['label'].astype(int)
@@ -1,9 +1,11 @@
 # TARGET_FILE: relabel_fixed_threshold.py
 import pandas as pd
-import numpy as np
 import os
+from data.labeling import label_threshold
+from strategies.scalping_features import load_feature_pipeline
 
-def relabel_fixed_threshold(input_path: str, output_path: str, look_ahead_seconds: int = 2):
+def relabel_fixed_threshold(input_path: str, output_path: str, look_ahead_seconds: int = 2,
+                            config_path: str = "settings.yaml"):
     print(f"Loading data from {input_path}")
     df = pd.read_csv(input_path)
     
@@ -12,25 +14,8 @@ def relabel_fixed_threshold(input_path: str, output_path: str, look_ahead_second
         return
 
     df = df.sort_values('timestamp').reset_index(drop=True)
-    df['label'] = np.nan
-    
-    labeled_count = 0
-    for i in range(len(df) - look_ahead_seconds):
-        current_price = df.loc[i, 'close']
-        future_price = df.loc[i + look_ahead_seconds, 'close']
-        
-        if current_price <= 0 or future_price <= 0:
-            continue
-            
-        change = (future_price - current_price) / current_price
-        threshold = 0.0002  # Fixed 0.02% threshold
-        
-        if change >= threshold:
-            df.loc[i, 'label'] = 1
-            labeled_count += 1
-        elif change <= -threshold:
-            df.loc[i, 'label'] = 0
-            labeled_count += 1
+    load_feature_pipeline(config_path).ensure_columns(df)
+    df['label'], _ = label_threshold(df['close'].to_numpy(), look_ahead_seconds, threshold_pct=0.02)  # Fixed 0.02%
 
     labeled_df = df.dropna(subset=['label']).copy()
     if len(labeled_df) == 0:
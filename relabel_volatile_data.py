@@ -1,9 +1,11 @@
 # TARGET_FILE: relabel_volatile_data.py
 import pandas as pd
-import numpy as np
 import os
+from data.labeling import label_volatile
+from strategies.scalping_features import load_feature_pipeline
 
-def relabel_volatile_data(input_path: str, output_path: str, look_ahead_seconds: int = 2):
+def relabel_volatile_data(input_path: str, output_path: str, look_ahead_seconds: int = 2,
+                          config_path: str = "settings.yaml"):
     """
     Relabel dataset with volatility-adaptive thresholds.
     Robust to zero prices and edge cases.
@@ -18,41 +20,17 @@ def relabel_volatile_data(input_path: str, output_path: str, look_ahead_seconds:
     df = df.sort_values('timestamp').reset_index(drop=True)
     
     # Remove invalid prices
-    df = df[df['close'] > 0].copy()
+    df = df[df['close'] > 0].reset_index(drop=True)
     if len(df) < look_ahead_seconds + 20:
         print("Not enough valid price data after cleaning.")
         return
         
-    df['label'] = np.nan
+    load_feature_pipeline(config_path).ensure_columns(df)
     
-    # Calculate rolling volatility (std of returns over last 30s)
+    # Adaptive threshold: 1.5x the std of returns over the last 30s, min 0.03%, 0.05% fallback
+    df['label'], _ = label_volatile(df['close'].to_numpy(), look_ahead_seconds)
     df['returns'] = df['close'].pct_change()
     df['volatility_30s'] = df['returns'].rolling(window=30, min_periods=10).std()
-    
-    labeled_count = 0
-    for i in range(len(df) - look_ahead_seconds):
-        current_price = df.loc[i, 'close']
-        future_price = df.loc[i + look_ahead_seconds, 'close']
-        
-        # Skip if prices are invalid
-        if current_price <= 0 or future_price <= 0:
-            continue
-            
-        change = (future_price - current_price) / current_price
-        
-        # Adaptive threshold: 1.5x recent volatility
-        recent_vol = df.loc[i, 'volatility_30s']
-        if pd.isna(recent_vol) or recent_vol == 0:
-            threshold = 0.0005  # fallback
-        else:
-            threshold = max(0.0003, 1.5 * recent_vol)  # min 0.03%
-        
-        if change >= threshold:
-            df.loc[i, 'label'] = 1  # buy
-            labeled_count += 1
-        elif change <= -threshold:
-            df.loc[i, 'label'] = 0  # sell
-            labeled_count += 1
 
     # Drop unlabeled rows
     labeled_df = df.dropna(subset=['label']).copy()
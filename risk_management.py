@@ -1,88 +1,244 @@
 # TARGET_FILE: risk_management.py
 import json
+import logging
 import time
-from typing import Dict, Optional
+from bisect import bisect_left, bisect_right, insort
+from typing import Dict, List, Optional, Tuple
+from exchange_filters import ExchangeFilterCache, SymbolFilters
+
+logger = logging.getLogger("RiskManager")
+
+class ExitTriggerIndex:
+    """
+    Stop/target price levels per symbol, kept sorted so each price update is
+    checked against only the nearest level on each side. Fired triggers are
+    removed, so a level fires at most once.
+    """
+    def __init__(self):
+        self.below: Dict[str, List[Tuple[float, str]]] = {}  # Fire when price <= level
+        self.above: Dict[str, List[Tuple[float, str]]] = {}  # Fire when price >= level
+
+    def add(self, symbol: str, level: float, reason: str, fire_below: bool):
+        book = self.below if fire_below else self.above
+        insort(book.setdefault(symbol.upper(), []), (level, reason))
+
+    def clear(self, symbol: str):
+        self.below.pop(symbol.upper(), None)
+        self.above.pop(symbol.upper(), None)
+
+    def check(self, symbol: str, price: float) -> Optional[str]:
+        """Reason of the first trigger crossed by `price`, or None."""
+        symbol = symbol.upper()
+        below = self.below.get(symbol)
+        if below and price <= below[-1][0]:
+            i = bisect_left(below, (price, ''))
+            fired = below[i:]
+            del below[i:]
+            return fired[-1][1]
+        above = self.above.get(symbol)
+        if above and price >= above[0][0]:
+            i = bisect_right(above, (price, '\uffff'))
+            fired = above[:i]
+            del above[:i]
+            return fired[0][1]
+        return None
+
+def _utc_day(now: float) -> int:
+    return int(now // 86400)
+
+class PortfolioRiskEngine:
+    """
+    Equity, high-water mark, drawdown, day rollover and per-symbol/aggregate
+    notional exposure, all updated incrementally on open/close so every
+    pre-trade check is O(1).
+    """
+    def __init__(self, settings: dict):
+        risk = settings['risk']
+        self.max_drawdown_pct = risk['max_drawdown_pct']
+        self.daily_loss_limit_pct = risk['daily_loss_limit_pct']
+        self.max_symbol_exposure_pct = risk.get('max_symbol_exposure_pct', 100.0)
+        self.max_total_exposure_pct = risk.get('max_total_exposure_pct', 100.0)
+        self.max_active_positions = settings['trading']['max_active_positions']
+        self.exposure: Dict[str, float] = {}
+        self.total_exposure = 0.0
+        # Until seeded from the account balance at startup (or restored from state)
+        self.seed(risk.get('initial_equity_usdt') or 1000.0)
+
+    def seed(self, equity: float):
+        """Start from `equity` USDT: it becomes the initial, high-water and day-start equity."""
+        self.initial_equity = self.equity = self.high_water_mark = self.day_start_equity = equity
+        self.day = _utc_day(time.time())
+
+    def restore(self, state: dict):
+        """Rebuild from the persisted state dict (legacy files assumed a 1000 USDT start)."""
+        self.equity = state["portfolio_value_usdt"]
+        self.initial_equity = state.get("initial_portfolio_value_usdt", 1000.0)
+        self.high_water_mark = max(state.get("equity_high_water_mark", self.equity), self.equity)
+        self.day = state.get("day", _utc_day(time.time()))
+        self.day_start_equity = state.get(
+            "day_start_value_usdt", self.equity / (1 + state.get("daily_pnl_pct", 0.0) / 100)
+        )
+        self.exposure = {}
+        pos = state.get("active_position")
+        if pos:
+            self.exposure[pos["symbol"]] = pos["quantity"] * pos["entry_price"]
+        self.total_exposure = sum(self.exposure.values())
+        self.roll_day()
+
+    def export(self, state: dict):
+        state["portfolio_value_usdt"] = self.equity
+        state["initial_portfolio_value_usdt"] = self.initial_equity
+        state["equity_high_water_mark"] = self.high_water_mark
+        state["day"] = self.day
+        state["day_start_value_usdt"] = self.day_start_equity
+        state["total_pnl_pct"] = (self.equity / self.initial_equity - 1) * 100
+        state["daily_pnl_pct"] = self.daily_pnl_pct()
+        state["drawdown_pct"] = self.drawdown_pct()
+        state["exposure_usdt"] = self.total_exposure
+
+    def roll_day(self, now: Optional[float] = None):
+        day = _utc_day(now if now is not None else time.time())
+        if day != self.day:
+            self.day = day
+            self.day_start_equity = self.equity
+
+    def daily_pnl_pct(self) -> float:
+        return (self.equity / self.day_start_equity - 1) * 100
+
+    def drawdown_pct(self) -> float:
+        return (1 - self.equity / self.high_water_mark) * 100
+
+    def on_open(self, symbol: str, notional: float):
+        self.exposure[symbol] = self.exposure.get(symbol, 0.0) + notional
+        self.total_exposure += notional
+
+    def on_close(self, symbol: str, pnl_usdt: float):
+        self.total_exposure -= self.exposure.pop(symbol, 0.0)
+        self.roll_day()
+        self.equity += pnl_usdt
+        if self.equity > self.high_water_mark:
+            self.high_water_mark = self.equity
+
+    def pre_trade_check(self, symbol: str, notional: float = 0.0) -> Optional[str]:
+        """Reason a new position would breach a limit, or None if it is allowed."""
+        self.roll_day()
+        if symbol in self.exposure:
+            return "position_open"
+        if len(self.exposure) >= self.max_active_positions:
+            return "max_active_positions"
+        if self.daily_pnl_pct() <= -self.daily_loss_limit_pct:
+            return "daily_loss_limit"
+        if self.drawdown_pct() >= self.max_drawdown_pct:
+            return "max_drawdown"
+        if self.exposure.get(symbol, 0.0) + notional > self.equity * self.max_symbol_exposure_pct / 100:
+            return "symbol_exposure"
+        if self.total_exposure + notional > self.equity * self.max_total_exposure_pct / 100:
+            return "total_exposure"
+        return None
 
 class MicroScalpingRiskManager:
-    def __init__(self, settings: dict, state_file: str = "shared_state.json"):
+    def __init__(self, settings: dict, state_file: str = "shared_state.json",
+                 filters: Optional[ExchangeFilterCache] = None):
         self.settings = settings
         self.state_file = state_file
+        self.filters = filters
+        self.exit_triggers = ExitTriggerIndex()
+        self.portfolio = PortfolioRiskEngine(settings)
         self.load_state()
 
     def load_state(self):
         try:
             with open(self.state_file, 'r') as f:
                 self.state = json.load(f)
+            self.seeded = True
         except Exception:
+            self.seeded = False  # Fresh start: seed_equity() sets the starting equity
             self.state = {
-                "portfolio_value_usdt": 1000.0,
+                "portfolio_value_usdt": self.portfolio.equity,
                 "active_position": None,
                 "total_pnl_pct": 0.0,
                 "daily_pnl_pct": 0.0
             }
+        self.portfolio.restore(self.state)
+
+    def seed_equity(self, equity: float):
+        """Starting equity for a fresh state; a state restored from file keeps its own."""
+        if self.seeded:
+            return
+        self.portfolio.seed(equity)
+        self.state["portfolio_value_usdt"] = equity
+        self.seeded = True
+        self.save_state()
 
     def save_state(self):
+        self.portfolio.export(self.state)
         with open(self.state_file, 'w') as f:
             json.dump(self.state, f)
 
-    def can_open_position(self, symbol: str) -> bool:
+    def can_open_position(self, symbol: str, notional: float = 0.0) -> bool:
         if self.state["active_position"] is not None:
-            return False
-        if self.state["daily_pnl_pct"] <= -self.settings['risk']['daily_loss_limit_pct']:
+            return False  # State holds a single position slot
+        reason = self.portfolio.pre_trade_check(symbol, notional)
+        if reason:
+            logger.debug(f"Pre-trade check blocked {symbol}: {reason}")
             return False
         return True
 
-    def calculate_position_size(self, current_price: float) -> float:
+    def register_open(self, position: dict):
+        """Record a filled entry: state, exposure and exit triggers."""
+        self.state["active_position"] = position
+        self.portfolio.on_open(position["symbol"], position["quantity"] * position["entry_price"])
+        self.arm_exit_triggers()
+
+    def calculate_position_size(self, current_price: float, symbol: Optional[str] = None) -> float:
         portfolio = self.state["portfolio_value_usdt"]
         pct = self.settings['trading']['position_size_pct'] / 100.0
         usdt_amount = portfolio * pct
-        qty = usdt_amount / current_price
-
-        symbol = self.settings['trading']['symbols'][0]
-        
-        if 'BTC' in symbol:
-            qty = max(qty, 0.00001)
-            qty = round(qty, 5)
-            if qty * current_price < 10.0:
-                qty = 10.0 / current_price
-                qty = round(qty, 5)
-                qty = max(qty, 0.00001)
-        elif 'ETH' in symbol:
-            qty = max(qty, 0.0001)
-            qty = round(qty, 4)
-            if qty * current_price < 10.0:
-                qty = 10.0 / current_price
-                qty = round(qty, 4)
-                qty = max(qty, 0.0001)
-        else:
-            qty = max(qty, 0.00001)
-            qty = round(qty, 5)
-            if qty * current_price < 10.0:
-                qty = 10.0 / current_price
-                qty = round(qty, 5)
-                qty = max(qty, 0.00001)
-
-        return qty
-
-    def check_exit_conditions(self, current_price: float) -> Optional[str]:
-        pos = self.state["active_position"]
-        if not pos:
-            return None
 
+        symbol = symbol or self.settings['trading']['symbols'][0]
+        flt = self.filters.get(symbol) if self.filters else SymbolFilters.fallback(symbol)
+        # Exact lot-step rounding, bumped up to the exchange's min qty / notional
+        return float(flt.size_for_notional(usdt_amount, current_price))
+
+    def exit_levels(self, pos: dict) -> Tuple[float, float]:
+        """(stop_loss_price, take_profit_price) for a position."""
         entry = pos["entry_price"]
-        side = pos["side"]
         sl_pct = self.settings['trading']['stop_loss_pct'] / 100.0
         tp_pct = self.settings['trading']['take_profit_pct'] / 100.0
+        if pos["side"] == "buy":
+            return entry * (1 - sl_pct), entry * (1 + tp_pct)
+        return entry * (1 + sl_pct), entry * (1 - tp_pct)
 
-        if side == "buy":
-            if current_price <= entry * (1 - sl_pct):
+    def arm_exit_triggers(self):
+        """Index the active position's stop and target for per-tick checks."""
+        pos = self.state["active_position"]
+        if not pos:
+            return
+        self.exit_triggers.clear(pos["symbol"])
+        stop, target = self.exit_levels(pos)
+        is_long = pos["side"] == "buy"
+        self.exit_triggers.add(pos["symbol"], stop, "stop_loss", fire_below=is_long)
+        self.exit_triggers.add(pos["symbol"], target, "take_profit", fire_below=not is_long)
+
+    def check_exit_trigger(self, symbol: str, price: float) -> Optional[str]:
+        """O(1) per-tick stop/target check; safe to call on every price update."""
+        return self.exit_triggers.check(symbol, price)
+
+    def check_exit_conditions(self, current_price: float, symbol: Optional[str] = None) -> Optional[str]:
+        pos = self.state["active_position"]
+        if not pos or (symbol is not None and pos["symbol"] != symbol):
+            return None
+
+        stop, target = self.exit_levels(pos)
+        if pos["side"] == "buy":
+            if current_price <= stop:
                 return "stop_loss"
-            if current_price >= entry * (1 + tp_pct):
+            if current_price >= target:
                 return "take_profit"
         else:  # sell
-            if current_price >= entry * (1 + sl_pct):
+            if current_price >= stop:
                 return "stop_loss"
-            if current_price <= entry * (1 - tp_pct):
+            if current_price <= target:
                 return "take_profit"
 
         if time.time() - pos["open_time"] > self.settings['trading']['max_order_age_seconds']:
@@ -92,9 +248,10 @@ class MicroScalpingRiskManager:
 
     def update_portfolio_after_close(self, close_price: float, side: str, qty: float, entry_price: float):
         pnl_usdt = (close_price - entry_price) * qty if side == "buy" else (entry_price - close_price) * qty
-        old_value = self.state["portfolio_value_usdt"]
-        new_value = old_value + pnl_usdt
-        self.state["portfolio_value_usdt"] = new_value
-        self.state["total_pnl_pct"] = (new_value / 1000.0 - 1) * 100
-        self.state["daily_pnl_pct"] += (pnl_usdt / old_value) * 100
-        self.state["active_position"] = None
\ No newline at end of file
+        pos = self.state["active_position"]
+        symbol = pos["symbol"] if pos else self.settings['trading']['symbols'][0]
+        self.portfolio.on_close(symbol, pnl_usdt)
+        self.exit_triggers.clear(symbol)
+        self.state["active_position"] = None
+        self.portfolio.export(self.state)
+        return pnl_usdt
\ No newline at end of file
@@ -0,0 +1,312 @@
+# TARGET_FILE: shard_coordinator.py
+"""
+Symbol sharding across engine nodes with one global exposure limit.
+
+Protocol: one JSON object per line over TCP ("host:port") or a Unix socket ("unix:/path").
+    node -> coordinator  {"op": "join", "node": id}
+                         {"op": "heartbeat", "equity": usdt, "exposure": {symbol: usdt}}
+                         {"op": "reserve", "req": n, "symbol": s, "notional": usdt}
+                         {"op": "release", "symbol": s}
+                         {"op": "leave"}
+    coordinator -> node  {"op": "assign", "epoch": n, "symbols": [...]}
+                         {"op": "reserve_result", "req": n, "ok": bool, "reason": str|null}
+
+    python shard_coordinator.py serve --address 127.0.0.1:9200
+    python shard_coordinator.py node --node n1 --address 127.0.0.1:9200   # stand-in engine node
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import time
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger("ShardCoordinator")
+
+def rendezvous_assign(symbols: List[str], nodes: List[str]) -> Dict[str, List[str]]:
+    """Highest-random-weight hashing: a join/leave only moves the symbols that must move."""
+    out = {node: [] for node in nodes}
+    if not nodes:
+        return out
+    for symbol in symbols:
+        owner = max(nodes, key=lambda node: hashlib.sha1(f"{node}:{symbol}".encode()).digest())
+        out[owner].append(symbol)
+    return out
+
+async def open_connection(address: str):
+    if address.startswith("unix:"):
+        return await asyncio.open_unix_connection(address[5:])
+    host, port = address.rsplit(":", 1)
+    return await asyncio.open_connection(host, int(port))
+
+async def send_message(writer: asyncio.StreamWriter, message: dict):
+    writer.write(json.dumps(message).encode() + b"\n")
+    await writer.drain()
+
+class ShardCoordinator:
+    def __init__(self, symbols: List[str], max_global_exposure_usdt: float,
+                 heartbeat_timeout: float = 10.0, reservation_ttl: float = 30.0):
+        """
+        Assigns `symbols` to connected nodes, rebalances on join/leave/timeout,
+        and approves new positions only while reported exposure plus pending
+        reservations stays under `max_global_exposure_usdt`.
+        """
+        self.symbols = [s.upper() for s in symbols]
+        self.max_global_exposure_usdt = max_global_exposure_usdt
+        self.heartbeat_timeout = heartbeat_timeout
+        self.reservation_ttl = reservation_ttl
+        self.nodes: Dict[str, dict] = {}
+        self.reservations: Dict[str, dict] = {}  # symbol -> {"node", "notional", "expires"}
+        self.epoch = 0
+
+    def owner(self, symbol: str) -> Optional[str]:
+        for node_id, node in self.nodes.items():
+            if symbol in node["symbols"]:
+                return node_id
+        return None
+
+    def global_exposure(self) -> float:
+        now = time.monotonic()
+        for symbol in [s for s, r in self.reservations.items() if r["expires"] < now]:
+            del self.reservations[symbol]
+        reported = sum(sum(node["exposure"].values()) for node in self.nodes.values())
+        return reported + sum(r["notional"] for r in self.reservations.values())
+
+    async def rebalance(self):
+        self.epoch += 1
+        assignment = rendezvous_assign(self.symbols, sorted(self.nodes))
+        for node_id, symbols in assignment.items():
+            node = self.nodes[node_id]
+            if symbols != node["symbols"] or not node["assigned"]:
+                node["symbols"] = symbols
+                node["assigned"] = True
+                try:
+                    await send_message(node["writer"], {"op": "assign", "epoch": self.epoch, "symbols": symbols})
+                except Exception as e:
+                    logger.warning(f"Failed to send assignment to {node_id}: {e}")
+        logger.info(f"Epoch {self.epoch}: " + ", ".join(f"{n}={len(s)}" for n, s in assignment.items()))
+
+    def _reserve(self, node_id: str, symbol: str, notional: float):
+        symbol = symbol.upper()
+        if self.owner(symbol) != node_id:
+            return False, "not_owner"
+        if symbol in self.reservations:
+            return False, "pending"
+        if self.global_exposure() + notional > self.max_global_exposure_usdt:
+            return False, "global_exposure"
+        self.reservations[symbol] = {"node": node_id, "notional": notional,
+                                     "expires": time.monotonic() + self.reservation_ttl}
+        return True, None
+
+    async def _handle_node(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        node_id = None
+        try:
+            async for line in reader:
+                msg = json.loads(line)
+                op = msg.get("op")
+                if op == "join":
+                    node_id = msg["node"]
+                    old = self.nodes.get(node_id)
+                    if old:
+                        old["writer"].close()  # Reconnect replaces the stale connection
+                    self.nodes[node_id] = {"writer": writer, "last_seen": time.monotonic(), "symbols": [],
+                                           "assigned": False, "exposure": {}, "equity": 0.0}
+                    logger.info(f"Node {node_id} joined")
+                    await self.rebalance()
+                    continue
+                if node_id is None or node_id not in self.nodes:
+                    continue
+                node = self.nodes[node_id]
+                node["last_seen"] = time.monotonic()
+                if op == "heartbeat":
+                    node["equity"] = msg.get("equity", 0.0)
+                    node["exposure"] = {s.upper(): v for s, v in msg.get("exposure", {}).items()}
+                    for symbol in node["exposure"]:
+                        # Reported now, so stop counting the reservation as well
+                        if self.reservations.get(symbol, {}).get("node") == node_id:
+                            del self.reservations[symbol]
+                elif op == "reserve":
+                    ok, reason = self._reserve(node_id, msg["symbol"], float(msg["notional"]))
+                    await send_message(writer, {"op": "reserve_result", "req": msg["req"], "ok": ok, "reason": reason})
+                elif op == "release":
+                    self.reservations.pop(msg["symbol"].upper(), None)
+                elif op == "leave":
+                    break
+        except (ConnectionError, ValueError) as e:
+            logger.warning(f"Node {node_id} connection error: {e}")
+        finally:
+            if node_id and self.nodes.get(node_id, {}).get("writer") is writer:
+                del self.nodes[node_id]
+                logger.info(f"Node {node_id} left")
+                await self.rebalance()
+            writer.close()
+
+    async def _reap_loop(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_timeout / 2)
+            cutoff = time.monotonic() - self.heartbeat_timeout
+            dead = [n for n, node in self.nodes.items() if node["last_seen"] < cutoff]
+            for node_id in dead:
+                logger.warning(f"Node {node_id} missed heartbeats, reassigning its symbols")
+                self.nodes.pop(node_id)["writer"].close()
+            if dead:
+                await self.rebalance()
+
+    async def serve(self, address: str):
+        if address.startswith("unix:"):
+            server = await asyncio.start_unix_server(self._handle_node, address[5:])
+        else:
+            host, port = address.rsplit(":", 1)
+            server = await asyncio.start_server(self._handle_node, host, int(port))
+        logger.info(f"Coordinator on {address}: {len(self.symbols)} symbols, "
+                    f"global exposure limit {self.max_global_exposure_usdt} USDT")
+        reaper = asyncio.create_task(self._reap_loop())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            reaper.cancel()
+
+class CoordinatorClient:
+    def __init__(self, address: str, node_id: str, on_assign: Callable[[List[str]], None],
+                 report: Callable[[], dict], heartbeat_interval: float = 2.0):
+        """
+        Node side. `on_assign(symbols)` is called with every new shard (and with
+        [] while disconnected, so the node stops opening positions);
+        `report()` returns {"equity", "exposure": {symbol: usdt}} for heartbeats.
+        """
+        self.address = address
+        self.node_id = node_id
+        self.on_assign = on_assign
+        self.report = report
+        self.heartbeat_interval = heartbeat_interval
+        self.writer: Optional[asyncio.StreamWriter] = None
+        self.pending: Dict[int, asyncio.Future] = {}
+        self.next_request_id = 0
+        self.running = False
+
+    async def _heartbeat_loop(self, writer: asyncio.StreamWriter):
+        while True:
+            await send_message(writer, {"op": "heartbeat", **self.report()})
+            await asyncio.sleep(self.heartbeat_interval)
+
+    async def start(self):
+        self.running = True
+        while self.running:
+            heartbeat = None
+            try:
+                reader, writer = await open_connection(self.address)
+                self.writer = writer
+                await send_message(writer, {"op": "join", "node": self.node_id})
+                heartbeat = asyncio.create_task(self._heartbeat_loop(writer))
+                logger.info(f"Node {self.node_id} connected to coordinator {self.address}")
+                async for line in reader:
+                    msg = json.loads(line)
+                    if msg["op"] == "assign":
+                        logger.info(f"Assigned {len(msg['symbols'])} symbols (epoch {msg['epoch']})")
+                        self.on_assign(msg["symbols"])
+                    elif msg["op"] == "reserve_result":
+                        future = self.pending.pop(msg["req"], None)
+                        if future and not future.done():
+                            future.set_result((msg["ok"], msg["reason"]))
+                raise ConnectionError("coordinator closed the connection")
+            except Exception as e:
+                if self.running:
+                    logger.error(f"Coordinator connection error: {e}, reconnecting in 2s...")
+            finally:
+                self.writer = None
+                self.on_assign([])
+                if heartbeat:
+                    heartbeat.cancel()
+            if self.running:
+                await asyncio.sleep(2)
+
+    async def reserve(self, symbol: str, notional: float, timeout: float = 2.0):
+        """(ok, reason) for opening `notional` USDT on `symbol`; fails closed without a coordinator."""
+        if self.writer is None:
+            return False, "coordinator_unavailable"
+        self.next_request_id += 1
+        request_id = self.next_request_id
+        future = asyncio.get_running_loop().create_future()
+        self.pending[request_id] = future
+        try:
+            await send_message(self.writer, {"op": "reserve", "req": request_id, "symbol": symbol, "notional": notional})
+            return await asyncio.wait_for(future, timeout)
+        except (asyncio.TimeoutError, ConnectionError, AttributeError):
+            self.pending.pop(request_id, None)
+            return False, "coordinator_timeout"
+
+    async def release(self, symbol: str):
+        if self.writer is not None:
+            try:
+                await send_message(self.writer, {"op": "release", "symbol": symbol})
+            except ConnectionError:
+                pass
+
+    def stop(self):
+        self.running = False
+        if self.writer is not None:
+            self.writer.close()
+
+async def run_stand_in_node(address: str, node_id: str, open_every: float = 3.0):
+    """A fake engine node: takes its shard, opens/closes random 10 USDT positions."""
+    shard: List[str] = []
+    exposure: Dict[str, float] = {}
+
+    def on_assign(symbols):
+        shard[:] = symbols
+        for symbol in list(exposure):
+            if symbol not in symbols:
+                exposure.pop(symbol)  # Stand-in: flatten positions on moved symbols
+
+    client = CoordinatorClient(address, node_id, on_assign,
+                               lambda: {"equity": 1000.0, "exposure": dict(exposure)}, heartbeat_interval=1.0)
+    task = asyncio.create_task(client.start())
+    while True:
+        await asyncio.sleep(open_every)
+        if exposure and random.random() < 0.5:
+            symbol = random.choice(list(exposure))
+            exposure.pop(symbol)
+            await client.release(symbol)
+            print(f"[{node_id}] closed {symbol}")
+        elif shard:
+            symbol = random.choice(shard)
+            ok, reason = await client.reserve(symbol, 10.0)
+            if ok:
+                exposure[symbol] = 10.0
+            print(f"[{node_id}] reserve {symbol}: {'ok' if ok else reason} | shard={shard}")
+        if task.done():
+            break
+
+if __name__ == "__main__":
+    import yaml
+    from log_setup import setup_logging
+    parser = argparse.ArgumentParser(description="Symbol shard coordinator.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_serve = sub.add_parser("serve")
+    p_node = sub.add_parser("node", help="Stand-in engine node for local testing")
+    p_node.add_argument("--node", required=True)
+    for p in (p_serve, p_node):
+        p.add_argument("--config", default="settings.yaml")
+        p.add_argument("--address", default=None)
+    args = parser.parse_args()
+
+    setup_logging(args.config, log_file="logs/coordinator.jsonl" if args.cmd == "serve" else f"logs/node_{args.node}.jsonl")
+    with open(args.config) as f:
+        settings = yaml.safe_load(f)
+    cfg = settings.get('coordinator', {})
+    address = args.address or cfg.get('address', "127.0.0.1:9200")
+    try:
+        if args.cmd == "serve":
+            coordinator = ShardCoordinator(
+                cfg.get('symbols') or settings['trading']['symbols'],
+                cfg.get('max_global_exposure_usdt', 100.0),
+                heartbeat_timeout=cfg.get('heartbeat_timeout_seconds', 10.0)
+            )
+            asyncio.run(coordinator.serve(address))
+        else:
+            asyncio.run(run_stand_in_node(address, args.node))
+    except KeyboardInterrupt:
+        pass
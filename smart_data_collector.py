@@ -6,10 +6,14 @@ import os
 import time
 import yaml
 import numpy as np
-from data.binance_ws import BinanceKlineStream
-from strategies.scalping_features import compute_scalping_features
+from data.binance_ws import BinanceKlineStream, market_rest_url
+from data.candle_aggregator import CandleAggregator
+from data.kline_snapshot import KlineSnapshotter
+from data.order_book import BinanceDepthStream
+from strategies.scalping_features import FeaturePipeline
+from log_setup import setup_logging
+from loop_monitor import run_event_loop
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger("SmartCollector")
 
 class VolatilityOptimizedCollector:
@@ -19,10 +23,26 @@ class VolatilityOptimizedCollector:
         self.symbol = self.settings['trading']['symbols'][0].lower()
         self.output_dir = output_dir
         os.makedirs(self.output_dir, exist_ok=True)
-        self.ws_client = BinanceKlineStream([self.symbol], interval='1s', maxlen=200)
+        self.feature_pipeline = FeaturePipeline(self.settings['model']['required_features'])
+        self.volatility_window = 60
+        stream_url = self.settings['binance'].get('stream_url', "wss://stream.binance.com:9443")
+        self.ws_client = BinanceKlineStream(
+            [self.symbol], interval='1s',
+            maxlen=max(self.feature_pipeline.history, self.volatility_window),
+            ws_url=stream_url
+        )
+        # Higher-timeframe candles rolled up from the 1s klines, only if a feature uses them
+        self.candles = None
+        if self.feature_pipeline.timeframes:
+            self.candles = CandleAggregator([self.symbol], self.feature_pipeline.timeframes)
+            self.ws_client.add_kline_listener(self.candles.on_kline)
+        self.depth_stream = (
+            BinanceDepthStream([self.symbol], ws_url=stream_url, rest_url=market_rest_url(self.settings))
+            if self.feature_pipeline.needs_book else None
+        )
+        self.snapshotter = KlineSnapshotter(self.ws_client, self.settings, "smart_collector")
         self.running = True
         self.save_count = 0
-        self.volatility_window = 60
         self.last_volatile_sample = time.time()
         self.fallback_mode = False
 
@@ -40,18 +60,17 @@ class VolatilityOptimizedCollector:
         if not file_exists:
             with open(output_file, 'w', newline='', encoding='utf-8') as f:
                 writer = csv.writer(f)
-                writer.writerow([
-                    'timestamp', 'close', 'price_change_1s', 'price_change_5s',
-                    'volatility_10s', 'volume_10s', 'price_acceleration'
-                ])
+                writer.writerow(['timestamp', 'close'] + self.feature_pipeline.names)
 
         logger.info(f"Smart collector started for {self.symbol} → {output_file}")
         logger.info("Primary mode: high volatility only. Fallback after 10 min silence.")
 
         while self.running:
             try:
-                klines = self.ws_client.get_klines_array(self.symbol, n=100)
-                if len(klines) < 20:
+                klines = self.ws_client.get_klines_array(
+                    self.symbol, n=max(self.feature_pipeline.window, self.volatility_window)
+                )
+                if len(klines) < self.feature_pipeline.window:
                     await asyncio.sleep(1)
                     continue
 
@@ -70,18 +89,13 @@ class VolatilityOptimizedCollector:
                     else:
                         should_save = False
 
-                if should_save and len(klines) >= 10:
-                    features = compute_scalping_features(klines[-10:])
+                if should_save:
+                    book = self.depth_stream.get_book(self.symbol) if self.depth_stream else None
+                    frames = (self.candles.frames(self.symbol, self.feature_pipeline.timeframes)
+                              if self.candles else None)
+                    features = self.feature_pipeline.compute(klines, book, frames)
                     if features is not None:
-                        row = [
-                            klines[-1]['t'],
-                            klines[-1]['c'],
-                            float(features[0]),
-                            float(features[1]),
-                            float(features[2]),
-                            float(features[3]),
-                            float(features[4])
-                        ]
+                        row = [klines[-1]['t'], klines[-1]['c']] + features.tolist()
                         with open(output_file, 'a', newline='', encoding='utf-8') as f:
                             writer = csv.writer(f)
                             writer.writerow(row)
@@ -97,17 +111,29 @@ class VolatilityOptimizedCollector:
                 await asyncio.sleep(1)
 
     async def run(self):
+        warm = await self.snapshotter.restore(max(self.feature_pipeline.history, self.volatility_window))
+        if self.candles is not None:
+            self.candles.reset(self.symbol, self.ws_client.klines[self.symbol])  # Roll up the restored klines
         ws_task = asyncio.create_task(self.ws_client.start())
-        await asyncio.sleep(2)
+        depth_task = asyncio.create_task(self.depth_stream.start()) if self.depth_stream else None
+        snapshot_task = asyncio.create_task(self.snapshotter.run())
+        if not warm:
+            await asyncio.sleep(2)
         try:
             await self.collect_loop()
         finally:
             self.ws_client.stop()
             ws_task.cancel()
+            snapshot_task.cancel()
+            self.snapshotter.save()
+            if depth_task:
+                self.depth_stream.stop()
+                depth_task.cancel()
 
 if __name__ == "__main__":
+    setup_logging(log_file="logs/smart_collector.jsonl")
     collector = VolatilityOptimizedCollector()
     try:
-        asyncio.run(collector.run())
+        run_event_loop(collector.run(), collector.settings)
     except KeyboardInterrupt:
         logger.info("Stopped by user.")
\ No newline at end of file
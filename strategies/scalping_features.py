@@ -1,43 +1,327 @@
 # TARGET_FILE: strategies/scalping_features.py
 import numpy as np
-from typing import List, Dict, Optional
+import yaml
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+from data.candle_aggregator import timeframe_seconds
 
-def compute_scalping_features(klines: List[Dict]) -> Optional[np.ndarray]:
+# Kline field -> column name in collected datasets
+DATASET_COLUMNS = {'t': 'timestamp', 'o': 'open', 'h': 'high', 'l': 'low', 'c': 'close', 'v': 'volume'}
+
+DEFAULT_FEATURES = [
+    'price_change_1s',
+    'price_change_5s',
+    'volatility_10s',
+    'volume_10s',
+    'price_acceleration'
+]
+
+@dataclass(frozen=True)
+class FeatureSpec:
+    """
+    One model input. `window` is the number of klines `latest` needs.
+    `latest(cols)` computes the value for the newest kline from the last `window`
+    rows; `batch(cols)` computes it for every row of a series (NaN until warm).
+    `cols` maps kline fields ('c', 'v', ...) to float64 arrays, plus 'book' (a
+    LocalOrderBook) for live-only order-book features, which have no batch form,
+    and 'tick': the price unit of o/h/l/c (1.0, or the tick size when prices
+    arrive as integer ticks). Ratios are unit-free; features in price units
+    multiply by it.
+    With a `timeframe` other than '1s', `window` counts closed candles of that
+    timeframe (rolled up from 1s klines by data/candle_aggregator.py) and
+    `cols` holds those candles.
+    """
+    name: str
+    window: int
+    fields: tuple
+    latest: Callable[[Dict[str, np.ndarray]], float]
+    batch: Optional[Callable[[Dict[str, np.ndarray]], np.ndarray]]
+    timeframe: str = '1s'
+
+FEATURE_REGISTRY: Dict[str, FeatureSpec] = {}
+
+def register_feature(spec: FeatureSpec) -> FeatureSpec:
+    FEATURE_REGISTRY[spec.name] = spec
+    return spec
+
+def _padded(values: np.ndarray, n: int) -> np.ndarray:
+    """Right-align `values` in a length-n float array padded with NaN."""
+    out = np.full(n, np.nan, dtype=np.float64)
+    if len(values):
+        out[n - len(values):] = values
+    return out
+
+def _rolling_windows(values: np.ndarray, window: int) -> np.ndarray:
+    return np.lib.stride_tricks.sliding_window_view(values, window)
+
+# ----------------------------
+# Built-in features
+# ----------------------------
+def _pct_change_latest(lag: int):
+    return lambda cols: (cols['c'][-1] - cols['c'][-1 - lag]) / cols['c'][-1 - lag]
+
+def _pct_change_batch(lag: int):
+    def batch(cols):
+        c = cols['c']
+        return _padded((c[lag:] - c[:-lag]) / c[:-lag], len(c))
+    return batch
+
+def _volatility_latest(cols):
+    c = cols['c'][-11:]
+    return np.std(np.diff(c) / c[:-1])
+
+def _volatility_batch(cols):
+    c = cols['c']
+    if len(c) < 11:
+        return _padded(np.array([]), len(c))
+    returns = np.diff(c) / c[:-1]
+    return _padded(np.std(_rolling_windows(returns, 10), axis=1), len(c))
+
+def _volume_latest(cols):
+    return np.sum(cols['v'][-10:])
+
+def _volume_batch(cols):
+    v = cols['v']
+    if len(v) < 10:
+        return _padded(np.array([]), len(v))
+    csum = np.concatenate(([0.0], np.cumsum(v, dtype=np.float64)))
+    return _padded(csum[10:] - csum[:-10], len(v))
+
+def _acceleration_latest(cols):
+    c = cols['c']
+    return ((c[-1] - c[-2]) - (c[-2] - c[-3])) * cols.get('tick', 1.0)
+
+def _acceleration_batch(cols):
+    c = cols['c']
+    return _padded((c[2:] - 2 * c[1:-1] + c[:-2]) * cols.get('tick', 1.0), len(c))
+
+def _range_latest(cols):
+    return (np.max(cols['h'][-10:]) - np.min(cols['l'][-10:])) / cols['c'][-1]
+
+def _range_batch(cols):
+    h, l, c = cols['h'], cols['l'], cols['c']
+    if len(c) < 10:
+        return _padded(np.array([]), len(c))
+    spread = _rolling_windows(h, 10).max(axis=1) - _rolling_windows(l, 10).min(axis=1)
+    return _padded(spread / c[9:], len(c))
+
+def _vwap_deviation(c, v_sum, pv_sum):
+    vwap = np.where(v_sum > 0, pv_sum / np.where(v_sum > 0, v_sum, 1.0), c)
+    return (c - vwap) / vwap
+
+def _vwap_latest(cols):
+    c, v = cols['c'][-10:], cols['v'][-10:]
+    return float(_vwap_deviation(c[-1], np.sum(v), np.sum(c * v)))
+
+def _vwap_batch(cols):
+    c, v = cols['c'], cols['v']
+    if len(c) < 10:
+        return _padded(np.array([]), len(c))
+    v_sum = _volume_batch({'v': v})[9:]
+    pv_sum = _volume_batch({'v': c * v})[9:]
+    return _padded(_vwap_deviation(c[9:], v_sum, pv_sum), len(c))
+
+def _return_std_latest(n: int):
+    def latest(cols):
+        c = cols['c'][-n - 1:]
+        return np.std(np.diff(c) / c[:-1])
+    return latest
+
+def _return_std_batch(n: int):
+    def batch(cols):
+        c = cols['c']
+        if len(c) < n + 1:
+            return _padded(np.array([]), len(c))
+        returns = np.diff(c) / c[:-1]
+        return _padded(np.std(_rolling_windows(returns, n), axis=1), len(c))
+    return batch
+
+def _bar_range_latest(cols):
+    return (cols['h'][-1] - cols['l'][-1]) / cols['c'][-1]
+
+def _bar_range_batch(cols):
+    return (cols['h'] - cols['l']) / cols['c']
+
+def _volume_ratio_latest(n: int):
+    def latest(cols):
+        v = cols['v'][-n - 1:]
+        mean = np.mean(v[:-1])
+        return v[-1] / mean if mean > 0 else np.nan
+    return latest
+
+def _volume_ratio_batch(n: int):
+    def batch(cols):
+        v = cols['v']
+        if len(v) < n + 1:
+            return _padded(np.array([]), len(v))
+        mean = np.mean(_rolling_windows(v[:-1], n), axis=1)
+        return _padded(np.where(mean > 0, v[n:] / np.where(mean > 0, mean, 1.0), np.nan), len(v))
+    return batch
+
+def _book_feature(fn):
+    def latest(cols):
+        value = fn(cols['book'])
+        return np.nan if value is None else value
+    return latest
+
+def _microprice_deviation(book):
+    micro, mid = book.microprice(), book.mid_price()
+    return (micro - mid) / mid if micro is not None else None
+
+register_feature(FeatureSpec('price_change_1s', 2, ('c',), _pct_change_latest(1), _pct_change_batch(1)))
+register_feature(FeatureSpec('price_change_5s', 6, ('c',), _pct_change_latest(5), _pct_change_batch(5)))
+register_feature(FeatureSpec('volatility_10s', 11, ('c',), _volatility_latest, _volatility_batch))
+register_feature(FeatureSpec('volume_10s', 10, ('v',), _volume_latest, _volume_batch))
+register_feature(FeatureSpec('price_acceleration', 3, ('c',), _acceleration_latest, _acceleration_batch))
+register_feature(FeatureSpec('high_low_range_10s', 10, ('h', 'l', 'c'), _range_latest, _range_batch))
+register_feature(FeatureSpec('vwap_deviation_10s', 10, ('c', 'v'), _vwap_latest, _vwap_batch))
+register_feature(FeatureSpec('book_spread_bps', 1, ('book',), _book_feature(lambda b: b.spread_bps()), None))
+register_feature(FeatureSpec('book_imbalance_5', 1, ('book',), _book_feature(lambda b: b.imbalance(5)), None))
+register_feature(FeatureSpec('book_imbalance_20', 1, ('book',), _book_feature(lambda b: b.imbalance(20)), None))
+register_feature(FeatureSpec('microprice_deviation', 1, ('book',), _book_feature(_microprice_deviation), None))
+# Higher timeframes, from closed candles rolled up out of the 1s stream
+register_feature(FeatureSpec('price_change_15s_x4', 5, ('c',), _pct_change_latest(4), _pct_change_batch(4), '15s'))
+register_feature(FeatureSpec('volatility_5s_x12', 13, ('c',), _return_std_latest(12), _return_std_batch(12), '5s'))
+register_feature(FeatureSpec('range_1m', 1, ('h', 'l', 'c'), _bar_range_latest, _bar_range_batch, '1m'))
+register_feature(FeatureSpec('volume_ratio_1m_x5', 6, ('v',), _volume_ratio_latest(5), _volume_ratio_batch(5), '1m'))
+
+def resample_closed(t: np.ndarray, cols: Dict[str, np.ndarray], timeframe: str, base_ms: int = 1000):
+    """
+    Offline twin of CandleAggregator: roll a 1s series (`t` in epoch ms) up to
+    `timeframe` candles. Returns (candle columns, close_row) where close_row[k]
+    is the first 1s row at which candle k is closed live: its bucket's last
+    second, or else the first row of the next bucket.
+    """
+    tf_ms = timeframe_seconds(timeframe) * 1000
+    bucket = t // tf_ms
+    starts = np.flatnonzero(np.diff(bucket, prepend=bucket[0] - 1))
+    ends = np.append(starts[1:], len(t))
+    out = {}
+    if 'o' in cols:
+        out['o'] = cols['o'][starts]
+    if 'h' in cols:
+        out['h'] = np.maximum.reduceat(cols['h'], starts)
+    if 'l' in cols:
+        out['l'] = np.minimum.reduceat(cols['l'], starts)
+    if 'c' in cols:
+        out['c'] = cols['c'][ends - 1]
+    if 'v' in cols:
+        out['v'] = np.add.reduceat(cols['v'], starts)
+    complete = t[ends - 1] + base_ms >= (bucket[starts] + 1) * tf_ms
+    close_row = np.where(complete, ends - 1, ends)
+    return out, close_row
+
+# ----------------------------
+# Pipeline
+# ----------------------------
+class FeaturePipeline:
+    def __init__(self, feature_names: List[str]):
+        unknown = [n for n in feature_names if n not in FEATURE_REGISTRY]
+        if unknown:
+            raise ValueError(f"Unknown features {unknown}. Registered: {sorted(FEATURE_REGISTRY)}")
+        self.names = list(feature_names)
+        self.specs = [FEATURE_REGISTRY[n] for n in self.names]
+        base_specs = [spec for spec in self.specs if spec.timeframe == '1s']
+        self.window = max((spec.window for spec in base_specs), default=1)
+        self.needs_book = any('book' in spec.fields for spec in self.specs)
+        self.fields = sorted({f for spec in base_specs for f in spec.fields if f != 'book'})
+        # Higher timeframes: closed candles needed per timeframe, and their fields
+        self.timeframes: Dict[str, int] = {}
+        self.timeframe_fields: Dict[str, set] = {}
+        for spec in self.specs:
+            if spec.timeframe != '1s':
+                self.timeframes[spec.timeframe] = max(self.timeframes.get(spec.timeframe, 0), spec.window)
+                self.timeframe_fields.setdefault(spec.timeframe, set()).update(spec.fields)
+        # 1s klines that rebuild every timeframe's window (plus its forming candle), e.g. after a restore
+        self.history = max([self.window] + [(n + 1) * timeframe_seconds(tf) for tf, n in self.timeframes.items()])
+
+    def compute(self, klines, book=None, frames=None, tick_size: Optional[float] = None) -> Optional[np.ndarray]:
+        """
+        Features for the newest kline, in pipeline order, computed in float64.
+        `klines` is a list of kline dicts or a dict of per-field arrays (e.g.
+        shared-memory views, or int64 tick columns with their `tick_size`);
+        `frames` maps each of `timeframes` to its closed-candle columns
+        (CandleAggregator.frames). Returns shape (n_features,) array or None
+        if fewer than `window` klines, higher-timeframe candles still warming
+        up, or no synced order book when the pipeline has book features.
+        """
+        columnar = isinstance(klines, dict)
+        if (len(klines['c']) if columnar else len(klines)) < self.window:
+            return None
+        if self.needs_book and book is None:
+            return None
+        if self.timeframes and frames is None:
+            return None
+        if columnar:
+            cols = {f: np.asarray(klines[f][-self.window:], dtype=np.float64) for f in self.fields}
+        else:
+            tail = klines[-self.window:]
+            cols = {f: np.array([k[f] for k in tail], dtype=np.float64) for f in self.fields}
+        cols['book'] = book
+        cols['tick'] = tick_size or 1.0
+        if not self.timeframes:
+            return np.array([spec.latest(cols) for spec in self.specs], dtype=np.float64)
+        by_timeframe = {'1s': cols}
+        for tf, n in self.timeframes.items():
+            by_timeframe[tf] = {f: np.asarray(frames[tf][f][-n:], dtype=np.float64)
+                                for f in self.timeframe_fields[tf]}
+        return np.array([spec.latest(by_timeframe[spec.timeframe]) for spec in self.specs], dtype=np.float64)
+
+    @staticmethod
+    def _spec_batch(spec: FeatureSpec, cols: Dict[str, np.ndarray], t: Optional[np.ndarray]) -> np.ndarray:
+        if spec.timeframe == '1s':
+            return spec.batch(cols)
+        if t is None:
+            raise ValueError(f"{spec.name} needs kline open times ('t') to roll up {spec.timeframe} candles")
+        candles, close_row = resample_closed(np.asarray(t, dtype=np.int64), cols, spec.timeframe)
+        values = spec.batch(candles)
+        # Each 1s row sees the newest candle closed by then
+        latest = np.searchsorted(close_row, np.arange(len(t)), side='right') - 1
+        return np.where(latest >= 0, values[np.maximum(latest, 0)], np.nan)
+
+    def compute_batch(self, cols: Dict[str, np.ndarray]) -> np.ndarray:
+        """
+        Features for every row of a 1s series, shape (n_rows, n_features); NaN
+        rows until warm. Higher-timeframe features also need 't' (open time, ms).
+        """
+        live_only = [spec.name for spec in self.specs if spec.batch is None]
+        if live_only:
+            raise ValueError(f"Features {live_only} are live-only; read them from a collected dataset")
+        t = cols.get('t')
+        fields = set(self.fields).union(*self.timeframe_fields.values())
+        cols = {f: np.asarray(cols[f], dtype=np.float64) for f in fields}
+        return np.column_stack([self._spec_batch(spec, cols, t) for spec in self.specs])
+
+    def ensure_columns(self, df):
+        """
+        Make sure a dataset DataFrame has every pipeline column, computing the
+        missing ones from its raw kline columns. Raises ValueError if it can't.
+        """
+        for spec in self.specs:
+            if spec.name in df.columns:
+                continue
+            if spec.batch is None:
+                raise ValueError(f"Cannot compute {spec.name} offline: it needs a live order book")
+            fields = spec.fields + (('t',) if spec.timeframe != '1s' else ())
+            missing = [DATASET_COLUMNS[f] for f in fields if DATASET_COLUMNS[f] not in df.columns]
+            if missing:
+                raise ValueError(f"Cannot compute {spec.name}: dataset has no {missing} column")
+            cols = {f: df[DATASET_COLUMNS[f]].to_numpy(dtype=np.float64) for f in spec.fields}
+            t = df[DATASET_COLUMNS['t']].to_numpy(dtype=np.int64) if spec.timeframe != '1s' else None
+            df[spec.name] = self._spec_batch(spec, cols, t)
+        return df
+
+def load_feature_pipeline(config_path: str = "settings.yaml") -> FeaturePipeline:
+    """Build the pipeline listed under model.required_features."""
+    with open(config_path) as f:
+        settings = yaml.safe_load(f)
+    return FeaturePipeline(settings['model']['required_features'])
+
+DEFAULT_PIPELINE = FeaturePipeline(DEFAULT_FEATURES)
+
+def compute_scalping_features(klines: List[Dict], pipeline: FeaturePipeline = DEFAULT_PIPELINE) -> Optional[np.ndarray]:
     """
-    Compute vectorized features from last N 1s klines.
-    Returns shape (5,) array or None if insufficient data.
+    Compute vectorized features from the last 1s klines.
+    Returns shape (n_features,) array or None if insufficient data.
     """
-    if len(klines) < 10:
-        return None
-
-    closes = np.array([k['c'] for k in klines], dtype=np.float32)
-    volumes = np.array([k['v'] for k in klines], dtype=np.float32)
-
-    # Price changes
-    price_change_1s = (closes[-1] - closes[-2]) / closes[-2]
-    price_change_5s = (closes[-1] - closes[-6]) / closes[-6]
-
-    # Volatility (std of returns over last 10s)
-    returns = np.diff(closes) / closes[:-1]
-    volatility_10s = np.std(returns[-10:]) if len(returns) >= 10 else 0.0
-
-    # Volume sum last 10s
-    volume_10s = np.sum(volumes[-10:])
-
-    # Price acceleration (2nd derivative approx)
-    if len(closes) >= 3:
-        vel1 = closes[-1] - closes[-2]
-        vel2 = closes[-2] - closes[-3]
-        price_acceleration = vel1 - vel2
-    else:
-        price_acceleration = 0.0
-
-    features = np.array([
-        price_change_1s,
-        price_change_5s,
-        volatility_10s,
-        volume_10s,
-        price_acceleration
-    ], dtype=np.float32)
-
-    return features
\ No newline at end of file
+    return pipeline.compute(klines)
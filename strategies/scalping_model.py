@@ -1,16 +1,25 @@
 # TARGET_FILE: strategies/scalping_model.py
+import json
 import os
 import numpy as np
-import xgboost as xgb
 import logging
 
 logger = logging.getLogger("ScalpingModel")
 
+xgb = None  # xgboost takes ~2s to import: loaded with the first model
+
+def _xgboost():
+    global xgb
+    if xgb is None:
+        import xgboost
+        xgb = xgboost
+    return xgb
+
 def load_scalping_model(model_path: str):
     """Load XGBoost model if exists, else return None."""
     if os.path.exists(model_path):
         try:
-            model = xgb.Booster()
+            model = _xgboost().Booster()
             model.load_model(model_path)
             logger.info(f"Loaded scalping model from {model_path}")
             return model
@@ -20,6 +29,29 @@ def load_scalping_model(model_path: str):
         logger.warning(f"Model not found at {model_path}. Place trained model there to enable trading.")
     return None
 
+def validate_scalping_model(model, model_path: str, required_features: list) -> bool:
+    """
+    Check a loaded model against the configured feature list: the model's input
+    width and the feature list saved next to it by the trainer must both match.
+    """
+    if model is None:
+        return False
+    if model.num_features() != len(required_features):
+        logger.error(f"Model expects {model.num_features()} features, config requires {len(required_features)}")
+        return False
+    features_path = model_path.replace('.json', '_features.json')
+    if os.path.exists(features_path):
+        try:
+            with open(features_path) as f:
+                saved_features = list(json.load(f))
+        except Exception as e:
+            logger.error(f"Failed to read {features_path}: {e}")
+            return False
+        if saved_features != list(required_features):
+            logger.error(f"Model features {saved_features} do not match required {list(required_features)}")
+            return False
+    return True
+
 def predict_signal(model, features: np.ndarray) -> tuple:
     """
     Returns (confidence: float, side: str) where side is 'buy' or 'sell'.
@@ -28,7 +60,7 @@ def predict_signal(model, features: np.ndarray) -> tuple:
     if model is None or features is None:
         return 0.0, 'neutral'
 
-    dmat = xgb.DMatrix(features.reshape(1, -1))
+    dmat = _xgboost().DMatrix(features.reshape(1, -1))
     pred = model.predict(dmat)[0]  # Assume output: 0=sell, 1=buy
 
     if pred > 0.6:
@@ -47,10 +79,8 @@ def train_placeholder_model():
     import os
     os.makedirs("models", exist_ok=True)
     print("Placeholder: Train your model and save to models/scalping_model.json")
-    print("Expected features (in order):")
-    print("- price_change_1s")
-    print("- price_change_5s")
-    print("- volatility_10s")
-    print("- volume_10s")
-    print("- price_acceleration")
+    from strategies.scalping_features import load_feature_pipeline
+    print("Expected features (in order, from model.required_features):")
+    for name in load_feature_pipeline().names:
+        print(f"- {name}")
     print("Label: 1 for buy, 0 for sell (based on next 2s price move)")
\ No newline at end of file
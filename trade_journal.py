@@ -0,0 +1,176 @@
+# TARGET_FILE: trade_journal.py
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+logger = logging.getLogger("TradeJournal")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    kind TEXT NOT NULL,          -- signal | order | fill | exit
+    symbol TEXT NOT NULL,
+    side TEXT,
+    price REAL,
+    qty REAL,
+    order_id INTEGER,
+    trade_id INTEGER,            -- entry order id, shared by a trade's events
+    reason TEXT,
+    confidence REAL,
+    signal_price REAL,
+    signal_ts REAL,
+    pnl_usdt REAL,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_events_kind_symbol_ts ON events(kind, symbol, ts);
+CREATE INDEX IF NOT EXISTS idx_events_trade ON events(trade_id);
+"""
+
+COLUMNS = ("ts", "kind", "symbol", "side", "price", "qty", "order_id", "trade_id", "reason",
+           "confidence", "signal_price", "signal_ts", "pnl_usdt", "extra")
+INSERT_SQL = f"INSERT INTO events ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+
+def connect(path: str, readonly: bool = False) -> sqlite3.Connection:
+    if readonly:
+        return sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+class TradeJournal:
+    def __init__(self, path: str = "trade_journal.db", batch_size: int = 256, flush_interval: float = 0.5):
+        """
+        Append-only SQLite (WAL) journal. `log` only enqueues a tuple; a
+        background thread commits queued events in batches.
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        connect(path).close()  # Create schema up front so readers never race the writer
+        self._thread = threading.Thread(target=self._writer, name="TradeJournalWriter", daemon=True)
+        self._thread.start()
+
+    def log(self, kind: str, symbol: str, side: str = None, price: float = None, qty: float = None,
+            order_id: int = None, trade_id: int = None, reason: str = None, confidence: float = None,
+            signal_price: float = None, signal_ts: float = None, pnl_usdt: float = None, **extra):
+        self.queue.put((time.time(), kind, symbol, side, price, qty, order_id, trade_id, reason, confidence,
+                        signal_price, signal_ts, pnl_usdt, json.dumps(extra) if extra else None))
+
+    def _writer(self):
+        conn = connect(self.path)
+        running = True
+        while running:
+            batch = []
+            try:
+                item = self.queue.get(timeout=self.flush_interval)
+                while item is not None:
+                    batch.append(item)
+                    if len(batch) >= self.batch_size:
+                        break
+                    item = self.queue.get_nowait()
+                else:
+                    running = False  # Sentinel from close()
+            except queue.Empty:
+                pass
+            if batch:
+                try:
+                    conn.executemany(INSERT_SQL, batch)
+                    conn.commit()
+                except Exception as e:
+                    logger.error(f"Failed to write {len(batch)} journal events: {e}")
+        conn.close()
+
+    def close(self):
+        """Flush everything queued so far and stop the writer."""
+        self.queue.put(None)
+        self._thread.join()
+
+# ----------------------------
+# Analytics queries
+# ----------------------------
+def win_rate_by_symbol_hour(conn: sqlite3.Connection, since: Optional[float] = None) -> list:
+    """[(symbol, utc_hour, trades, win_rate, pnl_usdt)] over closed trades."""
+    return conn.execute("""
+        SELECT symbol, CAST(strftime('%H', ts, 'unixepoch') AS INTEGER) AS hour,
+               COUNT(*), AVG(pnl_usdt > 0), SUM(pnl_usdt)
+        FROM events WHERE kind = 'exit' AND ts >= ?
+        GROUP BY symbol, hour ORDER BY symbol, hour
+    """, (since or 0,)).fetchall()
+
+def slippage_by_symbol(conn: sqlite3.Connection, since: Optional[float] = None) -> list:
+    """[(symbol, kind, fills, avg_slippage_bps)]; positive = filled worse than the signal price."""
+    return conn.execute("""
+        SELECT symbol, kind, COUNT(*),
+               AVG(CASE WHEN side IN ('buy', 'BUY') THEN (price - signal_price) ELSE (signal_price - price) END
+                   / signal_price * 10000)
+        FROM events WHERE kind IN ('fill', 'exit') AND signal_price > 0 AND price > 0 AND ts >= ?
+        GROUP BY symbol, kind ORDER BY symbol, kind
+    """, (since or 0,)).fetchall()
+
+def signal_to_fill_latency(conn: sqlite3.Connection, symbol: Optional[str] = None,
+                           since: Optional[float] = None) -> dict:
+    """p50/p90/p99/max seconds from signal to fill for entries."""
+    rows = conn.execute("""
+        SELECT ts - signal_ts AS latency FROM events
+        WHERE kind = 'fill' AND signal_ts IS NOT NULL AND (? IS NULL OR symbol = ?) AND ts >= ?
+        ORDER BY latency
+    """, (symbol, symbol, since or 0)).fetchall()
+    if not rows:
+        return {}
+    values = [r[0] for r in rows]
+    pick = lambda q: values[min(len(values) - 1, int(q * len(values)))]
+    return {"count": len(values), "p50": pick(0.5), "p90": pick(0.9), "p99": pick(0.99), "max": values[-1]}
+
+def recent_events(conn: sqlite3.Connection, kind: str, limit: int = 20) -> list:
+    cur = conn.execute(f"SELECT {', '.join(COLUMNS)} FROM events WHERE kind = ? ORDER BY id DESC LIMIT ?",
+                       (kind, limit))
+    return [dict(zip(COLUMNS, row)) for row in cur.fetchall()]
+
+def open_trades(conn: sqlite3.Connection) -> list:
+    """Entry fills with no exit yet."""
+    cur = conn.execute(f"""
+        SELECT {', '.join('f.' + c for c in COLUMNS)} FROM events f
+        WHERE f.kind = 'fill' AND NOT EXISTS (
+            SELECT 1 FROM events x WHERE x.kind = 'exit' AND x.trade_id = f.trade_id)
+        ORDER BY f.id DESC
+    """)
+    return [dict(zip(COLUMNS, row)) for row in cur.fetchall()]
+
+def summary(conn: sqlite3.Connection) -> dict:
+    trades, wins, pnl = conn.execute(
+        "SELECT COUNT(*), COALESCE(SUM(pnl_usdt > 0), 0), COALESCE(SUM(pnl_usdt), 0) FROM events WHERE kind = 'exit'"
+    ).fetchone()
+    day_start = time.time() // 86400 * 86400
+    daily_pnl = conn.execute(
+        "SELECT COALESCE(SUM(pnl_usdt), 0) FROM events WHERE kind = 'exit' AND ts >= ?", (day_start,)
+    ).fetchone()[0]
+    last_exit = recent_events(conn, 'exit', limit=1)
+    equity = json.loads(last_exit[0]["extra"] or "{}").get("equity") if last_exit else None
+    return {"trades": trades, "win_rate": wins / trades if trades else 0.0, "pnl_usdt": pnl,
+            "daily_pnl_usdt": daily_pnl, "equity": equity}
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Trade journal analytics.")
+    parser.add_argument("--db", default="trade_journal.db")
+    parser.add_argument("--hours", type=float, default=None, help="Only the last N hours")
+    args = parser.parse_args()
+
+    since = time.time() - args.hours * 3600 if args.hours else None
+    conn = connect(args.db, readonly=True)
+    print(f"Summary: {summary(conn)}")
+    print("\nWin rate by symbol / UTC hour:")
+    for symbol, hour, count, win_rate, pnl in win_rate_by_symbol_hour(conn, since):
+        print(f"  {symbol} {hour:02d}h  trades={count:<5} win={win_rate:.1%}  pnl={pnl:+.4f} USDT")
+    print("\nSlippage vs signal price:")
+    for symbol, kind, count, bps in slippage_by_symbol(conn, since):
+        print(f"  {symbol} {kind:<5} n={count:<5} {bps:+.2f} bps")
+    print(f"\nSignal -> fill latency: {signal_to_fill_latency(conn, since=since)}")
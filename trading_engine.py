@@ -3,24 +3,38 @@ import asyncio
 import json
 import logging
 import os
+import signal
+import socket
 import sys
 import time
 from pathlib import Path
 
+_IMPORT_START = time.perf_counter()
+
 # Add project root to path
 sys.path.insert(0, str(Path(__file__).parent))
 
-from data.binance_ws import BinanceKlineStream
-from strategies.scalping_features import compute_scalping_features
-from strategies.scalping_model import load_scalping_model, predict_signal
+from data.agg_trades import AggTradeStream, parse_bar_spec
+from data.binance_ws import BinanceBookTickerStream, BinanceKlineStream, market_rest_url
+from data.candle_aggregator import CandleAggregator
+from data.kline_snapshot import KlineSnapshotter
+from data.order_book import BinanceDepthStream
+from data.user_stream import AccountModel, UserDataStream
+from strategies.scalping_features import FeaturePipeline
+from strategies.scalping_model import load_scalping_model, predict_signal, validate_scalping_model
 from risk_management import MicroScalpingRiskManager
-from order_executor import TestnetOrderExecutor
+from exchange_filters import ExchangeFilterCache
+from trade_journal import TradeJournal
+from latency_metrics import StartupProfile, make_recorder
+from log_setup import setup_logging
+from loop_monitor import run_event_loop
+from shard_coordinator import CoordinatorClient
 import yaml
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger("TradingEngine")
 
+_IMPORT_SECONDS = time.perf_counter() - _IMPORT_START
+
 def save_latest_klines(klines: list, symbol: str, filepath: str = "latest_klines.json"):
     """Save last N klines to JSON for dashboard."""
     try:
@@ -35,111 +49,603 @@ def save_latest_klines(klines: list, symbol: str, filepath: str = "latest_klines
         logger.debug(f"Failed to save klines: {e}")
 
 class ScalpingEngine:
-    def __init__(self, config_path: str = "settings.yaml"):
-        with open(config_path) as f:
-            self.settings = yaml.safe_load(f)
-        self.risk_mgr = MicroScalpingRiskManager(self.settings)
-        self.ws_client = BinanceKlineStream(
-            symbols=self.settings['trading']['symbols'],
-            interval='1s',
-            maxlen=60
+    def __init__(self, config_path: str = "settings.yaml", order_executor=None,
+                 filters: ExchangeFilterCache = None, settings: dict = None, ws_client=None,
+                 startup: StartupProfile = None):
+        """
+        `order_executor` / `filters` / `ws_client` replace the Testnet executor,
+        exchangeInfo cache and websocket kline stream (benchmarks, stand-ins,
+        worker processes); `settings` replaces the contents of `config_path`.
+        Model loading and the exchange client are set up by `initialize()`.
+        """
+        self.config_path = config_path
+        self.startup = startup or StartupProfile()
+        if settings is None:
+            with open(config_path) as f:
+                settings = yaml.safe_load(f)
+        self.settings = settings
+        # Symbols this engine evaluates (default: the first one); the rest are only streamed
+        self.trade_symbols = self.settings['trading'].get('trade_symbols') or self.settings['trading']['symbols'][:1]
+        # LOT_SIZE / PRICE_FILTER / MIN_NOTIONAL for every symbol, cached on disk
+        if filters is None:
+            with self.startup.stage("exchange filters"):
+                filters = ExchangeFilterCache(self.settings['binance']['base_url']).load()
+        self.filters = filters
+        self.risk_mgr = MicroScalpingRiskManager(
+            self.settings, state_file=self.settings['trading'].get('state_file', 'shared_state.json'),
+            filters=self.filters
         )
-        self.model = load_scalping_model(self.settings['model']['path'])
-        self.order_executor = TestnetOrderExecutor(config_path)
+        self.feature_pipeline = FeaturePipeline(self.settings['model']['required_features'])
+        history = max(self.feature_pipeline.window, 60)  # 60 for dashboard history
+        bar = self.settings['trading'].get('bar', '1s')
+        # Public market streams; point at data/synthetic_market.py's server for soak tests
+        stream_url = self.settings['binance'].get('stream_url', "wss://stream.binance.com:9443")
+        # Prices as exact int64 ticks for symbols with exchange tick sizes (1s kline stream)
+        self.tick_sizes = {}
+        if ws_client is not None:
+            self.ws_client = ws_client
+        elif bar == '1s':
+            self.tick_sizes = {
+                s: float(self.filters.filters[s.upper()].tick_size)
+                for s in self.settings['trading']['symbols'] if s.upper() in self.filters.filters
+            }
+            self.ws_client = BinanceKlineStream(
+                symbols=self.settings['trading']['symbols'],
+                interval='1s',
+                maxlen=history,
+                ws_url=stream_url,
+                tick_sizes=self.tick_sizes
+            )
+        else:
+            # Sub-second / volume / tick bars built from the aggTrade stream
+            self.ws_client = AggTradeStream(self.settings['trading']['symbols'], [bar], maxlen=history,
+                                            ws_url=stream_url)
+        # Higher-timeframe candles rolled up from the 1s klines, only if a feature uses them
+        if self.feature_pipeline.timeframes and hasattr(self.ws_client, 'add_kline_listener'):
+            self.candles = CandleAggregator(self.settings['trading']['symbols'], self.feature_pipeline.timeframes)
+            self.ws_client.add_kline_listener(self.candles.on_kline)
+        else:
+            if self.feature_pipeline.timeframes:
+                logger.warning(f"Kline store {type(self.ws_client).__name__} has no kline listeners: "
+                               f"higher-timeframe features stay empty")
+            self.candles = None
+        # Kline buffers survive restarts (1s kline streams only)
+        self.snapshotter = KlineSnapshotter(self.ws_client, self.settings, "engine")
+        self.snapshotter.enabled &= isinstance(self.ws_client, BinanceKlineStream)
+        mode, size = parse_bar_spec(bar)
+        self.eval_interval = size / 1000.0 if mode == 'time' else 0.1
+        # Stop/target are checked on every price update, not once per evaluation
+        if self.settings['trading'].get('exit_price_stream', 'bookTicker') == 'bookTicker':
+            self.price_stream = BinanceBookTickerStream(self.settings['trading']['symbols'], ws_url=stream_url)
+            self.price_stream.add_price_listener(self.on_price_update)
+        else:
+            self.price_stream = None
+            self.ws_client.add_price_listener(self.on_price_update)
+        self.closing = set()
+        # Closes dispatched per tick and symbol backfills: held until done, failures logged
+        self.background_tasks = set()
+        # Per-stage latency histograms; a no-op recorder unless metrics.enabled
+        self.metrics = make_recorder(self.settings)
+        if self.metrics.enabled:
+            self.ws_client.metrics = self.metrics
+        self.use_brackets = self.settings['trading'].get('use_exchange_brackets', False)
+        # A crossed stop is left to the exchange until price runs through the STOP_LOSS_LIMIT's
+        # limit price or the grace period passes; then the bracket is replaced by a market close
+        self.stop_slippage_pct = self.settings['trading'].get('bracket_stop_slippage_pct', 0.05)
+        self.stop_grace_seconds = self.settings['trading'].get('bracket_stop_grace_seconds', 2.0)
+        self.reconcile_interval = self.settings['trading'].get('bracket_reconcile_seconds', 1.0)
+        self.stop_crossed_at = {}
+        self.last_reconcile = {}
+        self.depth_stream = (
+            BinanceDepthStream(self.settings['trading']['symbols'], ws_url=stream_url,
+                               rest_url=market_rest_url(self.settings))
+            if self.feature_pipeline.needs_book else None
+        )
+        self.model_mtime = None
+        self.model = None
+        self.reload_requested = False
+        self.order_executor = order_executor
+        self.account = None
+        self.user_stream = None
+        self.initialized = False
+        # Every signal, order, fill and exit, written off the event loop
+        self.journal = TradeJournal(self.settings.get('journal', {}).get('path', 'trade_journal.db'))
+        # Multi-node: the coordinator assigns trade_symbols and holds the global exposure limit
+        coord_cfg = self.settings.get('coordinator', {})
+        if coord_cfg.get('enabled', False):
+            self.trade_symbols = []  # Nothing to trade until the first assignment
+            self.coordinator = CoordinatorClient(
+                coord_cfg.get('address', "127.0.0.1:9200"),
+                coord_cfg.get('node_id') or f"{socket.gethostname()}-{os.getpid()}",
+                on_assign=self.on_shard_assigned,
+                report=self.exposure_report,
+                heartbeat_interval=coord_cfg.get('heartbeat_seconds', 2.0)
+            )
+        else:
+            self.coordinator = None
         self.running = True
 
+    def _build_order_executor(self):
+        with self.startup.stage("import python-binance"):
+            from order_executor import TestnetOrderExecutor
+        with self.startup.stage("exchange client"):
+            return TestnetOrderExecutor(self.config_path, filters=self.filters)
+
+    def _load_initial_model(self):
+        with self.startup.stage("model load"):
+            self.model_mtime = self._model_mtime()
+            return self._load_validated_model()
+
+    async def initialize(self):
+        """
+        Load the model and build the exchange client in parallel worker threads
+        (both import heavy modules and the client pings the exchange), then
+        wire up the user data stream. Idempotent; `run()` calls it while the
+        market streams are already connecting.
+        """
+        if self.initialized:
+            return
+        model, executor = await asyncio.gather(
+            asyncio.to_thread(self._load_initial_model),
+            asyncio.to_thread(self._build_order_executor) if self.order_executor is None else asyncio.sleep(0)
+        )
+        self.model = model
+        self.order_executor = self.order_executor or executor
+        if self.settings['binance'].get('user_stream', True):
+            # Fills and balances pushed by the exchange instead of REST polling
+            self.account = AccountModel()
+            self.account.add_order_listener(self.on_order_update)
+            self.order_executor.attach_account(self.account)
+            binance = self.settings['binance']
+            user_stream_url = binance.get('user_stream_url') or (
+                "wss://stream.testnet.binance.vision" if binance.get('testnet', True) else "wss://stream.binance.com:9443"
+            )
+            self.user_stream = UserDataStream(self.order_executor.client, self.account, ws_url=user_stream_url)
+        if not self.risk_mgr.seeded:
+            # First run on this state file: start from the configured or actual account equity
+            equity = self.settings['risk'].get('initial_equity_usdt') or await asyncio.to_thread(
+                self.order_executor.get_account_balance, self.settings['trading'].get('quote_asset', 'USDT')
+            )
+            if equity:
+                self.risk_mgr.seed_equity(equity)
+                logger.info(f"Starting equity {equity:.2f} USDT")
+            else:
+                logger.warning(f"No account balance, starting from {self.risk_mgr.portfolio.equity:.2f} USDT")
+        self.initialized = True
+
+    def _model_mtime(self):
+        try:
+            return os.stat(self.settings['model']['path']).st_mtime_ns
+        except OSError:
+            return None
+
+    def _load_validated_model(self):
+        path = self.settings['model']['path']
+        model = load_scalping_model(path)
+        if not validate_scalping_model(model, path, self.settings['model']['required_features']):
+            return None
+        return model
+
+    def request_model_reload(self):
+        """Control command (SIGHUP): reload the model on the next watcher pass."""
+        logger.info("Model reload requested")
+        self.reload_requested = True
+
+    async def model_watch_loop(self):
+        """
+        Reload the model when `model.path` changes or a reload is requested.
+        Loading runs in a worker thread; the swap is a single assignment on the
+        event loop, so it always lands between two trade_loop evaluations.
+        """
+        interval = self.settings['model'].get('reload_check_seconds', 2.0)
+        pending_mtime = None
+        while self.running:
+            await asyncio.sleep(interval)
+            mtime = self._model_mtime()
+            if mtime is None:
+                continue
+            if mtime != self.model_mtime and mtime != pending_mtime:
+                # Wait one more interval for the trainer to finish writing
+                pending_mtime = mtime
+                continue
+            if mtime == self.model_mtime and not self.reload_requested:
+                continue
+
+            self.reload_requested = False
+            pending_mtime = None
+            try:
+                new_model = await asyncio.to_thread(self._load_validated_model)
+            except Exception as e:
+                logger.error(f"Model reload failed: {e}")
+                new_model = None
+            self.model_mtime = mtime
+            if new_model is None:
+                logger.error("New model rejected, keeping the current one")
+                continue
+            self.model = new_model
+            logger.info("Hot-swapped scalping model")
+
+    def _spawn(self, coro) -> asyncio.Task:
+        task = asyncio.get_running_loop().create_task(coro)
+        self.background_tasks.add(task)
+        task.add_done_callback(self._background_done)
+        return task
+
+    def _background_done(self, task: asyncio.Task):
+        self.background_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"{task.get_coro().__qualname__} failed", exc_info=task.exception())
+
+    def on_price_update(self, symbol: str, price: float):
+        """Per-tick exit check; dispatches the close immediately when a level is crossed."""
+        reason = self.risk_mgr.check_exit_trigger(symbol, price)
+        if reason:
+            self._spawn(self.close_position(symbol.upper(), reason, price))
+        elif self.stop_crossed_at:
+            self.stop_crossed_at.pop(symbol.upper(), None)  # Back inside the stop
+
+    def _record_close(self, pos: dict, close_price: float, reason: str,
+                      trigger_price: float = None, trigger_ts: float = None):
+        pnl_usdt = self.risk_mgr.update_portfolio_after_close(
+            close_price=close_price,
+            side=pos["side"],
+            qty=pos["quantity"],
+            entry_price=pos["entry_price"]
+        )
+        self.journal.log(
+            'exit', pos["symbol"], side='sell' if pos["side"] == "buy" else 'buy', price=close_price,
+            qty=pos["quantity"], trade_id=pos.get("order_id"), reason=reason,
+            signal_price=trigger_price, signal_ts=trigger_ts, pnl_usdt=pnl_usdt,
+            entry_price=pos["entry_price"], hold_seconds=time.time() - pos["open_time"],
+            equity=self.risk_mgr.state.get("portfolio_value_usdt")
+        )
+        self.stop_crossed_at.pop(pos["symbol"], None)
+        # Set cooldown to prevent immediate re-entry
+        self.risk_mgr.state["last_close_time"] = time.time()
+        self.risk_mgr.save_state()
+
+    def on_shard_assigned(self, symbols: list):
+        self.trade_symbols = [s.upper() for s in symbols]
+        if not symbols:
+            return  # Disconnected from the coordinator: keep the streams until the next assignment
+        pos = self.risk_mgr.state["active_position"]
+        held = [pos["symbol"]] if pos and pos["symbol"] not in self.trade_symbols else []
+        self.resubscribe(self.trade_symbols + held)
+
+    def resubscribe(self, symbols: list):
+        """
+        Market streams for `symbols` only (which need not be in trading.symbols):
+        new ones are subscribed and backfilled, the rest are dropped.
+        """
+        if not hasattr(self.ws_client, 'set_symbols'):
+            logger.warning(f"Kline store {type(self.ws_client).__name__} cannot change symbols")
+            return
+        symbols = [s.upper() for s in symbols]
+        current = {s.upper() for s in self.ws_client.symbols}
+        added = [s for s in symbols if s not in current]
+        if not added and len(symbols) == len(current):
+            return
+        if isinstance(self.ws_client, BinanceKlineStream):
+            for s in added:
+                if s in self.filters.filters:
+                    self.tick_sizes[s] = float(self.filters.filters[s].tick_size)
+            self.ws_client.set_symbols(symbols, self.tick_sizes)
+        else:
+            self.ws_client.set_symbols(symbols)
+        for stream in (self.price_stream, self.depth_stream, self.candles):
+            if stream is not None:
+                stream.set_symbols(symbols)
+        removed = [s for s in current if s not in symbols]
+        logger.info(f"Streaming {len(symbols)} symbols: +{added} -{removed}")
+        if added and self.snapshotter.enabled:
+            self._spawn(self._backfill([s.lower() for s in added]))
+
+    async def _backfill(self, symbols: list):
+        """Warm newly streamed symbols from the REST backfill instead of waiting a full window."""
+        await self.snapshotter.restore(self.feature_pipeline.window, symbols)
+        if self.candles is not None:
+            for symbol in symbols:
+                if symbol in self.ws_client.klines:
+                    self.candles.reset(symbol, self.ws_client.klines[symbol])
+
+    def exposure_report(self) -> dict:
+        """Heartbeat payload for the coordinator."""
+        return {"equity": self.risk_mgr.portfolio.equity, "exposure": dict(self.risk_mgr.portfolio.exposure)}
+
+    def on_order_update(self, order: dict):
+        """User-data-stream order update: book bracket fills without polling."""
+        fill = self.order_executor.match_bracket_fill(order)
+        pos = self.risk_mgr.state["active_position"]
+        if fill and pos and pos["symbol"] == order["symbol"]:
+            logger.info(f"Bracket {fill['reason']} filled @ {fill['avg_price']}")
+            self._record_close(pos, fill["avg_price"], fill["reason"], trigger_price=self._bracket_level(pos, fill))
+
+    def _bracket_level(self, pos: dict, fill: dict) -> float:
+        """Level the filled bracket leg was set at, for exit slippage."""
+        stop, target = self.risk_mgr.exit_levels(pos)
+        return stop if fill["reason"] == "stop_loss" else target
+
+    async def reconcile_bracket(self, symbol: str) -> bool:
+        """Book the close if a leg of the position's exchange-side bracket has filled."""
+        pos = self.risk_mgr.state["active_position"]
+        if not pos or not pos.get("bracket_id"):
+            return False
+        fill = await asyncio.to_thread(self.order_executor.reconcile_bracket, symbol)
+        if not fill:
+            return False
+        logger.info(f"Bracket {fill['reason']} filled @ {fill['avg_price']}")
+        self._record_close(pos, fill["avg_price"], fill["reason"], trigger_price=self._bracket_level(pos, fill))
+        return True
+
+    def _stop_unfilled(self, pos: dict, reason: str, price: float) -> bool:
+        """
+        Whether a crossed stop should no longer be left to the bracket: price is
+        past the STOP_LOSS_LIMIT's limit price (the leg cannot fill), or has been
+        past the stop for longer than the grace period.
+        """
+        if reason != "stop_loss":
+            return False
+        stop, _ = self.risk_mgr.exit_levels(pos)
+        slip = self.stop_slippage_pct / 100.0
+        if pos["side"] == "buy":
+            through = price < stop * (1 - slip)
+        else:
+            through = price > stop * (1 + slip)
+        crossed_at = self.stop_crossed_at.setdefault(pos["symbol"], time.monotonic())
+        return through or time.monotonic() - crossed_at >= self.stop_grace_seconds
+
+    async def close_position(self, symbol: str, reason: str, current_price: float):
+        pos = self.risk_mgr.state["active_position"]
+        if not pos or pos["symbol"] != symbol or symbol in self.closing:
+            return
+        self.closing.add(symbol)
+        try:
+            if pos.get("bracket_id"):
+                # The exchange owns stop/target: just pick up the fill
+                if reason in ("stop_loss", "take_profit") and not self._stop_unfilled(pos, reason, current_price):
+                    streamed = self.user_stream is not None and self.user_stream.connected
+                    # Triggers re-fire every tick while crossed: poll the bracket at most once per interval
+                    due = time.monotonic() - self.last_reconcile.get(symbol, 0.0) >= self.reconcile_interval
+                    if not streamed and due:
+                        self.last_reconcile[symbol] = time.monotonic()
+                        if await self.reconcile_bracket(symbol):
+                            return
+                    self.risk_mgr.arm_exit_triggers()
+                    return
+                # Other exits (timeout, or a stop the bracket did not fill): pull the bracket first,
+                # unless a leg already filled
+                if reason == "stop_loss":
+                    logger.warning(f"Bracket stop not filled @ {current_price}, closing at market")
+                cancelled = await asyncio.to_thread(self.order_executor.cancel_bracket, symbol)
+                if not cancelled and await self.reconcile_bracket(symbol):
+                    return
+
+            logger.info(f"Closing position due to {reason} @ {current_price}")
+            trigger_ts = time.time()
+            t0 = self.metrics.clock()
+            close_side = 'SELL' if pos["side"] == "buy" else 'BUY'
+            self.journal.log('order', symbol, side=close_side.lower(), qty=pos["quantity"],
+                             trade_id=pos.get("order_id"), reason=reason,
+                             signal_price=current_price, signal_ts=trigger_ts)
+            order_result = await asyncio.to_thread(
+                self.order_executor.place_market_order, symbol, close_side, pos["quantity"]
+            )
+            self.metrics.since('exit_order', t0)
+            if order_result:
+                avg_price = float(order_result.get('avgPrice', current_price))
+                self._record_close(pos, avg_price, reason, trigger_price=current_price, trigger_ts=trigger_ts)
+            else:
+                logger.error("Failed to close position")
+                self.risk_mgr.arm_exit_triggers()  # Fire again on the next tick
+        finally:
+            self.closing.discard(symbol)
+
+    async def open_position(self, symbol: str, side: str, qty: float, current_price: float, confidence: float,
+                            signal_ts: float = None, signal_ns: int = 0):
+        order_side = 'BUY' if side == 'buy' else 'SELL'
+        self.journal.log('order', symbol, side=side, qty=qty, reason='entry', confidence=confidence,
+                         signal_price=current_price, signal_ts=signal_ts)
+        t0 = self.metrics.clock()
+        order_result = await asyncio.to_thread(self.order_executor.place_market_order, symbol, order_side, qty)
+        self.metrics.since('order_sent_to_fill', t0)
+
+        if order_result:
+            self.metrics.since('signal_to_fill', signal_ns)
+            avg_price = float(order_result.get('avgPrice', current_price))
+            self.journal.log('fill', symbol, side=side, price=avg_price, qty=qty,
+                             order_id=order_result['orderId'], trade_id=order_result['orderId'],
+                             confidence=confidence, signal_price=current_price, signal_ts=signal_ts)
+            self.risk_mgr.register_open({
+                "symbol": symbol,
+                "side": side,
+                "quantity": qty,
+                "entry_price": avg_price,
+                "open_time": time.time(),
+                "order_id": order_result['orderId']
+            })
+            logger.info(f"Opened {side} position: {qty} @ {avg_price} (conf: {confidence:.2%})")
+            self.risk_mgr.save_state()
+            if self.use_brackets:
+                await self.protect_position(symbol)
+        else:
+            self.journal.log('order', symbol, side=side, qty=qty, reason='rejected',
+                             signal_price=current_price, signal_ts=signal_ts)
+            logger.error("Failed to place order")
+            if self.coordinator is not None:
+                await self.coordinator.release(symbol)
+
+    async def protect_position(self, symbol: str):
+        """Place the exchange-side OCO bracket for a freshly opened position."""
+        pos = self.risk_mgr.state["active_position"]
+        stop, target = self.risk_mgr.exit_levels(pos)
+        order_list = await asyncio.to_thread(
+            self.order_executor.place_bracket_order, symbol, pos["side"], pos["quantity"], target, stop,
+            self.stop_slippage_pct
+        )
+        if order_list:
+            pos["bracket_id"] = order_list['orderListId']
+            self.risk_mgr.save_state()
+            if self.account is not None:
+                # A leg may have filled before the bracket was registered
+                for order in list(self.account.orders.values()):
+                    if order["order_list_id"] == order_list['orderListId']:
+                        self.on_order_update(order)
+        else:
+            logger.warning("Bracket rejected, falling back to client-side stop/target")
+
     async def trade_loop(self):
-        symbol = self.settings['trading']['symbols'][0]  # Start with first symbol
-        logger.info(f"Starting scalping engine for {symbol} on Testnet")
+        logger.info(f"Starting scalping engine for {', '.join(self.trade_symbols)} on Testnet")
+        # Position carried over from a previous run
+        self.risk_mgr.arm_exit_triggers()
+        pos = self.risk_mgr.state["active_position"]
+        if pos and pos.get("bracket_id"):
+            await asyncio.to_thread(
+                self.order_executor.track_bracket, pos["symbol"], pos["bracket_id"], pos["quantity"]
+            )
+            await self.reconcile_bracket(pos["symbol"])
 
         while self.running:
             try:
-                # Get latest data
-                klines = self.ws_client.get_klines_array(symbol, n=15)
-                if len(klines) < 10:
-                    await asyncio.sleep(0.5)
+                symbols = list(self.trade_symbols)
+                pos = self.risk_mgr.state["active_position"]
+                if pos and pos["symbol"] not in symbols:
+                    symbols.append(pos["symbol"])  # Keep managing a position whose symbol moved to another node
+                evaluated = [await self.evaluate(symbol) for symbol in symbols]
+                if not self.startup.finished and any(evaluated):
+                    self.startup.finish("first decision")
+                if not any(evaluated):
+                    await asyncio.sleep(0.5)  # Warming up
                     continue
-
-                # Save klines for dashboard
-                save_latest_klines(klines, symbol)
-
-                # Compute features
-                features = compute_scalping_features(klines)
-                confidence, side = predict_signal(self.model, features)
-
-                # Update state for dashboard
-                self.risk_mgr.load_state()
-                current_price = klines[-1]['c']
-                self.risk_mgr.state["last_signal"] = {
-                    "side": side,
-                    "confidence": confidence,
-                    "price": current_price,
-                    "time": time.time()
-                }
-                self.risk_mgr.save_state()
-
-                # Check for exit if in position
-                exit_reason = self.risk_mgr.check_exit_conditions(current_price)
-                if exit_reason:
-                    logger.info(f"Closing position due to {exit_reason}")
-                    pos = self.risk_mgr.state["active_position"]
-                    close_side = 'SELL' if pos["side"] == "buy" else 'BUY'
-                    order_result = self.order_executor.place_market_order(
-                        symbol, close_side, pos["quantity"]
-                    )
-                    if order_result:
-                        avg_price = float(order_result.get('avgPrice', current_price))
-                        self.risk_mgr.update_portfolio_after_close(
-                            close_price=avg_price,
-                            side=pos["side"],
-                            qty=pos["quantity"],
-                            entry_price=pos["entry_price"]
-                        )
-                        # Set cooldown to prevent immediate re-entry
-                        self.risk_mgr.state["last_close_time"] = time.time()
-                        self.risk_mgr.save_state()
-                    else:
-                        logger.error("Failed to close position")
-
-                # Open new position if signal is strong AND no cooldown
-                elif (side in ['buy', 'sell'] 
-                      and confidence > 0.7  # Increased threshold
-                      and self.risk_mgr.can_open_position(symbol)):
-                    
-                    # Check cooldown (3 seconds after close)
-                    last_close = self.risk_mgr.state.get("last_close_time", 0)
-                    if time.time() - last_close < 3.0:
-                        logger.debug("Skipping signal due to cooldown")
-                    else:
-                        qty = self.risk_mgr.calculate_position_size(current_price)
-                        order_side = 'BUY' if side == 'buy' else 'SELL'
-                        order_result = self.order_executor.place_market_order(symbol, order_side, qty)
-                        
-                        if order_result:
-                            avg_price = float(order_result.get('avgPrice', current_price))
-                            self.risk_mgr.state["active_position"] = {
-                                "symbol": symbol,
-                                "side": side,
-                                "quantity": qty,
-                                "entry_price": avg_price,
-                                "open_time": time.time(),
-                                "order_id": order_result['orderId']
-                            }
-                            logger.info(f"Opened {side} position: {qty} @ {avg_price} (conf: {confidence:.2%})")
-                            self.risk_mgr.save_state()
-                        else:
-                            logger.error("Failed to place order")
-
-                await asyncio.sleep(1.0)  # Evaluate every 1 second
+                await asyncio.sleep(self.eval_interval)  # Evaluate once per bar
 
             except Exception as e:
                 logger.error(f"Error in trade loop: {e}")
                 await asyncio.sleep(1)
 
+    def read_klines(self, symbol: str):
+        """Feature window for `symbol` and its last close, or (None, None) while warming up."""
+        tick = self.tick_sizes.get(symbol)
+        if tick is not None:
+            cols = self.ws_client.get_columns(symbol, self.feature_pipeline.window)
+            if cols is None:
+                return None, None
+            if self.trade_symbols and symbol == self.trade_symbols[0]:
+                save_latest_klines(self.ws_client.get_klines_array(symbol, n=self.feature_pipeline.window), symbol)
+            return cols, int(cols['c'][-1]) * tick
+        klines = self.ws_client.get_klines_array(symbol, n=self.feature_pipeline.window)
+        if len(klines) < self.feature_pipeline.window:
+            return None, None
+        if self.trade_symbols and symbol == self.trade_symbols[0]:
+            save_latest_klines(klines, symbol)  # Save klines for dashboard
+        return klines, klines[-1]['c']
+
+    async def evaluate(self, symbol: str) -> bool:
+        """One trade_loop iteration for `symbol`; False while there are too few klines."""
+        # Get latest data
+        tick_start = t = self.metrics.clock()
+        klines, current_price = self.read_klines(symbol)
+        if klines is None:
+            return False
+        t = self.metrics.since('kline_read', t)
+
+        # Compute features
+        book = self.depth_stream.get_book(symbol) if self.depth_stream else None
+        frames = self.candles.frames(symbol, self.feature_pipeline.timeframes) if self.candles else None
+        features = self.feature_pipeline.compute(klines, book, frames, self.tick_sizes.get(symbol))
+        t = self.metrics.since('features', t)
+        frame_ns = self.ws_client.last_frame_ns.get(symbol.lower()) if self.metrics.enabled else None
+        if frame_ns:
+            self.metrics.record_ns('store_to_features', t - frame_ns)
+        model = self.model  # One model per evaluation, even if a reload lands mid-tick
+        confidence, side = predict_signal(model, features)
+        signal_ts = time.time()
+        signal_ns = t = self.metrics.since('predict', t)
+
+        # Update state for dashboard
+        self.risk_mgr.state["last_signal"] = {
+            "side": side,
+            "confidence": confidence,
+            "price": current_price,
+            "time": signal_ts
+        }
+        self.risk_mgr.save_state()
+        if side != 'neutral':
+            self.journal.log('signal', symbol, side=side, price=current_price,
+                             confidence=confidence, signal_price=current_price, signal_ts=signal_ts)
+        t = self.metrics.since('state_io', t)
+
+        # Timeout exits (and a backstop for stop/target) at evaluation cadence
+        exit_reason = self.risk_mgr.check_exit_conditions(current_price, symbol)
+        self.metrics.since('risk', t)
+        if exit_reason:
+            await self.close_position(symbol, exit_reason, current_price)
+
+        # Open new position if signal is strong AND no cooldown
+        elif (side in ['buy', 'sell'] 
+              and confidence > 0.7  # Increased threshold
+              and self.risk_mgr.can_open_position(symbol)):
+
+            # Check cooldown (3 seconds after close)
+            last_close = self.risk_mgr.state.get("last_close_time", 0)
+            if time.time() - last_close < 3.0:
+                logger.debug("Skipping signal due to cooldown")
+            else:
+                qty = self.risk_mgr.calculate_position_size(current_price, symbol)
+                if not self.risk_mgr.can_open_position(symbol, qty * current_price):
+                    logger.debug("Skipping signal due to exposure limits")
+                elif symbol not in self.trade_symbols:
+                    logger.debug(f"Skipping signal: {symbol} is no longer assigned to this node")
+                elif await self.reserve_global(symbol, qty * current_price):
+                    await self.open_position(symbol, side, qty, current_price, confidence,
+                                             signal_ts, signal_ns)
+
+        self.metrics.since('tick', tick_start)
+        return True
+
+    async def reserve_global(self, symbol: str, notional: float) -> bool:
+        """Cross-node exposure check; always passes without a coordinator."""
+        if self.coordinator is None:
+            return True
+        ok, reason = await self.coordinator.reserve(symbol, notional)
+        if not ok:
+            logger.debug(f"Skipping signal: coordinator denied {symbol} ({reason})")
+        return ok
+
+    async def _restore_klines(self) -> bool:
+        with self.startup.stage("kline restore"):
+            warm = await self.snapshotter.restore(self.feature_pipeline.window)
+        if self.candles is not None and self.snapshotter.enabled:
+            # Roll the restored klines up too (same loop step as the seeding: no live kline in between)
+            for symbol, dq in self.ws_client.klines.items():
+                self.candles.reset(symbol, dq)
+        return warm
+
     async def run(self):
-        # Start WebSocket stream
+        # Market streams connect while klines are restored and the model/client load
         ws_task = asyncio.create_task(self.ws_client.start())
-        await asyncio.sleep(2)  # Let WS connect
+        depth_task = asyncio.create_task(self.depth_stream.start()) if self.depth_stream else None
+        price_task = asyncio.create_task(self.price_stream.start()) if self.price_stream else None
+        coord_task = asyncio.create_task(self.coordinator.start()) if self.coordinator else None
+        warm, _ = await asyncio.gather(self._restore_klines(), self.initialize())
+        watch_task = asyncio.create_task(self.model_watch_loop())
+        user_task = asyncio.create_task(self.user_stream.start()) if self.user_stream else None
+        snapshot_task = asyncio.create_task(self.snapshotter.run())
+        metrics_tasks = []
+        if self.metrics.enabled:
+            metrics_cfg = self.settings['metrics']
+            metrics_tasks.append(asyncio.create_task(self.metrics.log_loop(metrics_cfg.get('log_interval_seconds', 60))))
+            if metrics_cfg.get('port'):
+                metrics_tasks.append(asyncio.create_task(
+                    self.metrics.serve(metrics_cfg.get('host', '127.0.0.1'), metrics_cfg['port'])
+                ))
+        if self.account is not None:
+            await asyncio.to_thread(self.order_executor.get_account_balance)  # Seed balances once
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, self.request_model_reload)
+        except (AttributeError, NotImplementedError):
+            pass  # No SIGHUP on Windows; file watching still works
+        if not warm:
+            await asyncio.sleep(2)  # Let WS connect
 
         # Start trading logic
         try:
@@ -148,21 +654,51 @@ class ScalpingEngine:
             logger.info("Trade loop cancelled.")
         finally:
             self.running = False
+            if self.background_tasks:
+                # Let in-flight closes finish their orders; backfills and anything slower are cancelled
+                await asyncio.wait(self.background_tasks, timeout=5)
             self.ws_client.stop()
-            ws_task.cancel()
-            try:
-                await ws_task
-            except asyncio.CancelledError:
-                pass
+            tasks = [watch_task, ws_task, snapshot_task] + metrics_tasks + list(self.background_tasks)
+            if depth_task:
+                self.depth_stream.stop()
+                tasks.append(depth_task)
+            if price_task:
+                self.price_stream.stop()
+                tasks.append(price_task)
+            if user_task:
+                self.user_stream.stop()
+                tasks.append(user_task)
+            if coord_task:
+                self.coordinator.stop()
+                tasks.append(coord_task)
+            for task in tasks:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+            await asyncio.to_thread(self.journal.close)
+            self.snapshotter.save()
 
     def shutdown(self):
         logger.info("Shutting down engine...")
         self.running = False
 
 if __name__ == "__main__":
-    engine = ScalpingEngine()
+    import argparse
+    parser = argparse.ArgumentParser(description="Scalping engine (Binance Testnet).")
+    parser.add_argument("--startup-profile", action="store_true",
+                        help="Log import/init time per component up to the first trading decision")
+    args = parser.parse_args()
+
+    # Queue-based logging: the event loop only enqueues records
+    setup_logging("settings.yaml")
+    startup = StartupProfile(start=_IMPORT_START, enabled=args.startup_profile)
+    startup.add("imports", 0.0, _IMPORT_SECONDS)
+    with startup.stage("engine init"):
+        engine = ScalpingEngine(startup=startup)
     try:
-        asyncio.run(engine.run())
+        run_event_loop(engine.run(), engine.settings, engine.metrics)
     except KeyboardInterrupt:
         logger.info("Received Ctrl+C. Shutting down gracefully...")
     except Exception as e:
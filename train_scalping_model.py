@@ -1,30 +1,34 @@
 ﻿# TARGET_FILE: train_scalping_model.py
-import pandas as pd
+import argparse
 import xgboost as xgb
 import numpy as np
 import os
 import json
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import classification_report, accuracy_score
+from data.dataset_cache import DatasetCache, StoreSlice, load_training_data
+from strategies.scalping_features import load_feature_pipeline
 
-def train_scalping_model(data_path: str, model_save_path: str):
+def train_scalping_model(data_path, model_save_path: str, config_path: str = "settings.yaml",
+                         labeling: dict = None):
+    """
+    `data_path` is a CSV or a StoreSlice; with `labeling` (see data.labeling)
+    it is labeled here, otherwise its 'label' column is used. Featurized and
+    labeled matrices come from the dataset cache when nothing changed.
+    """
     print(f"Loading labeled data from {data_path}")
-    df = pd.read_csv(data_path)
+    # Train on exactly the features the engine will compute (model.required_features)
+    pipeline = load_feature_pipeline(config_path)
+    feature_cols = pipeline.names
+    data = load_training_data(data_path, pipeline, labeling, DatasetCache.from_settings(config_path))
+    labeled = ~np.isnan(data['y'])
     
-    if len(df) < 100:
+    if labeled.sum() < 100:
         print("Not enough labeled data (<100 samples). Collect more first.")
         return
 
-    feature_cols = [
-        'price_change_1s',
-        'price_change_5s',
-        'volatility_10s',
-        'volume_10s',
-        'price_acceleration'
-    ]
-    
-    X = df[feature_cols].values
-    y = df['label'].values
+    X = data['X'][labeled]
+    y = data['y'][labeled].astype(int)
     
     # Train/test split
     X_train, X_test, y_train, y_test = train_test_split(
@@ -66,10 +70,30 @@ def train_scalping_model(data_path: str, model_save_path: str):
     print(f"Feature importance saved.")
 
 if __name__ == "__main__":
-    labeled_data = "datasets/btcusdt_volatile_labeled.csv"  # ✅ Updated for volatile data
-    model_path = "models/scalping_model.json"
-    
-    if not os.path.exists(labeled_data):
-        print(f"Error: {labeled_data} not found. Run relabel_volatile_data.py first.")
+    parser = argparse.ArgumentParser(description="Train the scalping model.")
+    parser.add_argument("--data", default="datasets/btcusdt_volatile_labeled.csv",  # ✅ Updated for volatile data
+                        help="Labeled CSV, or a raw one with --label")
+    parser.add_argument("--symbol", help="Train on the dataset store's klines for this symbol instead of --data")
+    parser.add_argument("--store", default=os.path.join("datasets", "store"))
+    parser.add_argument("--start-ms", type=int, default=None)
+    parser.add_argument("--end-ms", type=int, default=None)
+    parser.add_argument("--label", choices=["threshold", "volatile"], default=None,
+                        help="Label here instead of using the data's 'label' column")
+    parser.add_argument("--look-ahead", type=int, default=2)
+    parser.add_argument("--threshold-pct", type=float, default=0.02, help="For --label threshold")
+    parser.add_argument("--model", default="models/scalping_model.json")
+    args = parser.parse_args()
+
+    labeling = None
+    if args.label == "threshold":
+        labeling = {"method": "threshold", "look_ahead_seconds": args.look_ahead, "threshold_pct": args.threshold_pct}
+    elif args.label == "volatile":
+        labeling = {"method": "volatile", "look_ahead_seconds": args.look_ahead}
+
+    if args.symbol:
+        source = StoreSlice(args.store, args.symbol.upper(), "1s", args.start_ms, args.end_ms)
+        train_scalping_model(source, args.model, labeling=labeling or {"method": "volatile", "look_ahead_seconds": args.look_ahead})
+    elif not os.path.exists(args.data):
+        print(f"Error: {args.data} not found. Run relabel_volatile_data.py first.")
     else:
-        train_scalping_model(labeled_data, model_path)
\ No newline at end of file
+        train_scalping_model(args.data, args.model, labeling=labeling)